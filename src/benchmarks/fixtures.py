@@ -0,0 +1,96 @@
+"""
+Synthetic responses shaped like the pages the data sources scrape, for benchmarks and
+stub servers. Real saved responses can be used instead where a benchmark accepts a path.
+"""
+import json
+import random
+
+CURRENCIES = [
+    "EUR/USD", "USD/JPY", "GBP/USD", "AUD/USD", "NZD/USD", "EUR/JPY", "GBP/JPY", "EUR/GBP",
+    "EUR/CAD", "EUR/SEK", "EUR/CHF", "EUR/HUF", "USD/CNY", "USD/HKD", "USD/SGD", "USD/INR",
+    "USD/MXN", "USD/PHP", "USD/IDR", "USD/THB", "USD/MYR", "USD/ZAR", "USD/RUB", "USD/CAD",
+]
+
+
+def yahoo_currencies_html(script_kb: int = 400, seed: int = 0) -> str:
+    """
+    A currencies page like Yahoo Finance's: a large head of inline scripts and styles
+    (the embedded app state), then one table row per currency with nested markup in
+    the cells.
+    """
+    rng = random.Random(seed)
+    state = {
+        "context": {
+            "dispatcher": {
+                "stores": {
+                    f"Store{i}": {"key": "x" * 64, "values": [rng.random() for _ in range(16)]}
+                    for i in range(script_kb * 1024 // 600)
+                }
+            }
+        }
+    }
+    head = (
+        "<head><title>Currencies</title>"
+        + "<style>" + ".c{color:#000}" * 2000 + "</style>"
+        + f"<script>root.App.main = {json.dumps(state)};</script></head>"
+    )
+
+    rows = []
+    for name in CURRENCIES:
+        price = rng.uniform(0.5, 20000)
+        rows.append(
+            "<tr class=\"simpTblRow\">"
+            + f'<td aria-label="Symbol"><a href="/quote/{name.replace("/", "")}=X">{name.replace("/", "")}=X</a></td>'
+            + f'<td aria-label="Name" class="Va(m)">{name}</td>'
+            + f'<td aria-label="Last Price"><fin-streamer value="{price}">{price:,.4f}</fin-streamer></td>'
+            + f'<td aria-label="Change"><span class="C($positiveColor)">+{rng.random():.4f}</span></td>'
+            + f'<td aria-label="% Change"><span>+{rng.random():.2f}%</span></td>'
+            + "</tr>"
+        )
+    table = "<table><thead><tr><th>Symbol</th><th>Name</th></tr></thead><tbody>" + "".join(rows) + "</tbody></table>"
+
+    return f"<!DOCTYPE html><html>{head}<body><div id=\"app\"><div>{table}</div></div></body></html>"
+
+
+def steam_search_json(start: int = 0, count: int = 100, total_count: int = 3800, seed: int = 0) -> bytes:
+    """A market/search/render?norender=1 response for the given page."""
+    rng = random.Random(seed + start)
+    results = []
+    for i in range(start, min(start + count, total_count)):
+        price = rng.randint(3, 500000)
+        results.append(
+            {
+                "name": f"Item {i}",
+                "hash_name": f"Item {i} (Field-Tested)",
+                "sell_listings": rng.randint(1, 5000),
+                "sell_price": price,
+                "sell_price_text": f"${price / 100:,.2f}",
+                "app_icon": "https://cdn.example/icon.jpg",
+                "app_name": "Game",
+                "asset_description": {
+                    "appid": 252490,
+                    "classid": str(rng.randint(10**9, 10**10)),
+                    "instanceid": "0",
+                    "background_color": "",
+                    "icon_url": "x" * 120,
+                    "tradable": 1,
+                    "name": f"Item {i}",
+                    "name_color": "D2D2D2",
+                    "type": "Skin",
+                    "market_name": f"Item {i}",
+                    "market_hash_name": f"Item {i} (Field-Tested)",
+                    "commodity": 0,
+                },
+                "sale_price_text": f"${price / 100 * 0.95:,.2f}",
+            }
+        )
+    return json.dumps(
+        {
+            "success": True,
+            "start": start,
+            "pagesize": count,
+            "total_count": total_count,
+            "searchdata": {"query": "", "search_descriptions": False, "total_count": total_count},
+            "results": results,
+        }
+    ).encode()
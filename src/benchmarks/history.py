@@ -0,0 +1,87 @@
+"""
+Loading hourly price bars for many Steam items: one query per item, as dashboards
+did with ad-hoc SQL, versus one PriceHistory call followed by the vectorized ohlc.
+
+Run from the src directory:
+
+    python -m benchmarks.history [--items 500] [--records 200]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, insert, select
+from data_sources.steam.models import ItemRecord, load_tables
+from utils.history import PriceHistory, ohlc
+
+START = datetime(2026, 1, 1)
+
+
+def _fill(engine, items: int, records: int):
+    rows = [
+        dict(
+            name=f"Item {i}",
+            hash_name=f"item-{i}",
+            sell_listings=r % 50,
+            sell_price=100 + (r * 7 + i) % 90,
+            sale_price_text="",
+            created_at=START + timedelta(minutes=10 * r),
+        )
+        for r in range(records)
+        for i in range(items)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(ItemRecord.__table__), rows)
+
+
+def _per_item(engine, names: list) -> dict:
+    """Per item queries, bucketed into hourly bars in Python."""
+    table = ItemRecord.__table__
+    bars = {}
+    with engine.connect() as conn:
+        for name in names:
+            query = (
+                select(table.c.created_at, table.c.sell_price)
+                .where(table.c.hash_name == name)
+                .order_by(table.c.created_at)
+            )
+            for created_at, sell_price in conn.execute(query):
+                price = sell_price / 100
+                hour = created_at.replace(minute=0, second=0, microsecond=0)
+                bar = bars.setdefault((name, hour), [price, price, price, price])
+                bar[1] = max(bar[1], price)
+                bar[2] = min(bar[2], price)
+                bar[3] = price
+    return bars
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--records", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'history.db')}")
+        load_tables(engine)
+        _fill(engine, args.items, args.records)
+        names = [f"item-{i}" for i in range(args.items)]
+        print(f"{args.items} items x {args.records} records, hourly OHLC")
+
+        start = time.perf_counter()
+        n_bars = len(_per_item(engine, names))
+        print(f"  per item queries  {time.perf_counter() - start:8.3f}s ({n_bars} bars)")
+
+        history = PriceHistory(engine)
+        start = time.perf_counter()
+        n_bars = len(ohlc(history.steam_items(names), "1h"))
+        print(f"  one batched call  {time.perf_counter() - start:8.3f}s ({n_bars} bars)")
+
+        start = time.perf_counter()
+        ohlc(history.steam_items(names), "1h")
+        print(f"  cached            {time.perf_counter() - start:8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
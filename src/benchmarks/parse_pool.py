@@ -0,0 +1,63 @@
+"""
+Parse throughput with parsing on the job threads versus in the parse pool.
+
+Several threads (standing in for the executor's workers) parse Steam and Yahoo
+responses through run_parser at the same time, first inline, where they share the
+GIL, then with parse pools of increasing size.
+
+Run from the src directory:
+
+    python -m benchmarks.parse_pool [--threads 8] [--pages 400] [--processes 1 2 4]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.fixtures import steam_search_json, yahoo_currencies_html
+from data_sources.steam.parse import parse_listings
+from data_sources.yahoofinance.parse import parse_currency_content
+from utils import parsing
+
+
+def _work(pages: int) -> list:
+    steam = steam_search_json(count=100)
+    yahoo = yahoo_currencies_html().encode()
+    work = []
+    for i in range(pages):
+        if i % 4 == 0:
+            work.append(("Yahoo Finance", parse_currency_content, yahoo))
+        else:
+            work.append(("Steam", parse_listings, steam))
+    return work
+
+
+def _run(work: list, threads: int) -> float:
+    """Returns pages parsed per second."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(lambda w: parsing.run_parser(*w), work))
+    return len(work) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--processes", type=int, nargs="*", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    work = _work(args.pages)
+    print(f"{args.pages} pages (1 in 4 Yahoo), {args.threads} threads, {os.cpu_count()} CPUs")
+    print(f"  inline      {_run(work, args.threads):8.1f} pages/s")
+
+    for processes in args.processes:
+        parsing.start_parse_pool(processes)
+        try:
+            _run(work[: processes * 2], args.threads)  # Start the processes
+            print(f"  {processes} processes {_run(work, args.threads):8.1f} pages/s")
+        finally:
+            parsing.stop_parse_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Memory and CPU of the scraped rows on their way from the parser to the database.
+
+Parses a cycle of Steam pages, hands each page to the write path the way data_update
+does (utils.data_pull._rows_by_model and a PendingUpdate per page), keeps the whole
+cycle queued, as the writer queue can while the database is slow, and then writes it
+to an in-memory SQLite database. The "orm" variant builds an ItemRecord per row
+instead, as the scrape path did originally.
+
+Each variant runs in its own process, so the peak RSS is its own. Reports the
+tracemalloc peak while the cycle is queued, the peak RSS, and the CPU time per row
+spent building the updates and writing them.
+
+Run from the src directory:
+
+    python -m benchmarks.row_memory [--pages 380] [--variants rows orm]
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from benchmarks.fixtures import steam_search_json
+from data_sources.steam.models import ItemRecord, load_tables as load_steam_tables
+from data_sources.steam.parse import parse_listings
+from models import UpdateRow, load_tables as load_main_tables
+from utils.data_pull import _rows_by_model
+from utils.writer import PendingUpdate, write_updates
+
+
+def _update_record():
+    return UpdateRow(service_name="Steam", title="bench", success=True, attempts=1, run_time=0.1)
+
+
+def _run(variant: str, pages: int) -> dict:
+    engine = create_engine("sqlite:///:memory:")
+    load_main_tables(engine)
+    load_steam_tables(engine)
+    bodies = [
+        steam_search_json(start=100 * i, count=100, total_count=100 * pages, seed=i)
+        for i in range(pages)
+    ]
+    parsed = [parse_listings(body)[1] for body in bodies]
+    del bodies
+
+    tracemalloc.start()
+    cpu = time.process_time()
+    queued = []
+    for rows in parsed:
+        if variant == "orm":
+            rows = [ItemRecord(**row._asdict()) for row in rows]
+        queued.append(PendingUpdate(_update_record(), _rows_by_model(rows)))
+    del parsed, rows
+    build_cpu = time.process_time() - cpu
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    cpu = time.process_time()
+    for i in range(0, len(queued), 50):
+        with Session(engine) as session:
+            write_updates(session, queued[i : i + 50])
+            session.commit()
+    write_cpu = time.process_time() - cpu
+
+    n_rows = pages * 100
+    return {
+        "variant": variant,
+        "rows": n_rows,
+        "tracemalloc_peak_mb": peak / 2**20,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "build_us_per_row": build_cpu / n_rows * 1e6,
+        "write_us_per_row": write_cpu / n_rows * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=380)
+    parser.add_argument("--variants", nargs="*", default=["rows", "orm"])
+    parser.add_argument("--run", help=argparse.SUPPRESS)  # Runs one variant in this process
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(_run(args.run, args.pages)))
+        return
+
+    print(f"{args.pages} pages of 100 Steam rows queued, then written to SQLite")
+    print(f"  {'variant':<8} {'tracemalloc peak':>17} {'peak RSS':>10} {'build':>12} {'write':>12}")
+    for variant in args.variants:
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.row_memory", "--pages", str(args.pages), "--run", variant],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        r = json.loads(out)
+        print(
+            f"  {variant:<8} {r['tracemalloc_peak_mb']:14.1f} MB {r['peak_rss_mb']:7.1f} MB "
+            + f"{r['build_us_per_row']:7.2f} us/row {r['write_us_per_row']:7.2f} us/row"
+        )
+
+
+if __name__ == "__main__":
+    main()
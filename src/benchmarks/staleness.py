@@ -0,0 +1,121 @@
+"""
+Staleness of the stored pages under round-robin and ChangeRatePolicy scheduling.
+
+Simulates pages whose items change as Poisson processes with log-normally spread
+rates, pulled one at a time through a GroupedDelayScheduler on a simulated clock,
+so both policies spend exactly the same number of requests. Reports the average
+fraction of pages whose stored copy is out of date, and their average age (time
+since the first change the stored copy misses).
+
+Run from the src directory:
+
+    python -m benchmarks.staleness [--pages 40] [--delay 10] [--visits 20000]
+"""
+import argparse
+import math
+import random
+from functools import partial
+from scheduling.job import RepeatableJob
+from scheduling.policies import ChangeRatePolicy
+from scheduling.schedulers import GroupedDelayScheduler
+
+
+class _SimClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def wait(self, cond, timeout):
+        self.now += timeout
+
+
+def page_rates(num_pages: int, median_interval: float, spread: float, seed: int) -> list[float]:
+    """Change rates (per second) of the pages, log-normal around 1 / median_interval."""
+    rng = random.Random(seed)
+    return [math.exp(rng.gauss(-math.log(median_interval), spread)) for _ in range(num_pages)]
+
+
+def simulate(rates: list[float], delay: float, visits: int, use_policy: bool, seed: int) -> dict:
+    rng = random.Random(seed)
+    clock = _SimClock()
+    policy = ChangeRatePolicy(clock=clock) if use_policy else None
+    jobs = [RepeatableJob(partial(int), name=f"page-{i}") for i in range(len(rates))]
+    index = {id(job): i for i, job in enumerate(jobs)}
+    sched = GroupedDelayScheduler(clock=clock, wait=clock.wait)
+    sched.add_job_group(jobs, group_delay=delay, policy=policy)
+
+    next_change = [rng.expovariate(rate) for rate in rates]
+    stale_since = [None] * len(rates)  # Time of the first change missing from the stored copy
+    stale_time = 0.0
+    age_area = 0.0
+    pulls = [0] * len(rates)
+
+    def advance(i: int, now: float):
+        while next_change[i] <= now:
+            if stale_since[i] is None:
+                stale_since[i] = next_change[i]
+            next_change[i] += rng.expovariate(rates[i])
+
+    def store(i: int, now: float) -> bool:
+        nonlocal stale_time, age_area
+        advance(i, now)
+        if stale_since[i] is None:
+            return False
+        stale_time += now - stale_since[i]
+        age_area += (now - stale_since[i]) ** 2 / 2
+        stale_since[i] = None
+        return True
+
+    for _ in range(visits):
+        job = sched.next_job()
+        i = index[id(job)]
+        pulls[i] += 1
+        changed = store(i, clock.now)
+        if policy is not None:
+            policy.observe(job, changed)
+
+    # Count the time pages are still out of date at the end
+    end = clock.now
+    for i in range(len(rates)):
+        store(i, end)
+
+    page_time = len(rates) * end
+    return {
+        "stale_fraction": stale_time / page_time,
+        "mean_age": age_area / page_time,
+        "pulls": pulls,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--delay", type=float, default=10, help="seconds between pulls (group delay)")
+    parser.add_argument("--visits", type=int, default=20000)
+    parser.add_argument("--median-interval", type=float, default=1800, help="median seconds between changes of a page")
+    parser.add_argument("--spread", type=float, default=2.0, help="sigma of the log-normal change rates")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rates = page_rates(args.pages, args.median_interval, args.spread, args.seed)
+    print(
+        f"{args.pages} pages, one pull every {args.delay}s, {args.visits} pulls "
+        + f"(round-robin revisits every page every {args.pages * args.delay:.0f}s)"
+    )
+
+    hottest = sorted(range(len(rates)), key=lambda i: -rates[i])[:3]
+    coldest = sorted(range(len(rates)), key=lambda i: rates[i])[:3]
+    for label, use_policy in (("roundrobin", False), ("changerate", True)):
+        result = simulate(rates, args.delay, args.visits, use_policy, args.seed)
+        pulls = result["pulls"]
+        print(
+            f"  {label:<11} {result['stale_fraction'] * 100:6.2f}% of pages stale  "
+            + f"mean age {result['mean_age']:8.1f}s  "
+            + f"pulls of hottest {[pulls[i] for i in hottest]}, coldest {[pulls[i] for i in coldest]}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Per-page CPU and allocations of decoding Steam market search responses.
+
+Compares the previous path (json.loads of the decoded text, then one ItemRecord per
+result) with parse_listings (bytes straight into ItemRow tuples) using json and,
+when installed, orjson.
+
+Run from the src directory:
+
+    python -m benchmarks.steam_decode [--json saved_response.json ...] [--repeat 200]
+
+Without --json, synthetic responses shaped like Steam's (benchmarks.fixtures) are used.
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from benchmarks.fixtures import steam_search_json
+from data_sources.steam import parse
+from data_sources.steam.models import ItemRecord
+
+
+def _orm_path(content: bytes):
+    data = json.loads(content.decode())
+    return [
+        ItemRecord(
+            name=r["name"],
+            hash_name=r["hash_name"],
+            sell_listings=r["sell_listings"],
+            sell_price=r["sell_price"],
+            sale_price_text=r["sale_price_text"],
+        )
+        for r in data["results"]
+    ]
+
+
+def _rows_path(loads):
+    def decode(content: bytes):
+        original = parse._loads
+        parse._loads = loads
+        try:
+            return parse.parse_listings(content)[1]
+        finally:
+            parse._loads = original
+
+    return decode
+
+
+def _measure(decode, pages: list[bytes], repeat: int) -> tuple[float, int, int]:
+    """Returns (CPU seconds per page, peak bytes per page, blocks held by one page's result)."""
+    start = time.process_time()
+    for _ in range(repeat):
+        for page in pages:
+            decode(page)
+    cpu = (time.process_time() - start) / (repeat * len(pages))
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = decode(pages[0])
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sum(s.count_diff for s in after.compare_to(before, "filename"))
+    del result
+
+    return cpu, peak, blocks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--json", nargs="*", default=[])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    pages = [open(path, "rb").read() for path in args.json]
+    if len(pages) == 0:
+        pages = [steam_search_json(start=i * 100) for i in range(5)]
+    print(f"{len(pages)} pages, {sum(map(len, pages)) / len(pages) / 1024:.0f} KiB each on average")
+
+    paths = [("json + ItemRecord", _orm_path), ("json + ItemRow", _rows_path(json.loads))]
+    try:
+        import orjson
+
+        paths.append(("orjson + ItemRow", _rows_path(orjson.loads)))
+    except ImportError:
+        print("orjson is not installed, skipping it")
+
+    for label, decode in paths:
+        cpu, peak, blocks = _measure(decode, pages, args.repeat)
+        print(f"  {label:<18} {cpu * 1e6:8.0f} us CPU/page  {peak / 1024:8.0f} KiB peak  {blocks:6d} blocks held")
+
+
+if __name__ == "__main__":
+    main()
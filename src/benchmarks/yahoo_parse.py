@@ -0,0 +1,59 @@
+"""
+Compares the fast flat parser of the Yahoo Finance currencies page with the full
+BeautifulSoup parse it falls back to.
+
+Run from the src directory:
+
+    python -m benchmarks.yahoo_parse [--html saved_page.html ...] [--repeat 20]
+
+Without --html, a synthetic page shaped like Yahoo's (benchmarks.fixtures) is used.
+"""
+import argparse
+import time
+import tracemalloc
+from benchmarks.fixtures import yahoo_currencies_html
+from data_sources.yahoofinance.parse import _parse_cells_fast, _parse_cells_soup
+
+
+def _measure(parse, html: str, repeat: int) -> tuple[float, int, int]:
+    """Returns (CPU seconds per parse, peak bytes allocated by one parse, rows found)."""
+    names, _ = parse(html)
+
+    start = time.process_time()
+    for _ in range(repeat):
+        parse(html)
+    cpu = (time.process_time() - start) / repeat
+
+    tracemalloc.start()
+    parse(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return cpu, peak, len(names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--html", nargs="*", default=[])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    pages = [(path, open(path, encoding="utf-8").read()) for path in args.html]
+    if len(pages) == 0:
+        pages = [("synthetic", yahoo_currencies_html())]
+
+    for name, html in pages:
+        print(f"{name}: {len(html) / 1024:.0f} KiB")
+        results = {}
+        for label, parse in (("soup", _parse_cells_soup), ("fast", _parse_cells_fast)):
+            cpu, peak, rows = _measure(parse, html, args.repeat)
+            results[label] = (cpu, peak)
+            print(f"  {label:<5} {cpu * 1000:8.2f} ms CPU  {peak / 1024:10.0f} KiB peak  {rows} rows")
+        print(
+            f"  fast is {results['soup'][0] / results['fast'][0]:.1f}x faster, "
+            + f"{results['soup'][1] / results['fast'][1]:.1f}x less peak memory"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,17 @@ from configparser import ConfigParser
 logger = logging.getLogger(__name__)
 
 
+def to_bool(value) -> bool:
+    """Parses ini booleans, bool("False") would be True"""
+    if isinstance(value, bool):
+        return value
+    if value.strip().lower() in ("1", "yes", "true", "on"):
+        return True
+    if value.strip().lower() in ("0", "no", "false", "off"):
+        return False
+    raise ValueError(f"Not a boolean: {value}")
+
+
 class Config:
     _filename: str
     _schema: Schema
@@ -16,18 +27,49 @@ class Config:
         self.load()
 
     def load(self):
+        """
+        (Re)loads and validates the file. On a reload, sections which already existed
+        are updated in place, so code holding a section sees the new values. If the
+        file is invalid, the previous config is kept and the error raised.
+        """
+        previous = getattr(self, "_config", None)
         parser = ConfigParser()
-        parser.read(self._filename)
+        if len(parser.read(self._filename)) == 0 and previous is not None:
+            raise FileNotFoundError(f"Could not read config file: {self._filename}")
         config_dict = {
             section: dict(parser.items(section)) for section in parser.sections()
         }
-        self._config = self._schema.validate(config_dict)
+        config = self._schema.validate(config_dict)
+
+        for section, values in config.items():
+            current = (previous or {}).get(section)
+            if isinstance(current, dict) and isinstance(values, dict):
+                # Update before removing keys, so readers never see a missing key
+                current.update(values)
+                for key in [k for k in current if k not in values]:
+                    del current[key]
+                config[section] = current
+        self._config = config
         logger.debug(f"Loaded config file: {self._filename}")
         return self._config
 
+    @property
+    def filename(self) -> str:
+        return self._filename
+
+    def sections(self) -> dict:
+        """A copy of the validated config, by section."""
+        return {
+            section: dict(values) if isinstance(values, dict) else values
+            for section, values in self._config.items()
+        }
+
     def __getitem__(self, key):
         return self._config[key]
 
+    def __contains__(self, key):
+        return key in self._config
+
 
 def load_config(filename: str) -> ConfigParser:
     cfg_parser = ConfigParser()
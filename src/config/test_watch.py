@@ -0,0 +1,60 @@
+import os
+import pytest
+from schema import Schema, Use
+from config.config import Config
+from config.watch import ConfigWatcher
+
+SCHEMA = Schema({"Source": {"delay": Use(int)}})
+
+
+def _write(path, text):
+    path.write_text(text)
+    # Make sure the mtime changes, however coarse the filesystem's clock
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def ini(tmp_path):
+    path = tmp_path / "config.ini"
+    path.write_text("[Source]\ndelay=5\n")
+    return path
+
+
+def test_ConfigWatcher_reloads_changed_file(ini):
+    config = Config(str(ini), SCHEMA)
+    section = config["Source"]
+    reloads = []
+    watcher = ConfigWatcher(config, reloads.append)
+
+    assert not watcher.check()
+
+    _write(ini, "[Source]\ndelay=7\n")
+    assert watcher.check()
+    assert reloads == [{"Source"}]
+    assert section["delay"] == 7
+    assert config["Source"] is section
+
+
+def test_ConfigWatcher_keeps_config_on_invalid_file(ini):
+    config = Config(str(ini), SCHEMA)
+    reloads = []
+    watcher = ConfigWatcher(config, reloads.append)
+
+    _write(ini, "[Source]\ndelay=soon\n")
+    assert not watcher.check()
+    assert config["Source"]["delay"] == 5
+    assert reloads == []
+
+
+def test_ConfigWatcher_reloads_on_request(ini):
+    config = Config(str(ini), SCHEMA)
+    reloads = []
+    watcher = ConfigWatcher(config, reloads.append, watch_file=False)
+
+    _write(ini, "[Source]\ndelay=7\n")
+    assert not watcher.check()
+
+    watcher.request_reload()
+    assert watcher.check()
+    assert reloads == [{"Source"}]
@@ -0,0 +1,72 @@
+import logging
+import os
+from functools import partial
+from typing import Callable
+from config.config import Config
+from scheduling.job import RepeatableJob
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigWatcher:
+    """
+    Reloads a Config when its file changes, or when a reload was requested (e.g. on
+    SIGHUP), and reports which sections changed to on_reload.
+
+    check is meant to run as a job. request_reload only sets a flag for the next
+    check, so it is safe to call from a signal handler. A file which fails to load
+    or validate is logged and the running config is kept.
+    """
+
+    def __init__(self, config: Config, on_reload: Callable[[set], None], watch_file: bool = True):
+        """
+        config:      the running config, reloaded in place
+        on_reload:   called with the names of the changed sections after a reload
+        watch_file:  whether changes to the file's mtime trigger a reload, or only requests do
+        """
+        self.config = config
+        self.on_reload = on_reload
+        self.watch_file = watch_file
+        self._requested = False
+        self._mtime = self._file_mtime()
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.config.filename).st_mtime_ns
+        except (OSError, TypeError):
+            return None
+
+    def request_reload(self):
+        """Reloads on the next check."""
+        self._requested = True
+
+    def check(self) -> bool:
+        """Reloads the config if requested or its file changed. Returns whether it was reloaded."""
+        mtime = self._file_mtime()
+        changed_file = self.watch_file and mtime is not None and mtime != self._mtime
+        if not (self._requested or changed_file):
+            return False
+        self._requested = False
+        self._mtime = mtime
+
+        before = self.config.sections()
+        try:
+            self.config.load()
+        except Exception:
+            logger.error(
+                f"Failed to reload config file {self.config.filename}, keeping the running config",
+                exc_info=True,
+            )
+            return False
+        after = self.config.sections()
+
+        changed = {s for s in before.keys() | after.keys() if before.get(s) != after.get(s)}
+        logger.info(f"Reloaded config file {self.config.filename}, changed sections: {sorted(changed)}")
+        if len(changed) > 0:
+            self.on_reload(changed)
+        return True
+
+
+def create_reload_jobs(watcher: ConfigWatcher) -> list[RepeatableJob]:
+    """Job checking for config reloads, run in a group with the reload interval as its delay."""
+    return [RepeatableJob(partial(watcher.check), name="config-reload")]
@@ -4,6 +4,12 @@ class MalformedContent(Exception):
     pass
 
 
+class NotModified(Exception):
+    """Exception raised when a response has not changed since it was last stored"""
+
+    pass
+
+
 class RateLimitException(Exception):
     def __init__(self, wait_for, message):
         self.wait_for = wait_for
@@ -0,0 +1,183 @@
+"""
+Registry of the data sources.
+
+Each data source is a module defining SOURCE, a DataSource, registered below under
+the ini section which enables it. Source modules are only imported once their
+section is enabled, and import their models, parsers and HTTP code only when their
+functions are called, so a replica only pays for the sources it runs.
+
+Adding a source means writing its module (see data_sources/steam/source.py) and
+adding it to SOURCE_MODULES.
+
+RunningSources keeps the scheduler in line with the config as it is reloaded,
+starting and stopping sources and letting running ones apply their new settings.
+"""
+import importlib
+import logging
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# ini section enabling a source -> module defining its SOURCE
+SOURCE_MODULES = {
+    "YahooFinance.Currency": "data_sources.yahoofinance.source",
+    "Steam.ItemListings": "data_sources.steam.source",
+}
+
+
+@dataclass
+class DataSource:
+    section: str  # ini section enabling the source, its "enabled" key turns it on
+    schema: dict  # Schema of the source's ini sections (section and any shared ones), merged into the root schema
+    load_tables: Callable  # load_tables(db_engine, partitioned) creates the source's tables
+    partitioned_tables: Callable  # partitioned_tables() returns the tables partitioned by month
+    add_jobs: Callable  # add_jobs(context: SourceContext) creates the source's jobs and adds them to the scheduler, returning any state reload needs
+    groups: tuple = ()  # Names of the job groups add_jobs adds
+    reload: Optional[Callable] = None  # reload(context, state) applies a reloaded config to the running source
+
+
+_loaded = {}
+
+
+def load_source(section: str) -> DataSource:
+    """Imports the source registered for section."""
+    if section not in _loaded:
+        module = importlib.import_module(SOURCE_MODULES[section])
+        _loaded[section] = module.SOURCE
+        logger.debug(f"Loaded data source {section} from {SOURCE_MODULES[section]}")
+    return _loaded[section]
+
+
+class SourceContext:
+    """What a source's add_jobs creates and schedules its jobs with."""
+
+    def __init__(self, db_engine, config, writer, scheduler, leases=None, shards=1):
+        """
+        db_engine:  engine the source's results are written to
+        config:     the validated config
+        writer:     BatchWriter the source's jobs hand their results to
+        scheduler:  GroupedDelayScheduler the job groups are added to
+        leases:     ShardLeases splitting the groups between replicas, if coordinating
+        shards:     number of shards each group is split into
+        """
+        self.db_engine = db_engine
+        self.config = config
+        self.writer = writer
+        self.scheduler = scheduler
+        self.leases = leases
+        self.shards = shards
+
+    def group_delay(self, section: str, url: str):
+        """
+        The group delay configured in section: fixed, or an adaptive rate limiter fed
+        by the responses from url's host.
+        """
+        from utils.fetch import get_fetcher
+        from utils.metrics import SOURCE_RATE, SOURCE_PENALTIES
+        from utils.rate import group_delay_from_config
+
+        delay = group_delay_from_config(self.config[section], section)
+        if not isinstance(delay, (int, float)):
+            get_fetcher().register_limiter(url, delay)
+            SOURCE_RATE.set_function(lambda: delay.rate, source=section)
+            SOURCE_PENALTIES.set_function(lambda: delay.stats()["penalties"], source=section)
+        else:
+            get_fetcher().register_limiter(url, None)
+        return delay
+
+    def retune_group_delay(self, name: str, section: str, url: str):
+        """
+        Applies the delay settings of section to the group name after a reload. An
+        adaptive group which stays adaptive keeps its limiter and current rate.
+        """
+        from utils.rate import AdaptiveRateLimiter
+
+        settings = self.config[section]
+        current = self.scheduler.group_delay(name)
+        if settings.get("adaptive", False) and isinstance(current, AdaptiveRateLimiter):
+            current.set_bounds(settings["mindelay"], settings["maxdelay"])
+        else:
+            self.scheduler.set_group_delay(name, self.group_delay(section, url))
+
+    def add_job_group(self, name: str, jobs: list, group_delay, policy=None):
+        """Adds jobs to the scheduler as the group name, sharded between replicas if coordinating."""
+        if self.leases is not None:
+            self.leases.add_jobs(name, jobs, self.shards)
+        self.scheduler.add_job_group(jobs, group_delay=group_delay, name=name, policy=policy)
+
+    def resize_job_group(self, name: str, jobs: list):
+        """Replaces the jobs of the group name, e.g. when a source's page set changes."""
+        if self.leases is not None:
+            self.leases.add_jobs(name, jobs, self.shards)
+        self.scheduler.set_group_jobs(name, jobs)
+
+    def remove_job_group(self, name: str):
+        """Removes the group name from the scheduler, and its shards from the leases."""
+        if self.leases is not None:
+            self.leases.remove_jobs(name)
+        self.scheduler.remove_job_group(name)
+
+
+class RunningSources:
+    """
+    The sources whose jobs are in the scheduler. apply starts the sources which the
+    config enables and stops those it no longer enables. Sources which keep running
+    see their sections' new values (Config.load updates sections in place) and get
+    their reload called, e.g. to retune their group delay.
+    """
+
+    def __init__(self, context: SourceContext, partitioned=False, partitioned_tables=None):
+        """
+        context:             what the sources create their jobs with
+        partitioned:         whether the sources' tables are partitioned by month
+        partitioned_tables:  list the sources' partitioned tables are added to, shared
+                             with the partition maintenance job
+        """
+        self.context = context
+        self.partitioned = partitioned
+        self.partitioned_tables = partitioned_tables if partitioned_tables is not None else []
+        self.record_tables = []  # Record tables of the sources started, shared with the archive job
+        self._running = {}  # section -> state returned by the source's add_jobs
+        self._applied = False
+
+    @property
+    def running(self) -> list[str]:
+        return list(self._running)
+
+    def apply(self):
+        """Brings the running sources in line with context.config."""
+        config = self.context.config
+        for section in SOURCE_MODULES:
+            enabled = section in config and config[section]["enabled"]
+            if enabled and section not in self._running:
+                self._start(section)
+            elif not enabled and section in self._running:
+                self._stop(section)
+            elif enabled:
+                source = load_source(section)
+                if source.reload is not None:
+                    source.reload(self.context, self._running[section])
+        self._applied = True
+
+    def _start(self, section: str):
+        source = load_source(section)
+        source.load_tables(self.context.db_engine, partitioned=self.partitioned)
+        tables = [t for t in source.partitioned_tables() if t not in self.record_tables]
+        self.record_tables.extend(tables)
+        if self.partitioned:
+            self.partitioned_tables.extend(tables)
+            if self._applied:
+                # Started by a reload, create this month's partitions before the first insert
+                from utils.partitioning import ensure_partitions
+
+                ensure_partitions(self.context.db_engine, tables)
+        self._running[section] = source.add_jobs(self.context)
+        logger.info(f"Started data source {section}")
+
+    def _stop(self, section: str):
+        source = load_source(section)
+        for name in source.groups:
+            self.context.remove_job_group(name)
+        del self._running[section]
+        logger.info(f"Stopped data source {section}")
@@ -1,14 +1,16 @@
-import math
 from enum import Enum
 from urllib.parse import urlencode
-import requests
-import json
 import logging
-from external_data.steam.models import ItemRecord
-from external_data.errors import MalformedContent, RateLimitException
+from data_sources.steam.models import ItemRow
+from data_sources.steam.parse import parse_listings
+from data_sources.errors import MalformedContent, NotModified, RateLimitException
 from scheduling.job import RepeatableJob
 from functools import partial
-from utils.data_pull import create_update_partial
+from utils.data_pull import PulledItems, create_update_partial
+from utils.fetch import get_fetcher, retry_after_seconds
+from utils.parsing import run_parser
+from data_sources.steam.delta import LastSeenIndex
+from data_sources.steam.pages import ListingPages, MAX_PAGE_SIZE
 
 
 logger = logging.getLogger(__name__)
@@ -35,7 +37,25 @@ class SortDir(Enum):
     DESC = "desc"
 
 
-def create_steam_jobs(db_engine, config) -> list[RepeatableJob]:
+def create_steam_jobs(
+    db_engine, config, writer=None, on_resize=None, on_change=None
+) -> list[RepeatableJob]:
+    """
+    Creates the page jobs for the app's listings. numitems only sizes the initial
+    page set, which then follows the total_count Steam reports; on_resize is called
+    with the new job list whenever the number of pages changes. on_change is called
+    with a page's job and whether its items changed every time it is pulled.
+    """
+    return create_steam_pages(db_engine, config, writer, on_resize, on_change).jobs()
+
+
+def create_steam_pages(
+    db_engine, config, writer=None, on_resize=None, on_change=None, last_seen=None
+) -> ListingPages:
+    """
+    Like create_steam_jobs, but returns the ListingPages the jobs belong to. In delta
+    mode, last_seen is the LastSeenIndex to use, by default one warmed from db_engine.
+    """
     if "appid" not in config:
         raise ValueError('Config must contain an "appid" field.')
     if "numitems" not in config:
@@ -43,39 +63,76 @@ def create_steam_jobs(db_engine, config) -> list[RepeatableJob]:
 
     app_id = int(config["appid"])
     num_items = int(config["numitems"])
-    max_fails = int(config["maxfailures"])
-
-    jobs = []
-
-    for i in range(math.ceil(num_items / 100)):
+    # Read on every attempt, so a reloaded maxfailures applies
+    max_fails = lambda: int(config["maxfailures"])
+
+    # In delta mode, only items whose listings or price changed are stored
+    item_filter = None
+    on_written = None
+    if config.get("deltamode", False):
+        if last_seen is None:
+            last_seen = LastSeenIndex()
+            last_seen.warm(db_engine)
+        item_filter = last_seen.changed
+        on_written = last_seen.seen
+
+    def make_job(start: int, count: int) -> RepeatableJob:
         data_part = partial(
-            get_listings_page, config, app_id=app_id, count=100, start=i * 100
+            get_listings_page,
+            config,
+            app_id=app_id,
+            count=count,
+            start=start,
+            pages=pages,
         )
 
         update_part = create_update_partial(
             db_engine,
             service_name="Steam",
-            title=f"{app_id} Item Listings ({i * 100}-{(i + 1) * 100})",
+            title=f"{app_id} Item Listings ({start}-{start + count})",
             data_partial=data_part,
             max_fails=max_fails,
+            writer=writer,
+            item_filter=item_filter,
+            on_written=on_written,
         )
 
-        jobs.append(RepeatableJob(partial=update_part))
+        return RepeatableJob(partial=update_part, name=f"steam-{app_id}-{start}")
+
+    # Keep a response cache entry for every page, the pages are pulled in turn
+    cache = get_fetcher().cache
+
+    def resized(jobs: list[RepeatableJob]):
+        cache.reserve(f"steam-{app_id}", len(jobs))
+        if on_resize is not None:
+            on_resize(jobs)
 
-    return jobs
+    pages = ListingPages(make_job, num_items, on_resize=resized, on_change=on_change)
+    cache.reserve(f"steam-{app_id}", len(pages.jobs()))
+    return pages
 
 
 def get_listings_page(
     config,
     app_id: int,
     start=0,
-    count=100,
+    count=MAX_PAGE_SIZE,
     sort_col=SortColumn.NAME,
     sort_dir=SortDir.ASC,
     use_scrapeops=False,
     headers=DEFAULT_HEADERS,
+    pages: ListingPages = None,
     **req_kwargs,
-) -> (int, list[ItemRecord]):
+) -> list[ItemRow]:
+    """
+    Pulls one page of the app's listings. The total_count of the response and the
+    page's rows are reported to pages. A page starting past the end of the listing returns no
+    rows instead of failing, it is dropped from the page set.
+
+    If the config enables skipunchanged and the response is the same as the page's
+    last stored response, NotModified is raised instead of parsing it again. The
+    response is stored once the returned rows are committed.
+    """
     query_str = urlencode(
         {
             "query": "",
@@ -91,41 +148,54 @@ def get_listings_page(
 
     url = f"{BASE_URL}/market/search/render?{query_str}"
 
-    resp = requests.get(url, headers=headers)
+    skip_unchanged = config.get("skipunchanged", False)
+    fetcher = get_fetcher()
+    resp = fetcher.get(url, headers=headers, conditional=skip_unchanged, **req_kwargs)
 
     if resp.status_code == 429:
-        # 120 is a somewhat arbitrary constant. It could be worth it to read this from  an environmental variable.
-        wait_for = float(config["overloaddelay"].replace(",", ""))
+        # Honour Retry-After if Steam sends one, otherwise wait for the configured overload delay
+        wait_for = retry_after_seconds(resp)
+        if wait_for is None:
+            wait_for = float(config["overloaddelay"])
         raise RateLimitException(
             wait_for,
             f"Rate limit exceeded for {url}. Wait {wait_for} seconds before trying again.",
         )
+    elif skip_unchanged and fetcher.cache.not_modified(url, resp):
+        if pages is not None:
+            pages.observe_unchanged(start)
+        raise NotModified(f"Page {start}-{start + count} has not changed")
     elif resp.status_code != 200:
         resp.raise_for_status()
 
-    data = json.loads(resp.text)
-
-    # Response must contain these fields:
-    if "results" not in data:
-        raise MalformedContent('"results" not found')
-    if "total_count" not in data:
-        raise MalformedContent('"total_count" not found')
-    if not isinstance(data["results"], list):
-        raise MalformedContent('"results" is not a list')
-    if len(data["results"]) == 0:
-        raise MalformedContent('"results" contained no elements')
-
-    all_records = []
-    for result in data["results"]:
-        all_records.append(
-            ItemRecord(
-                item_url="",
-                name=result["name"],
-                hash_name=result["hash_name"],
-                sell_listings=result["sell_listings"],
-                sell_price=result["sell_price"],
-                sale_price_text=result["sale_price_text"],
+    total_count, all_records = run_parser(
+        "Steam", parse_listings, resp.content, allow_empty=True
+    )
+
+    # Steam answers with no results and a total_count of 0 when it is struggling,
+    # which must not shrink the page set
+    if total_count == 0:
+        raise MalformedContent(f"No results and a total_count of 0 for {url}")
+    if pages is not None:
+        pages.observe_total(total_count)
+
+    if len(all_records) == 0:
+        if start >= total_count:
+            logger.info(
+                f"Page {start}-{start + count} is past the end of the listing ({total_count} items)"
             )
+            return _remember_response(all_records, fetcher, url, resp, skip_unchanged)
+        raise MalformedContent(
+            f"No results for {url} though the listing has {total_count} items"
         )
+    if pages is not None:
+        pages.observe_page(start, all_records)
+    return _remember_response(all_records, fetcher, url, resp, skip_unchanged)
+
 
-    return all_records
+def _remember_response(records, fetcher, url, resp, skip_unchanged) -> list[ItemRow]:
+    # The response is only cached once its rows are committed, a failed write must not
+    # make the next identical response look unchanged
+    if not skip_unchanged:
+        return records
+    return PulledItems(records, on_written=partial(fetcher.cache.store, url, resp))
@@ -0,0 +1,63 @@
+import logging
+import threading
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from data_sources.steam.models import ItemRecord
+
+logger = logging.getLogger(__name__)
+
+# Fields which must change for an item to be stored again
+TRACKED_FIELDS = ("sell_listings", "sell_price", "sale_price_text")
+
+
+class LastSeenIndex:
+    """
+    In-memory index of the last stored tracked fields of each item, keyed by hash_name.
+
+    Used by the change-only ("delta") storage mode: items whose tracked fields are the
+    same as their last stored record are dropped before writing. The data update record
+    of each page pull acts as the heartbeat for the items which were left out, so an
+    item's price at any time is its latest record as of that time.
+
+    Items are only recorded as seen once their write has committed (seen), so an
+    update the writer drops is written again on the next pull.
+    """
+
+    def __init__(self):
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._last)
+
+    def warm(self, db_engine):
+        """
+        Loads the latest stored record of every item from the database, e.g. again
+        after taking over pages which another replica was writing.
+        """
+        latest_ids = select(func.max(ItemRecord.id)).group_by(ItemRecord.hash_name)
+        stmt = select(
+            ItemRecord.hash_name, *(getattr(ItemRecord, f) for f in TRACKED_FIELDS)
+        ).where(ItemRecord.id.in_(latest_ids))
+
+        with Session(db_engine) as session:
+            with self._lock:
+                for row in session.execute(stmt.execution_options(yield_per=5000)):
+                    self._last[row[0]] = tuple(row[1:])
+
+        logger.info(f"Loaded last seen state of {len(self._last)} items")
+
+    def changed(self, items: list) -> list:
+        """Returns the items which changed since they were last seen."""
+        with self._lock:
+            return [
+                item
+                for item in items
+                if self._last.get(item.hash_name) != tuple(getattr(item, f) for f in TRACKED_FIELDS)
+            ]
+
+    def seen(self, items: list):
+        """Records items as seen, once they have been written."""
+        with self._lock:
+            for item in items:
+                self._last[item.hash_name] = tuple(getattr(item, f) for f in TRACKED_FIELDS)
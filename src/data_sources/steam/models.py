@@ -1,7 +1,9 @@
 from datetime import datetime
-from typing import Optional
+from typing import NamedTuple, Optional
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-from sqlalchemy import func
+from sqlalchemy import Index, func
+from utils.db import load_metadata
+from utils.partitioning import create_partitioned_table
 
 
 class Base(DeclarativeBase):
@@ -10,6 +12,10 @@ class Base(DeclarativeBase):
 
 class ItemRecord(Base):
     __tablename__ = "steam_item_records"
+    __table_args__ = (
+        Index("ix_steam_item_records_hash_name_created_at", "hash_name", "created_at"),
+        Index("ix_steam_item_records_name_created_at", "name", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     item_url: Mapped[int] = Mapped[Optional[str]]
@@ -27,6 +33,31 @@ class ItemRecord(Base):
         )
 
 
-def load_tables(engine):
-    """Creates tables if they do not exist. Does nothing if a table exists. Table schemas are not validated."""
-    Base.metadata.create_all(engine)
+class ItemRow(NamedTuple):
+    """
+    A scraped steam_item_records row. Written with bulk inserts, so no ItemRecord
+    (and its ORM instance state) is created for rows which are only written once.
+    """
+
+    name: str
+    hash_name: str
+    sell_listings: int
+    sell_price: int
+    sale_price_text: str
+
+    # Table the row is written to (a plain class attribute, not a field)
+    model = ItemRecord
+
+
+def load_tables(engine, partitioned=False):
+    """
+    Creates tables and indexes if they do not exist. Does nothing if a table exists. Table schemas are not validated.
+    If partitioned, new record tables are partitioned by month on created_at (PostgreSQL only).
+    """
+    if partitioned:
+        create_partitioned_table(engine, ItemRecord.__table__)
+    load_metadata(engine, Base.metadata)
+
+
+def partitioned_tables():
+    return [ItemRecord.__table__]
@@ -0,0 +1,119 @@
+import math
+import logging
+import threading
+from typing import Callable, Optional
+from scheduling.job import RepeatableJob
+
+logger = logging.getLogger(__name__)
+
+# Largest count market/search/render accepts, larger requests are cut down to it
+MAX_PAGE_SIZE = 100
+
+
+class ListingPages:
+    """
+    The page jobs covering one app's market listings.
+
+    The page set starts out sized for num_items and then follows the total_count
+    Steam reports with every page. Whenever the number of pages changes, on_resize
+    is called with the new job list. Jobs are created once per start offset and
+    reused, so a page which drops out and comes back keeps its state.
+
+    If on_change is given, it is called with a page's job and whether the page's
+    items (listings and prices) changed since the page was last pulled, e.g. to
+    feed a ChangeRatePolicy.
+    """
+
+    def __init__(
+        self,
+        make_job: Callable[[int, int], RepeatableJob],
+        num_items: int,
+        page_size: int = MAX_PAGE_SIZE,
+        on_resize: Optional[Callable[[list[RepeatableJob]], None]] = None,
+        on_change: Optional[Callable[[RepeatableJob, bool], None]] = None,
+    ):
+        """
+        make_job:   creates the job pulling page_size items from a start offset, called as make_job(start, page_size)
+        num_items:  number of items expected before Steam has reported a total_count
+        page_size:  items requested per page
+        on_resize:  called with the new job list whenever the number of pages changes
+        on_change:  called with a page's job and whether its items changed, every time it is pulled
+        """
+        if not 0 < page_size <= MAX_PAGE_SIZE:
+            raise ValueError(f"page_size must be between 1 and {MAX_PAGE_SIZE}")
+
+        self.page_size = page_size
+        self.on_resize = on_resize
+        self.on_change = on_change
+        self.total_count = None
+        self._make_job = make_job
+        self._num_pages = self._pages_for(num_items)
+        self._jobs = {}
+        self._fingerprints = {}
+        self._lock = threading.Lock()
+
+    def _pages_for(self, num_items: int) -> int:
+        # Always keep one page, it is what discovers the listing growing again
+        return max(1, math.ceil(num_items / self.page_size))
+
+    def _job(self, start: int) -> RepeatableJob:
+        if start not in self._jobs:
+            self._jobs[start] = self._make_job(start, self.page_size)
+        return self._jobs[start]
+
+    def _current_jobs(self) -> list[RepeatableJob]:
+        return [self._job(i * self.page_size) for i in range(self._num_pages)]
+
+    def jobs(self) -> list[RepeatableJob]:
+        """The jobs of the current page set, in page order."""
+        with self._lock:
+            return self._current_jobs()
+
+    def observe_total(self, total_count: int):
+        """Records the total_count of a response, resizing the page set if needed."""
+        with self._lock:
+            self.total_count = total_count
+            num_pages = self._pages_for(total_count)
+            if num_pages == self._num_pages:
+                return
+            logger.info(
+                f"Listing has {total_count} items, resizing from {self._num_pages} to {num_pages} pages"
+            )
+            self._num_pages = num_pages
+
+            # Resize under the lock, so concurrent pages cannot apply their totals out of order
+            if self.on_resize is not None:
+                self.on_resize(self._current_jobs())
+
+    def set_num_items(self, num_items: int):
+        """
+        Resizes the page set for num_items, e.g. after the config was reloaded.
+        Once Steam has reported a total_count, the page set follows that instead.
+        """
+        with self._lock:
+            num_pages = self._pages_for(num_items)
+            if self.total_count is not None or num_pages == self._num_pages:
+                return
+            logger.info(f"Resizing from {self._num_pages} to {num_pages} pages for {num_items} items")
+            self._num_pages = num_pages
+            if self.on_resize is not None:
+                self.on_resize(self._current_jobs())
+
+    def observe_page(self, start: int, rows: list):
+        """Records the rows pulled for the page at start, reporting whether they changed."""
+        fingerprint = hash(tuple((r.hash_name, r.sell_listings, r.sell_price) for r in rows))
+        with self._lock:
+            previous = self._fingerprints.get(start)
+            self._fingerprints[start] = fingerprint
+            job = self._job(start)
+        # The first pull only sets the baseline
+        if previous is not None and self.on_change is not None:
+            self.on_change(job, fingerprint != previous)
+
+    def observe_unchanged(self, start: int):
+        """Records a pull of the page at start whose response had not changed."""
+        with self._lock:
+            seen = start in self._fingerprints
+            job = self._job(start)
+        if seen and self.on_change is not None:
+            self.on_change(job, False)
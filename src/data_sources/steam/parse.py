@@ -0,0 +1,54 @@
+import json
+from data_sources.errors import MalformedContent
+from data_sources.steam.models import ItemRow
+
+try:
+    # orjson decodes the response bytes directly, several times faster than json
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+
+def parse_listings(content: bytes, allow_empty: bool = False) -> tuple[int, list[ItemRow]]:
+    """
+    Decodes a market/search/render?norender=1 response body into (total_count, rows).
+    The body is decoded from bytes (orjson when installed), and each result goes
+    straight into an ItemRow. An empty "results" list is malformed unless allow_empty.
+    """
+    try:
+        data = _loads(content)
+    except ValueError as e:
+        raise MalformedContent(f"Response is not valid JSON: {e}")
+
+    # Response must contain these fields:
+    if not isinstance(data, dict):
+        raise MalformedContent("Response is not an object")
+    if "results" not in data:
+        raise MalformedContent('"results" not found')
+    if "total_count" not in data:
+        raise MalformedContent('"total_count" not found')
+    results = data["results"]
+    if not isinstance(results, list):
+        raise MalformedContent('"results" is not a list')
+    if not isinstance(data["total_count"], int):
+        raise MalformedContent('"total_count" is not an integer')
+    if len(results) == 0 and not allow_empty:
+        raise MalformedContent('"results" contained no elements')
+
+    try:
+        rows = [
+            ItemRow(
+                r["name"],
+                r["hash_name"],
+                r["sell_listings"],
+                r["sell_price"],
+                r["sale_price_text"],
+            )
+            for r in results
+        ]
+    except (KeyError, TypeError) as e:
+        raise MalformedContent(f"Result is missing a field: {e}")
+
+    return data["total_count"], rows
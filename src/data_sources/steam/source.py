@@ -0,0 +1,123 @@
+import logging
+from dataclasses import dataclass
+from functools import partial
+from schema import And, Or, Optional, Use
+from config.config import to_bool
+from data_sources.registry import DataSource, SourceContext
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = {
+    "Steam": {
+        "groupdelay": Use(int),
+        Optional("adaptive", default=False): Use(to_bool),
+        Optional("mindelay", default=1): Use(float),
+        Optional("maxdelay", default=300): Use(float),
+    },
+    "Steam.ItemListings": {
+        "enabled": Use(to_bool),
+        "appid": Use(int),
+        "numitems": Use(int),
+        "maxfailures": Use(int),
+        "overloaddelay": Use(int),
+        Optional("deltamode", default=False): Use(to_bool),
+        Optional("skipunchanged", default=False): Use(to_bool),
+        Optional("policy", default="roundrobin"): And(
+            Use(str.lower), Or("roundrobin", "changerate")
+        ),
+    },
+}
+
+
+def load_tables(db_engine, partitioned=False):
+    from data_sources.steam.models import load_tables
+
+    load_tables(db_engine, partitioned=partitioned)
+
+
+def partitioned_tables() -> list:
+    from data_sources.steam.models import partitioned_tables
+
+    return partitioned_tables()
+
+
+@dataclass
+class _Running:
+    pages: object  # ListingPages
+    policy: object  # ChangeRatePolicy, None going round-robin
+    appid: int
+    deltamode: bool
+
+
+def _create_policy(config: dict):
+    from scheduling.policies import ChangeRatePolicy
+
+    # Optionally revisit the pages whose prices change most often more often
+    return ChangeRatePolicy() if config["policy"] == "changerate" else None
+
+
+def _warm_taken_over(last_seen, db_engine, acquired: frozenset):
+    # Another replica may have written these pages' items since the index was loaded
+    if any(shard.rsplit(":", 1)[0] == "Steam.ItemListings" for shard in acquired):
+        last_seen.warm(db_engine)
+
+
+def add_jobs(context: SourceContext) -> _Running:
+    from data_sources.steam.api import create_steam_pages, BASE_URL
+
+    config = context.config["Steam.ItemListings"]
+    policy = _create_policy(config)
+
+    # When coordinating, the delta mode index is loaded whenever shards are taken over
+    last_seen = None
+    if config["deltamode"] and context.leases is not None:
+        from data_sources.steam.delta import LastSeenIndex
+
+        last_seen = LastSeenIndex()
+        context.leases.add_listener(partial(_warm_taken_over, last_seen, context.db_engine))
+
+    # The page set follows the listing's total_count, resizing the group as it changes
+    pages = create_steam_pages(
+        context.db_engine,
+        config,
+        writer=context.writer,
+        on_resize=lambda jobs: context.resize_job_group("Steam.ItemListings", jobs),
+        on_change=policy.observe if policy is not None else None,
+        last_seen=last_seen,
+    )
+
+    context.add_job_group(
+        "Steam.ItemListings",
+        pages.jobs(),
+        group_delay=context.group_delay("Steam", BASE_URL),
+        policy=policy,
+    )
+    return _Running(pages, policy, config["appid"], config["deltamode"])
+
+
+def reload(context: SourceContext, running: _Running):
+    from data_sources.steam.api import BASE_URL
+
+    config = context.config["Steam.ItemListings"]
+    context.retune_group_delay("Steam.ItemListings", "Steam", BASE_URL)
+    running.pages.set_num_items(config["numitems"])
+
+    if (config["policy"] == "changerate") != (running.policy is not None):
+        running.policy = _create_policy(config)
+        running.pages.on_change = running.policy.observe if running.policy is not None else None
+        context.scheduler.set_group_policy("Steam.ItemListings", running.policy)
+        logger.info(f"Steam.ItemListings now uses the {config['policy']} policy")
+
+    if (config["appid"], config["deltamode"]) != (running.appid, running.deltamode):
+        logger.warning("Changes to Steam.ItemListings appid and deltamode apply after a restart")
+
+
+SOURCE = DataSource(
+    section="Steam.ItemListings",
+    schema=SCHEMA,
+    load_tables=load_tables,
+    partitioned_tables=partitioned_tables,
+    add_jobs=add_jobs,
+    groups=("Steam.ItemListings",),
+    reload=reload,
+)
@@ -0,0 +1,54 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from data_sources.steam.models import ItemRecord, load_tables
+from data_sources.steam.delta import LastSeenIndex
+
+
+def _item(hash_name, price, listings=1):
+    return ItemRecord(
+        name=hash_name,
+        hash_name=hash_name,
+        sell_listings=listings,
+        sell_price=price,
+        sale_price_text=f"${price / 100:.2f}",
+    )
+
+
+def test_LastSeenIndex_only_returns_changed_items():
+    index = LastSeenIndex()
+
+    first = [_item("a", 100), _item("b", 200)]
+    assert index.changed(first) == first
+    index.seen(first)
+
+    second = [_item("a", 100), _item("b", 250), _item("c", 300)]
+    assert [i.hash_name for i in index.changed(second)] == ["b", "c"]
+
+    assert index.changed([_item("a", 100, listings=2)])[0].hash_name == "a"
+
+
+def test_LastSeenIndex_keeps_items_changed_until_seen():
+    index = LastSeenIndex()
+    items = [_item("a", 100)]
+
+    # Not written yet (or dropped by the writer), so still changed
+    assert index.changed(items) == items
+    assert index.changed(items) == items
+
+    index.seen(items)
+    assert index.changed(items) == []
+
+
+def test_LastSeenIndex_warms_from_latest_records():
+    engine = create_engine("sqlite:///:memory:")
+    load_tables(engine)
+    with Session(engine) as session:
+        session.add_all([_item("a", 100), _item("b", 200), _item("a", 150)])
+        session.commit()
+
+    index = LastSeenIndex()
+    index.warm(engine)
+
+    assert len(index) == 2
+    assert index.changed([_item("a", 150), _item("b", 200)]) == []
+    assert len(index.changed([_item("a", 100)])) == 1
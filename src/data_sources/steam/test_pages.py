@@ -0,0 +1,72 @@
+from functools import partial
+import pytest
+from scheduling.job import RepeatableJob
+from data_sources.steam.models import ItemRow
+from data_sources.steam.pages import ListingPages, MAX_PAGE_SIZE
+
+
+def _make_job(start, count):
+    return RepeatableJob(partial(print, start, count), name=f"page-{start}")
+
+
+def test_ListingPages_initial_size():
+    pages = ListingPages(_make_job, num_items=250)
+
+    assert [job.name for job in pages.jobs()] == ["page-0", "page-100", "page-200"]
+
+
+def test_ListingPages_resizes_to_total_count():
+    resized = []
+    pages = ListingPages(_make_job, num_items=250, on_resize=resized.append)
+    first_jobs = pages.jobs()
+
+    pages.observe_total(420)
+    assert [job.name for job in resized[-1]] == [f"page-{i * 100}" for i in range(5)]
+    # Existing pages keep their jobs
+    assert resized[-1][:3] == first_jobs
+
+    pages.observe_total(90)
+    assert [job.name for job in resized[-1]] == ["page-0"]
+
+    # Same number of pages, no resize
+    pages.observe_total(60)
+    assert len(resized) == 2
+
+
+def test_ListingPages_set_num_items():
+    resized = []
+    pages = ListingPages(_make_job, num_items=250, on_resize=resized.append)
+
+    pages.set_num_items(150)
+    assert [job.name for job in resized[-1]] == ["page-0", "page-100"]
+
+    # Once Steam reported a total, numitems no longer sizes the page set
+    pages.observe_total(420)
+    pages.set_num_items(100)
+    assert len(pages.jobs()) == 5
+
+
+def test_ListingPages_keeps_one_page():
+    pages = ListingPages(_make_job, num_items=0)
+    assert len(pages.jobs()) == 1
+
+
+def test_ListingPages_page_size_limit():
+    with pytest.raises(ValueError):
+        ListingPages(_make_job, num_items=100, page_size=MAX_PAGE_SIZE + 1)
+
+
+def test_ListingPages_reports_changes():
+    changes = []
+    pages = ListingPages(_make_job, num_items=100, on_change=lambda job, changed: changes.append(changed))
+    rows = [ItemRow("a", "a", 1, 100, "$1.00"), ItemRow("b", "b", 5, 200, "$2.00")]
+
+    pages.observe_page(0, rows)
+    pages.observe_page(0, rows)
+    pages.observe_page(0, [rows[0], rows[1]._replace(sell_price=210)])
+
+    pages.observe_unchanged(0)
+    pages.observe_unchanged(100)
+
+    # The first pull only sets the baseline
+    assert changes == [False, True, False]
@@ -0,0 +1,39 @@
+import json
+import pytest
+from benchmarks.fixtures import steam_search_json
+from data_sources.errors import MalformedContent
+from data_sources.steam.models import ItemRecord, ItemRow
+from data_sources.steam.parse import parse_listings
+
+
+def test_parse_listings_rows():
+    total_count, rows = parse_listings(steam_search_json(start=100, total_count=150))
+
+    assert total_count == 150
+    assert len(rows) == 50
+    assert isinstance(rows[0], ItemRow)
+    assert rows[0].name == "Item 100"
+    assert rows[0].model is ItemRecord
+    assert set(rows[0]._asdict()) <= set(ItemRecord.__table__.columns.keys())
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        b"not json",
+        b"[]",
+        json.dumps({"total_count": 1}).encode(),
+        json.dumps({"results": [{"name": "x"}], "total_count": 1}).encode(),
+        json.dumps({"results": [], "total_count": 0}).encode(),
+        json.dumps({"results": {}, "total_count": 0}).encode(),
+    ],
+)
+def test_parse_listings_malformed(body):
+    with pytest.raises(MalformedContent):
+        parse_listings(body)
+
+
+def test_parse_listings_allow_empty():
+    body = json.dumps({"results": [], "total_count": 120}).encode()
+
+    assert parse_listings(body, allow_empty=True) == (120, [])
@@ -0,0 +1,118 @@
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+import pytest
+from schema import SchemaError
+from data_sources.registry import SOURCE_MODULES, load_source
+from root_conf_schema import root_config_schema
+
+SRC = Path(__file__).parent.parent
+
+YAHOO_ONLY = {
+    "YahooFinance": {"groupdelay": "30"},
+    "YahooFinance.Currency": {"enabled": "True", "maxfailures": "8", "overloaddelay": "120"},
+    "Steam": {"groupdelay": "1"},
+    "Steam.ItemListings": {"enabled": "False"},
+}
+
+
+def test_sources_registered():
+    for section in SOURCE_MODULES:
+        source = load_source(section)
+        assert source.section == section
+        assert section in source.schema
+
+
+def test_schema_validates_enabled_sources_only():
+    config = root_config_schema.validate(YAHOO_ONLY)
+
+    assert config["YahooFinance.Currency"]["enabled"] is True
+    assert config["YahooFinance.Currency"]["skipunchanged"] is False
+    # The disabled source's sections are dropped, not validated
+    assert "Steam.ItemListings" not in config
+    assert "Steam" not in config
+    assert config["Executor"]["workers"] == 4
+
+
+def test_schema_errors_for_enabled_source():
+    with pytest.raises(SchemaError):
+        root_config_schema.validate({"Steam.ItemListings": {"enabled": "True"}})
+
+
+def test_disabled_sources_are_not_imported():
+    script = textwrap.dedent(
+        f"""
+        import sys
+        import main
+        from root_conf_schema import root_config_schema
+        root_config_schema.validate({YAHOO_ONLY!r})
+        print(sorted(m for m in sys.modules if m.startswith("data_sources.") or m == "bs4"))
+        """
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", script], cwd=SRC, capture_output=True, text=True, check=True
+    ).stdout
+
+    assert "data_sources.yahoofinance.source" in out
+    assert "data_sources.steam" not in out
+    assert "bs4" not in out
+
+
+def test_RunningSources_applies_reloads(tmp_path):
+    from sqlalchemy import create_engine
+    from config.config import Config
+    from data_sources.registry import RunningSources, SourceContext
+    from scheduling.schedulers import GroupedDelayScheduler
+
+    ini = tmp_path / "config.ini"
+
+    def write(yahoo_delay, steam_enabled, yahoo_enabled="True"):
+        ini.write_text(
+            textwrap.dedent(
+                f"""
+                [YahooFinance]
+                groupdelay={yahoo_delay}
+                [YahooFinance.Currency]
+                enabled={yahoo_enabled}
+                maxfailures=8
+                overloaddelay=120
+                [Steam]
+                groupdelay=1
+                [Steam.ItemListings]
+                enabled={steam_enabled}
+                appid=730
+                numitems=250
+                maxfailures=3
+                overloaddelay=60
+                """
+            )
+        )
+
+    write(30, "False")
+    config = Config(str(ini), root_config_schema)
+    engine = create_engine(f"sqlite:///{tmp_path / 'scraper.db'}")
+    sched = GroupedDelayScheduler()
+    sources = RunningSources(SourceContext(engine, config, None, sched))
+    yahoo_section = config["YahooFinance.Currency"]
+
+    sources.apply()
+    assert sources.running == ["YahooFinance.Currency"]
+
+    # Start Steam and retune Yahoo
+    write(10, "True")
+    config.load()
+    sources.apply()
+    assert sources.running == ["YahooFinance.Currency", "Steam.ItemListings"]
+    assert sched.group_delay("YahooFinance.Currency") == 10
+    assert sched.group_delay("Steam.ItemListings") == 1
+    # Running jobs hold the section, which is updated in place
+    assert config["YahooFinance.Currency"] is yahoo_section
+
+    # Stop Yahoo
+    write(10, "True", yahoo_enabled="False")
+    config.load()
+    sources.apply()
+    assert sources.running == ["Steam.ItemListings"]
+    with pytest.raises(ValueError):
+        sched.group_delay("YahooFinance.Currency")
@@ -1,11 +1,11 @@
-import requests
 import logging
-from bs4 import BeautifulSoup
-from external_data.yahoofinance.models import CurrencyRecord
-from external_data.errors import MalformedContent, RateLimitException
+from data_sources.errors import NotModified, RateLimitException
+from data_sources.yahoofinance.parse import parse_currency_content, quote_tables
 from scheduling.job import RepeatableJob
 from functools import partial
-from utils.data_pull import create_update_partial
+from utils.data_pull import PulledItems, create_update_partial
+from utils.fetch import get_fetcher, retry_after_seconds
+from utils.parsing import run_parser
 
 
 logger = logging.getLogger(__name__)
@@ -18,10 +18,11 @@ DEFAULT_HEADERS = {
 }
 
 
-def create_currency_jobs(db_engine, config) -> list[RepeatableJob]:
+def create_currency_jobs(db_engine, config, writer=None) -> list[RepeatableJob]:
     jobs = []
 
-    max_fails = int(config["maxfailures"])
+    # Read on every attempt, so a reloaded maxfailures applies
+    max_fails = lambda: int(config["maxfailures"])
 
     data_part = partial(get_currency_page, config, headers=DEFAULT_HEADERS)
 
@@ -31,9 +32,10 @@ def create_currency_jobs(db_engine, config) -> list[RepeatableJob]:
         title="Currencies",
         data_partial=data_part,
         max_fails=max_fails,
+        writer=writer,
     )
 
-    jobs.append(RepeatableJob(partial=update_part))
+    jobs.append(RepeatableJob(partial=update_part, name="yahoofinance-currencies"))
 
     return jobs
 
@@ -41,32 +43,33 @@ def create_currency_jobs(db_engine, config) -> list[RepeatableJob]:
 def get_currency_page(config, headers=DEFAULT_HEADERS):
     url = f"{BASE_URL}/currencies"
 
-    resp = requests.get(BASE_URL, headers=headers)
+    skip_unchanged = config.get("skipunchanged", False)
+    fetcher = get_fetcher()
+    resp = fetcher.get(BASE_URL, headers=headers, conditional=skip_unchanged)
 
-    if resp.status_code != 200:
-        # 120 is a somewhat arbitrary constant. It could be worth it to read this from  an environmental variable.
-        wait_for = float(config["OverloadSleepTime"].replace(",", ""))
+    if resp.status_code == 429:
+        # Honour Retry-After if Yahoo sends one, otherwise wait for the configured overload delay
+        wait_for = retry_after_seconds(resp)
+        if wait_for is None:
+            wait_for = float(config["overloaddelay"])
         raise RateLimitException(
             wait_for,
             f"Rate limit exceeded for {url}. Wait {wait_for} seconds before trying again.",
         )
+    # The page's scripts change with every request, only the quote tables are compared
+    tables = quote_tables(resp.content) if skip_unchanged else None
+    if skip_unchanged and fetcher.cache.not_modified(BASE_URL, resp, tables):
+        raise NotModified("Currency quotes have not changed")
+    elif resp.status_code != 200:
+        resp.raise_for_status()
+
+    all_records = run_parser(
+        "Yahoo Finance", parse_currency_content, resp.content, resp.encoding or "utf-8"
+    )
 
-    soup = BeautifulSoup(resp.text, "html.parser")
-
-    names = soup.find_all("td", attrs={"aria-label": "Name"})
-    prices = soup.find_all("td", attrs={"aria-label": "Last Price"})
-
-    if len(names) != len(prices):
-        raise MalformedContent(
-            f"Number of names ({len(names)}) does not match number of prices ({len(prices)})."
+    if skip_unchanged:
+        # Only cached once the quotes are committed, so a failed write is pulled again
+        return PulledItems(
+            all_records, on_written=partial(fetcher.cache.store, BASE_URL, resp, tables)
         )
-
-    all_records = []
-    for result in zip(names, prices):
-        name = result[0].text
-        price = float(result[1].text.replace(",", ""))
-
-        record = CurrencyRecord(name=name, last_price=price)
-        all_records.append(record)
-
     return all_records
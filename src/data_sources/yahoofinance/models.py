@@ -1,7 +1,9 @@
 from datetime import datetime
-from typing import Optional
+from typing import NamedTuple
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-from sqlalchemy import func
+from sqlalchemy import Index, func
+from utils.db import load_metadata
+from utils.partitioning import create_partitioned_table
 
 
 class Base(DeclarativeBase):
@@ -10,6 +12,9 @@ class Base(DeclarativeBase):
 
 class CurrencyRecord(Base):
     __tablename__ = "yahoofinance_currency_records"
+    __table_args__ = (
+        Index("ix_yahoofinance_currency_records_name_created_at", "name", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str]
@@ -20,6 +25,28 @@ class CurrencyRecord(Base):
         return f"CurrencyRecord(id={self.id}, name={self.name}, last_price={self.last_price})"
 
 
-def load_tables(engine):
-    """Creates tables if they do not exist. Does nothing if a table exists. Table schemas are not validated."""
-    Base.metadata.create_all(engine)
+class CurrencyRow(NamedTuple):
+    """
+    A scraped yahoofinance_currency_records row. A plain tuple, so it pickles cheaply
+    out of the parse pool and is written with bulk inserts.
+    """
+
+    name: str
+    last_price: float
+
+    # Table the row is written to (a plain class attribute, not a field)
+    model = CurrencyRecord
+
+
+def load_tables(engine, partitioned=False):
+    """
+    Creates tables and indexes if they do not exist. Does nothing if a table exists. Table schemas are not validated.
+    If partitioned, new record tables are partitioned by month on created_at (PostgreSQL only).
+    """
+    if partitioned:
+        create_partitioned_table(engine, CurrencyRecord.__table__)
+    load_metadata(engine, Base.metadata)
+
+
+def partitioned_tables():
+    return [CurrencyRecord.__table__]
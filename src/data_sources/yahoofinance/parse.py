@@ -0,0 +1,92 @@
+import logging
+from html.parser import HTMLParser
+from data_sources.yahoofinance.models import CurrencyRow
+from data_sources.errors import MalformedContent
+
+logger = logging.getLogger(__name__)
+
+
+class _CurrencyCellParser(HTMLParser):
+    """Collects the text of the <td aria-label="..."> cells with the given labels, without building a tree."""
+
+    def __init__(self, labels):
+        super().__init__()
+        self.cells = {label: [] for label in labels}
+        self._label = None  # Label of the cell currently being read
+        self._text = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "td" and self._label is None:
+            label = dict(attrs).get("aria-label")
+            if label in self.cells:
+                self._label = label
+                self._text = []
+
+    def handle_endtag(self, tag):
+        if tag == "td" and self._label is not None:
+            self.cells[self._label].append("".join(self._text).strip())
+            self._label = None
+
+    def handle_data(self, data):
+        if self._label is not None:
+            self._text.append(data)
+
+
+def quote_tables(content: bytes) -> bytes:
+    """The part of the page holding the quote tables, without the scripts around them."""
+    start = content.find(b"<table")
+    end = content.rfind(b"</table>")
+    if start == -1 or end == -1:
+        return content
+    return content[start : end + len(b"</table>")]
+
+
+def _parse_cells_fast(html: str) -> tuple[list[str], list[str]]:
+    """Streams only the tables of the page through a flat parser."""
+    # The page is mostly scripts and styles, the quotes are all within the tables
+    start = html.find("<table")
+    end = html.rfind("</table>")
+    if start != -1 and end != -1:
+        html = html[start : end + len("</table>")]
+
+    parser = _CurrencyCellParser(("Name", "Last Price"))
+    parser.feed(html)
+    parser.close()
+    return parser.cells["Name"], parser.cells["Last Price"]
+
+
+def _parse_cells_soup(html: str) -> tuple[list[str], list[str]]:
+    """Builds the full BeautifulSoup tree of the page, slow but tolerant of odd markup."""
+    # Only imported for pages the fast parser cannot handle
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+
+    names = soup.find_all("td", attrs={"aria-label": "Name"})
+    prices = soup.find_all("td", attrs={"aria-label": "Last Price"})
+    return [n.text for n in names], [p.text for p in prices]
+
+
+def parse_currency_page(html: str) -> list[CurrencyRow]:
+    """
+    Parses the currencies page. The fast flat parser is tried first, the full
+    BeautifulSoup parse is used if it finds nothing or mismatched columns.
+    """
+    names, prices = _parse_cells_fast(html)
+    if len(names) == 0 or len(names) != len(prices):
+        logger.debug("Fast currency parse failed, falling back to BeautifulSoup")
+        names, prices = _parse_cells_soup(html)
+
+    if len(names) != len(prices):
+        raise MalformedContent(
+            f"Number of names ({len(names)}) does not match number of prices ({len(prices)})."
+        )
+
+    return [
+        CurrencyRow(name, float(price.replace(",", ""))) for name, price in zip(names, prices)
+    ]
+
+
+def parse_currency_content(content: bytes, encoding: str = "utf-8") -> list[CurrencyRow]:
+    """parse_currency_page for the raw response body, e.g. in the parse pool."""
+    return parse_currency_page(content.decode(encoding, errors="replace"))
@@ -0,0 +1,61 @@
+from schema import Optional, Use
+from config.config import to_bool
+from data_sources.registry import DataSource, SourceContext
+
+
+SCHEMA = {
+    "YahooFinance": {
+        "groupdelay": Use(int),
+        Optional("adaptive", default=False): Use(to_bool),
+        Optional("mindelay", default=1): Use(float),
+        Optional("maxdelay", default=300): Use(float),
+    },
+    "YahooFinance.Currency": {
+        "enabled": Use(to_bool),
+        "maxfailures": Use(int),
+        "overloaddelay": Use(int),
+        Optional("skipunchanged", default=False): Use(to_bool),
+    },
+}
+
+
+def load_tables(db_engine, partitioned=False):
+    from data_sources.yahoofinance.models import load_tables
+
+    load_tables(db_engine, partitioned=partitioned)
+
+
+def partitioned_tables() -> list:
+    from data_sources.yahoofinance.models import partitioned_tables
+
+    return partitioned_tables()
+
+
+def add_jobs(context: SourceContext):
+    from data_sources.yahoofinance.api import create_currency_jobs, BASE_URL
+
+    jobs = create_currency_jobs(
+        context.db_engine, context.config["YahooFinance.Currency"], writer=context.writer
+    )
+    context.add_job_group(
+        "YahooFinance.Currency",
+        jobs,
+        group_delay=context.group_delay("YahooFinance", BASE_URL),
+    )
+
+
+def reload(context: SourceContext, running):
+    from data_sources.yahoofinance.api import BASE_URL
+
+    context.retune_group_delay("YahooFinance.Currency", "YahooFinance", BASE_URL)
+
+
+SOURCE = DataSource(
+    section="YahooFinance.Currency",
+    schema=SCHEMA,
+    load_tables=load_tables,
+    partitioned_tables=partitioned_tables,
+    add_jobs=add_jobs,
+    groups=("YahooFinance.Currency",),
+    reload=reload,
+)
@@ -0,0 +1,47 @@
+import pytest
+from benchmarks.fixtures import yahoo_currencies_html, CURRENCIES
+from data_sources.errors import MalformedContent
+from data_sources.yahoofinance.models import CurrencyRecord
+from data_sources.yahoofinance.parse import (
+    parse_currency_page,
+    _parse_cells_fast,
+    _parse_cells_soup,
+    quote_tables,
+)
+
+
+def test_fast_parser_matches_soup():
+    html = yahoo_currencies_html(script_kb=20)
+
+    fast = _parse_cells_fast(html)
+    soup = _parse_cells_soup(html)
+
+    assert fast == soup
+    assert fast[0] == CURRENCIES
+
+
+def test_parse_currency_page_records():
+    html = (
+        '<table><tr><td aria-label="Name">EUR/USD</td>'
+        + '<td aria-label="Last Price"><span>1,234.5</span></td></tr></table>'
+    )
+    records = parse_currency_page(html)
+
+    assert len(records) == 1
+    assert records[0].name == "EUR/USD"
+    assert records[0].last_price == 1234.5
+    assert records[0].model is CurrencyRecord
+
+
+def test_parse_currency_page_mismatched_columns():
+    html = '<table><tr><td aria-label="Name">EUR/USD</td></tr></table>'
+
+    with pytest.raises(MalformedContent):
+        parse_currency_page(html)
+
+
+def test_quote_tables_ignores_scripts():
+    page = b'<script>nonce=1</script><table><tr><td aria-label="Name">EUR/USD</td></tr></table><script>x</script>'
+
+    assert quote_tables(page) == b'<table><tr><td aria-label="Name">EUR/USD</td></tr></table>'
+    assert quote_tables(page.replace(b"nonce=1", b"nonce=2")) == quote_tables(page)
@@ -1,18 +1,30 @@
 import os
 import time
 import sys
-import threading
+import signal
 import logging
 from scheduling.schedulers import GroupedDelayScheduler
+from scheduling.executor import JobExecutor
 from models import load_tables as init_main_db_tables
+from models import partitioned_tables as main_partitioned_tables
 from utils.db import init_engine
+from utils.writer import BatchWriter
+from utils.partitioning import create_partition_jobs, MAINTENANCE_DELAY
+from utils.leasing import ShardLeases, create_lease_jobs
+from utils.archive import create_archive_jobs
+from utils.checkpoint import (
+    DatabaseCheckpointStore,
+    FileCheckpointStore,
+    SchedulerCheckpointer,
+    create_checkpoint_jobs,
+)
+from utils.profiling import SlowJobProfiler
+from utils.parsing import start_parse_pool, stop_parse_pool
+from utils.metrics import start_metrics_server
 from config.config import Config
+from config.watch import ConfigWatcher, create_reload_jobs
 from root_conf_schema import root_config_schema
-
-from data_sources.steam.models import load_tables as init_steam_db_tables
-from data_sources.steam.api import create_steam_jobs
-from data_sources.yahoofinance.models import load_tables as init_yahoofinance_db_tables
-from data_sources.yahoofinance.api import create_currency_jobs
+from data_sources.registry import SourceContext, RunningSources
 
 # Initialize the logger
 logging.basicConfig(
@@ -22,6 +34,19 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Sections only read at startup, the data sources' sections apply on reload
+RESTART_SECTIONS = {
+    "Executor",
+    "Metrics",
+    "Profiling",
+    "Parsing",
+    "Database",
+    "Coordination",
+    "Writer",
+    "Reload",
+    "Checkpoint",
+}
+
 
 def main(config: Config):
     logger.info("Starting application")
@@ -46,35 +71,137 @@ def main(config: Config):
 
     logger.info(f"Running with database dialect: {db_engine.dialect.name}")
 
-    # Initialize the main database tables if they do not exist
-    init_main_db_tables(db_engine)
+    if config["Metrics"]["enabled"]:
+        start_metrics_server(config["Metrics"]["port"], config["Metrics"]["host"])
 
-    # Create the scheduler
-    sched = GroupedDelayScheduler()
+    # Record tables are partitioned by month on PostgreSQL if enabled
+    partitioned = config["Database"]["partitioning"]
+    partitioned_tables = main_partitioned_tables()
 
-    # Add the jobs to the scheduler...
-    if config["YahooFinance.Currency"]["enabled"]:
-        init_yahoofinance_db_tables(db_engine)
+    # Initialize the main database tables if they do not exist
+    init_main_db_tables(db_engine, partitioned=partitioned)
+
+    # Optionally parse responses in worker processes, off the fetching and writing threads
+    start_parse_pool(config["Parsing"]["processes"])
+
+    # Jobs hand their results to the writer, which commits them in batches
+    writer = BatchWriter(
+        db_engine,
+        max_queue=config["Writer"]["queuesize"],
+        batch_rows=config["Writer"]["batchrows"],
+        batch_interval=config["Writer"]["batchinterval"],
+    )
+
+    # With coordination enabled, replicas sharing the database lease disjoint shards of the jobs
+    leases = None
+    if config["Coordination"]["enabled"]:
+        leases = ShardLeases(db_engine, lease_ttl=config["Coordination"]["leasettl"])
+        logger.info(f"Coordinating with other replicas as {leases.owner}")
+
+    # Create the scheduler, only one job per group may run at a time so group delays still hold
+    sched = GroupedDelayScheduler(
+        max_in_flight_per_group=1,
+        job_filter=leases.owns if leases is not None else None,
+    )
+
+    # Add the jobs of the enabled data sources, only these are imported
+    context = SourceContext(
+        db_engine,
+        config,
+        writer,
+        sched,
+        leases=leases,
+        shards=config["Coordination"]["shards"],
+    )
+    sources = RunningSources(context, partitioned, partitioned_tables)
+    sources.apply()
+
+    # Keep creating the upcoming monthly partitions
+    if partitioned:
+        sched.add_job_group(
+            create_partition_jobs(db_engine, partitioned_tables),
+            group_delay=MAINTENANCE_DELAY,
+            name="Partitions",
+        )
 
+    # Move old records to columnar files, keeping the record tables small
+    if config["Archive"]["enabled"]:
         sched.add_job_group(
-            create_currency_jobs(db_engine, config["YahooFinance.Currency"]),
-            group_delay=int(config["YahooFinance"]["groupdelay"]),
+            create_archive_jobs(db_engine, sources.record_tables, config["Archive"]),
+            group_delay=config["Archive"]["interval"],
+            name="Archive",
         )
 
-    if config["Steam.ItemListings"]["enabled"]:
-        # Initialize database tables if they do not exist
-        init_steam_db_tables(db_engine)
+    # Claim shards before starting, then keep renewing the leases well within their ttl
+    if leases is not None:
+        leases.renew()
+        sched.add_job_group(
+            create_lease_jobs(leases),
+            group_delay=config["Coordination"]["leasettl"] / 3,
+            name="Leases",
+        )
 
-        # Add the jobs to the scheduler
+    # Apply changes to the config file (or on SIGHUP) to the running sources
+    def on_reload(changed: set):
+        sources.apply()
+        restart = sorted(changed & RESTART_SECTIONS)
+        if len(restart) > 0:
+            logger.warning(f"Changes to sections {restart} apply after a restart")
+
+    watcher = ConfigWatcher(config, on_reload, watch_file=config["Reload"]["watchfile"])
+    sched.add_job_group(
+        create_reload_jobs(watcher),
+        group_delay=config["Reload"]["interval"],
+        name="Config",
+    )
+
+    # Resume the groups' cycles, cooldowns and retries where the last run stopped, and keep saving them
+    checkpointer = None
+    if config["Checkpoint"]["enabled"]:
+        store = (
+            FileCheckpointStore(config["Checkpoint"]["file"])
+            if config["Checkpoint"]["file"]
+            else DatabaseCheckpointStore(db_engine)
+        )
+        checkpointer = SchedulerCheckpointer(sched, store)
+        checkpointer.restore()
         sched.add_job_group(
-            create_steam_jobs(db_engine, config["Steam.ItemListings"]),
-            group_delay=int(config["Steam"]["groupdelay"]),
+            create_checkpoint_jobs(checkpointer),
+            group_delay=config["Checkpoint"]["interval"],
+            name="Checkpoint",
+        )
+
+    # Optionally dump profiles of jobs slower than the threshold
+    profiler = None
+    if config["Profiling"]["enabled"]:
+        profiler = SlowJobProfiler(
+            config["Profiling"]["threshold"], config["Profiling"]["directory"]
         )
 
-    while True:
-        job = sched.next_job()
-        t = threading.Thread(target=job.execute)
-        t.run()
+    executor = JobExecutor(
+        sched, max_workers=config["Executor"]["workers"], profiler=profiler
+    )
+
+    # Finish running jobs and exit cleanly when the container is stopped
+    signal.signal(signal.SIGTERM, lambda signum, frame: executor.stop())
+    signal.signal(signal.SIGINT, lambda signum, frame: executor.stop())
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, lambda signum, frame: watcher.request_reload())
+
+    executor.run()
+
+    # Save where the cycles stopped, for the next start
+    if checkpointer is not None:
+        checkpointer.save()
+
+    # Flush results of the jobs which finished while shutting down
+    stop_parse_pool()
+    writer.close()
+
+    # Let the other replicas take over our shards straight away
+    if leases is not None:
+        leases.release()
+    logger.info("Application stopped")
 
 
 if __name__ == "__main__":
@@ -1,7 +1,10 @@
+from dataclasses import dataclass
 from datetime import datetime
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-from sqlalchemy import func
-from typing import Optional
+from sqlalchemy import Index, func
+from typing import ClassVar, Optional
+from utils.db import load_metadata
+from utils.partitioning import create_partitioned_table
 
 
 class Base(DeclarativeBase):
@@ -10,6 +13,14 @@ class Base(DeclarativeBase):
 
 class DataUpdateRecord(Base):
     __tablename__ = "data_update_records"
+    __table_args__ = (
+        Index(
+            "ix_data_update_records_service_name_title_created_at",
+            "service_name",
+            "title",
+            "created_at",
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     service_name: Mapped[str]
@@ -18,9 +29,80 @@ class DataUpdateRecord(Base):
     message: Mapped[Optional[str]]
     attempts: Mapped[int]
     run_time: Mapped[float]
+    # Breakdown of the attempt, in seconds (backoff_time is the wait since the previous attempt failed)
+    fetch_time: Mapped[Optional[float]]
+    parse_time: Mapped[Optional[float]]
+    backoff_time: Mapped[Optional[float]]
+    write_time: Mapped[Optional[float]]  # From handing the rows to the writer until they were inserted
+    bytes_downloaded: Mapped[Optional[int]]
+    row_count: Mapped[Optional[int]]
+    not_modified: Mapped[Optional[bool]]  # The response had not changed, so nothing was parsed or stored
     created_at: Mapped[datetime] = mapped_column(default=func.now())
 
 
-def load_tables(engine):
-    """Creates tables if they do not exist. Does nothing if a table exists. Table schemas are not validated."""
-    Base.metadata.create_all(engine)
+@dataclass(slots=True)
+class UpdateRow:
+    """
+    A data_update_records row, filled in by data_update as the update progresses.
+    A plain slotted object rather than a DataUpdateRecord, it is only written once.
+    """
+
+    service_name: str
+    title: str
+    success: Optional[bool] = None
+    message: Optional[str] = None
+    attempts: Optional[int] = None
+    run_time: Optional[float] = None
+    fetch_time: Optional[float] = None
+    parse_time: Optional[float] = None
+    backoff_time: Optional[float] = None
+    write_time: Optional[float] = None
+    bytes_downloaded: Optional[int] = None
+    row_count: Optional[int] = None
+    not_modified: Optional[bool] = None
+
+    # Table the row is written to
+    model: ClassVar = DataUpdateRecord
+
+
+class ShardLease(Base):
+    """A shard of jobs, owned by the replica in owner until expires_at (UTC)."""
+
+    __tablename__ = "shard_leases"
+
+    shard: Mapped[str] = mapped_column(primary_key=True)
+    owner: Mapped[Optional[str]]
+    expires_at: Mapped[datetime]
+
+
+class ReplicaHeartbeat(Base):
+    """A running replica, considered dead once expires_at (UTC) has passed."""
+
+    __tablename__ = "replica_heartbeats"
+
+    owner: Mapped[str] = mapped_column(primary_key=True)
+    expires_at: Mapped[datetime]
+
+
+class SchedulerCheckpoint(Base):
+    """Scheduler state of a job group (JSON), saved at saved_at (UTC) to resume it after a restart."""
+
+    __tablename__ = "scheduler_checkpoints"
+
+    group_name: Mapped[str] = mapped_column(primary_key=True)
+    state: Mapped[str]
+    saved_at: Mapped[datetime]
+
+
+def load_tables(engine, partitioned=False):
+    """
+    Creates tables and indexes if they do not exist. Does nothing if a table exists. Table schemas are not validated.
+    If partitioned, new record tables are partitioned by month on created_at (PostgreSQL only).
+    """
+    if partitioned:
+        create_partitioned_table(engine, DataUpdateRecord.__table__)
+    load_metadata(engine, Base.metadata)
+
+
+def partitioned_tables():
+    return [DataUpdateRecord.__table__]
@@ -1,21 +1,102 @@
-from schema import Schema, Use
+import logging
+from schema import And, Or, Schema, Use, Optional
+from config.config import to_bool as _to_bool
+from data_sources.registry import SOURCE_MODULES, load_source
+
+logger = logging.getLogger(__name__)
+
+
+class _RootConfigSchema(Schema):
+    """
+    The application's sections, plus the sections of the data sources the config
+    enables (data_sources.registry), whose schemas are only imported when enabled.
+    Sections of disabled sources and unknown sections are dropped with a warning.
+    """
+
+    def validate(self, data, **kwargs):
+        schema = dict(self.schema)
+        for section in SOURCE_MODULES:
+            # A source is enabled by its section, unless the section sets enabled=false
+            if section in data and _to_bool(data[section].get("enabled", "true")):
+                schema.update(load_source(section).schema)
+
+        known = {getattr(key, "schema", key) for key in schema}
+        for section in [s for s in data if s not in known]:
+            logger.warning(f"Ignoring config section [{section}] (unknown, or of a disabled data source)")
+        data = {section: values for section, values in data.items() if section in known}
+
+        return Schema(schema).validate(data, **kwargs)
+
 
 # Define the schema for the root config file
-root_config_schema = Schema(
+root_config_schema = _RootConfigSchema(
     {
-        "Steam": {"groupdelay": Use(int)},
-        "Steam.ItemListings": {
-            "enabled": Use(bool),
-            "appid": Use(int),
-            "numitems": Use(int),
-            "maxfailures": Use(int),
-            "overloaddelay": Use(int),
-        },
-        "YahooFinance": {"groupdelay": Use(int)},
-        "YahooFinance.Currency": {
-            "enabled": Use(bool),
-            "maxfailures": Use(int),
-            "overloaddelay": Use(int),
+        Optional("Executor", default={"workers": 4}): {
+            Optional("workers", default=4): Use(int),
+        },
+        Optional("Metrics", default={"enabled": False, "host": "0.0.0.0", "port": 9100}): {
+            Optional("enabled", default=False): Use(_to_bool),
+            Optional("host", default="0.0.0.0"): str,
+            Optional("port", default=9100): Use(int),
+        },
+        Optional(
+            "Profiling",
+            default={"enabled": False, "threshold": 30.0, "directory": "/tmp/scraper-profiles"},
+        ): {
+            Optional("enabled", default=False): Use(_to_bool),
+            Optional("threshold", default=30.0): Use(float),
+            Optional("directory", default="/tmp/scraper-profiles"): str,
+        },
+        Optional("Parsing", default={"processes": 0}): {
+            Optional("processes", default=0): Use(int),
+        },
+        Optional("Database", default={"partitioning": False}): {
+            Optional("partitioning", default=False): Use(_to_bool),
+        },
+        Optional(
+            "Coordination", default={"enabled": False, "shards": 3, "leasettl": 60}
+        ): {
+            Optional("enabled", default=False): Use(_to_bool),
+            Optional("shards", default=3): Use(int),
+            Optional("leasettl", default=60): Use(int),
+        },
+        Optional("Checkpoint", default={"enabled": False, "interval": 30.0, "file": ""}): {
+            Optional("enabled", default=False): Use(_to_bool),
+            Optional("interval", default=30.0): Use(float),
+            Optional("file", default=""): str,
+        },
+        Optional(
+            "Archive",
+            default={
+                "enabled": False,
+                "directory": "/var/lib/scraper/archive",
+                "maxage": 90,
+                "partition": "day",
+                "format": "parquet",
+                "compression": "zstd",
+                "batchrows": 50000,
+                "interval": 3600.0,
+            },
+        ): {
+            Optional("enabled", default=False): Use(_to_bool),
+            Optional("directory", default="/var/lib/scraper/archive"): str,
+            Optional("maxage", default=90): Use(int),
+            Optional("partition", default="day"): And(Use(str.lower), Or("day", "month")),
+            Optional("format", default="parquet"): And(Use(str.lower), Or("parquet", "arrow")),
+            Optional("compression", default="zstd"): Use(str.lower),
+            Optional("batchrows", default=50000): Use(int),
+            Optional("interval", default=3600.0): Use(float),
+        },
+        Optional("Reload", default={"interval": 5.0, "watchfile": True}): {
+            Optional("interval", default=5.0): Use(float),
+            Optional("watchfile", default=True): Use(_to_bool),
+        },
+        Optional(
+            "Writer", default={"queuesize": 1000, "batchrows": 5000, "batchinterval": 1.0}
+        ): {
+            Optional("queuesize", default=1000): Use(int),
+            Optional("batchrows", default=5000): Use(int),
+            Optional("batchinterval", default=1.0): Use(float),
         },
     }
 )
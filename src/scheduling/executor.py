@@ -0,0 +1,78 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from scheduling.job import RepeatableJob, RetryJob
+from scheduling.schedulers import Scheduler
+
+logger = logging.getLogger(__name__)
+
+
+class JobExecutor:
+    """
+    Runs jobs from a Scheduler on a bounded pool of worker threads.
+
+    The executor only asks the scheduler for a new job once a worker is free,
+    so jobs are never queued up behind a busy pool (which would break group
+    delays). When a job finishes, the scheduler is notified through job_done,
+    and jobs which raise RetryJob are handed back to the scheduler's retry.
+    """
+
+    def __init__(
+        self, scheduler: Scheduler, max_workers: int = 4, poll_interval=1.0, profiler=None
+    ):
+        """
+        scheduler:      scheduler providing the jobs to run
+        max_workers:    maximum number of jobs running at once
+        poll_interval:  how often (seconds) the dispatch loop checks for a stop request
+                        while waiting on the scheduler
+        profiler:       optional utils.profiling.SlowJobProfiler to run the jobs with
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+
+        self.scheduler = scheduler
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self.profiler = profiler
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._stop = threading.Event()
+        self._pool = None
+
+    def run(self):
+        """Dispatch jobs until stop() is called. Blocks the calling thread."""
+        logger.info(f"Starting job executor with {self.max_workers} workers")
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="job"
+        )
+        try:
+            while not self._stop.is_set():
+                # Wait for a free worker before taking a job from the scheduler
+                if not self._slots.acquire(timeout=self.poll_interval):
+                    continue
+
+                job = self.scheduler.next_job(timeout=self.poll_interval)
+                if job is None:
+                    self._slots.release()
+                    continue
+
+                self._pool.submit(self._run_job, job)
+        finally:
+            logger.info("Job executor stopping, waiting for running jobs to finish...")
+            self._pool.shutdown(wait=True)
+            logger.info("Job executor stopped")
+
+    def stop(self):
+        """Request the dispatch loop to exit. Running jobs are allowed to finish."""
+        self._stop.set()
+
+    def _run_job(self, job: RepeatableJob):
+        try:
+            if self.profiler is not None:
+                self.profiler.run(job)
+            else:
+                job.execute()
+        except RetryJob as e:
+            self.scheduler.retry(job, e.wait_for, group_cooldown=e.group_cooldown)
+        finally:
+            self.scheduler.job_done(job)
+            self._slots.release()
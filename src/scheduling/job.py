@@ -1,23 +1,48 @@
 import logging
+from utils.metrics import JOB_SECONDS, JOB_ERRORS
 
 logger = logging.getLogger(__name__)
 
 
+class RetryJob(Exception):
+    """
+    Raised by a job's function to ask the scheduler to run the job again later,
+    instead of sleeping inside the job.
+
+    wait_for:       seconds to wait before the job may run again
+    group_cooldown: if True, the job's whole group is put on cooldown for wait_for
+                    (e.g. a rate limit which applies to a whole host)
+    """
+
+    def __init__(self, wait_for: float, group_cooldown: bool = False, message=""):
+        super().__init__(message)
+        self.wait_for = wait_for
+        self.group_cooldown = group_cooldown
+        self.message = message
+
+
 class RepeatableJob:
     """
     Just contains a partial function
     """
 
-    def __init__(self, partial):
+    def __init__(self, partial, name=None):
         """
         partial:        partial to be executed
+        name:           optional name, used in logs and profiles
         """
         self.partial = partial
+        self.name = name
 
     def execute(self):
+        """Runs the partial. RetryJob is passed on to the caller, other exceptions are logged."""
         try:
-            self.partial()
+            with JOB_SECONDS.time():
+                self.partial()
+        except RetryJob:
+            raise
         except Exception as e:
+            JOB_ERRORS.inc()
             logging.info(
                 f"Job produced an exception that was not caught within it's function, continuing as normal, but logging. Error: {str(e)}",
                 exc_info=True,
@@ -0,0 +1,203 @@
+import abc
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+from scheduling.job import RepeatableJob
+
+
+class SelectionPolicy(abc.ABC):
+    """
+    Chooses which job of a group runs next. GroupedDelayScheduler decides when a
+    group runs, a policy given to add_job_group decides which of its jobs runs.
+    Groups without a policy go round-robin.
+    """
+
+    @abc.abstractmethod
+    def select(
+        self, jobs: list[RepeatableJob], ready: Callable[[RepeatableJob], bool], now: float
+    ) -> Optional[RepeatableJob]:
+        """
+        Returns the job to run next out of jobs, or None if ready rejects all of them.
+        Called with the scheduler's lock held and its clock's time.
+        """
+        pass
+
+
+@dataclass
+class _ChangeEstimate:
+    visits: float = 0  # Decayed number of visits following an earlier visit
+    changes: float = 0  # Decayed number of those visits which found a change
+    elapsed: float = 0  # Decayed seconds between those visits and the visits before them
+    last_visit: Optional[float] = None
+    selected_at: Optional[float] = None
+
+    def rate(self) -> Optional[float]:
+        """Estimated changes per second, None before the second visit."""
+        if self.visits == 0 or self.elapsed <= 0:
+            return None
+        # Estimator for a Poisson process only seen at visits (Cho & Garcia-Molina), a
+        # visit can show at most one change however many happened since the last one.
+        # The extra 0.5 in the denominator keeps a page which has not changed yet from
+        # being estimated to never change.
+        unchanged = (self.visits - self.changes + 0.5) / (self.visits + 1)
+        return -math.log(unchanged) / (self.elapsed / self.visits)
+
+
+def _frequency_for(rate: float, marginal: float) -> float:
+    """
+    Visit frequency of a page changing at rate at which one more visit per second
+    gains marginal freshness. Freshness at frequency f is f / rate * (1 - exp(-rate / f)),
+    its derivative is g(x) / rate with x = rate / f and g(x) = 1 - exp(-x) - x * exp(-x).
+    """
+    target = marginal * rate
+    if target >= 1:
+        return 0.0  # Changes too often for visits to keep it fresh
+    # g rises from 0 to 1, bisect for x on a log scale
+    low, high = 1e-9, 60.0
+    for _ in range(30):
+        x = math.sqrt(low * high)
+        if 1 - math.exp(-x) - x * math.exp(-x) < target:
+            low = x
+        else:
+            high = x
+    return rate / math.sqrt(low * high)
+
+
+def optimal_frequencies(rates: list[float], total: float) -> list[float]:
+    """
+    Splits total visits per second between pages changing at rates (changes per
+    second) to maximise their average freshness (Cho & Garcia-Molina): every page
+    gets the frequency at which one more visit gains the same freshness. Pages which
+    change much faster than they can be visited get no visits.
+    """
+    if len(rates) == 0:
+        return []
+    # The total frequency falls as the marginal gain rises, bisect on a log scale
+    low, high = 1e-12, 1 / min(rates)
+    for _ in range(30):
+        marginal = math.sqrt(low * high)
+        if sum(_frequency_for(rate, marginal) for rate in rates) > total:
+            low = marginal
+        else:
+            high = marginal
+    return [_frequency_for(rate, high) for rate in rates]
+
+
+class ChangeRatePolicy(SelectionPolicy):
+    """
+    Revisits jobs whose data changes often more often than jobs whose data rarely
+    changes, raising the share of the stored data which is up to date for the same
+    number of requests.
+
+    Jobs report whether their data changed through observe. Each job's changes are
+    modelled as a Poisson process whose rate is estimated from its visits, with older
+    visits weighted down by decay. The group's request rate, measured from the calls
+    to select, is split into a target visit frequency per job by optimal_frequencies.
+    Jobs which change far faster than they could be revisited are not worth chasing
+    and get fewer visits than round-robin would give them, not more.
+
+    select runs the job furthest past its target interval. Jobs which never ran go
+    first, jobs without an estimate yet use the mean rate of the others, and every
+    job keeps at least min_share of its round-robin share of the visits. Targets are
+    recomputed once per round of visits, selection is O(n) in the number of jobs.
+    """
+
+    def __init__(
+        self,
+        min_share: float = 0.1,
+        decay: float = 0.95,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        min_share:  fraction of its round-robin visits every job keeps
+        decay:      weight of a visit relative to the next one, lower adapts faster
+        clock:      must be the clock of the scheduler the policy is used in
+        """
+        if not 0 < min_share <= 1:
+            raise ValueError("min_share must be between 0 and 1")
+        if not 0 < decay <= 1:
+            raise ValueError("decay must be between 0 and 1")
+
+        self.min_share = min_share
+        self.decay = decay
+        self._clock = clock
+        self._estimates = {}
+        self._targets = {}  # id(job) -> target visits per second
+        self._observed = 0  # Observations since the targets were computed
+        self._last_select = None
+        self._select_interval = None  # Decayed mean seconds between selections
+        self._lock = threading.Lock()
+
+    def _estimate(self, job: RepeatableJob) -> _ChangeEstimate:
+        return self._estimates.setdefault(id(job), _ChangeEstimate())
+
+    def observe(self, job: RepeatableJob, changed: bool):
+        """Records a visit of job, and whether it found the job's data changed."""
+        now = self._clock()
+        with self._lock:
+            estimate = self._estimate(job)
+            if estimate.last_visit is not None:
+                estimate.visits = estimate.visits * self.decay + 1
+                estimate.changes = estimate.changes * self.decay + bool(changed)
+                estimate.elapsed = estimate.elapsed * self.decay + (now - estimate.last_visit)
+                self._observed += 1
+            estimate.last_visit = now
+
+    def rate(self, job: RepeatableJob) -> Optional[float]:
+        """Estimated changes per second of job, None if unknown."""
+        with self._lock:
+            return self._estimate(job).rate()
+
+    def target_frequency(self, job: RepeatableJob) -> Optional[float]:
+        """Visits per second job is currently aimed at, None before targets are computed."""
+        with self._lock:
+            return self._targets.get(id(job))
+
+    def _update_targets(self, jobs: list[RepeatableJob]):
+        rates = [self._estimate(job).rate() for job in jobs]
+        known = [rate for rate in rates if rate is not None]
+        if len(known) == 0 or self._select_interval is None:
+            return
+        default_rate = sum(known) / len(known)
+        rates = [default_rate if rate is None else rate for rate in rates]
+
+        total = 1 / self._select_interval
+        min_frequency = self.min_share * total / len(jobs)
+        frequencies = optimal_frequencies(rates, total)
+        self._targets = {
+            id(job): max(frequency, min_frequency) for job, frequency in zip(jobs, frequencies)
+        }
+        self._observed = 0
+
+    def select(self, jobs, ready, now):
+        with self._lock:
+            if self._last_select is not None:
+                interval = now - self._last_select
+                self._select_interval = (
+                    interval
+                    if self._select_interval is None
+                    else self._select_interval * self.decay + interval * (1 - self.decay)
+                )
+            self._last_select = now
+
+            if self._observed >= len(jobs) or any(id(job) not in self._targets for job in jobs):
+                self._update_targets(jobs)
+
+            best, best_overdue = None, -1.0
+            for job in jobs:
+                if not ready(job):
+                    continue
+                estimate = self._estimate(job)
+                if estimate.selected_at is None:
+                    overdue = math.inf
+                else:
+                    # Until there are targets, the least recently run job goes first
+                    overdue = (now - estimate.selected_at) * self._targets.get(id(job), 1)
+                if overdue > best_overdue:
+                    best, best_overdue = job, overdue
+
+            if best is not None:
+                self._estimate(best).selected_at = now
+            return best
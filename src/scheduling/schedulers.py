@@ -1,8 +1,13 @@
 import abc
 import time
+import heapq
+import itertools
 import logging
-from dataclasses import dataclass
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Optional
 from scheduling.job import RepeatableJob
+from utils.metrics import SCHEDULER_IDLE_SECONDS, GROUP_LAG_SECONDS
 
 logger = logging.getLogger(__name__)
 
@@ -11,7 +16,16 @@ class Scheduler(abc.ABC):
     """Schedulers must simply define a next_job method."""
 
     @abc.abstractmethod
-    def next_job(self) -> RepeatableJob:
+    def next_job(self, timeout: Optional[float] = None) -> Optional[RepeatableJob]:
+        """Blocks until a job is due. Returns None if timeout (seconds) expires first."""
+        pass
+
+    def job_done(self, job: RepeatableJob):
+        """Called by executors once a job returned by next_job has finished running."""
+        pass
+
+    def retry(self, job: RepeatableJob, wait_for: float, group_cooldown: bool = False):
+        """Called by executors when a job asks to be run again after wait_for seconds."""
         pass
 
 
@@ -19,26 +33,90 @@ class Scheduler(abc.ABC):
 class _JobGroup:
     jobs: list
     job_offset: int
-    last_job_start: int  # Time the last job was requested...
-    delay: int
+    last_job_start: float  # Time the last job was requested...
+    delay: object  # Seconds, or an object with a (changing) delay attribute such as AdaptiveRateLimiter
+    name: str = ""
+    in_flight: int = 0  # Number of jobs from this group currently running
+    queued: bool = False  # Whether the group currently has an entry in the scheduler heap
+    entry: int = -1  # seq of the group's current heap entry, older entries are stale
+    cooldown_until: float = float("-inf")  # No job from the group may start before this
+    retries: list = field(default_factory=list)  # Heap of (not_before, seq, job) waiting to be retried
+    retrying: set = field(default_factory=set)  # ids of jobs in retries
+    policy: object = None  # SelectionPolicy choosing the next job, round-robin if None
+    removed: bool = False  # Whether the group was removed from the scheduler
+
+    def current_delay(self) -> float:
+        return getattr(self.delay, "delay", self.delay)
+
+    def due_time(self) -> float:
+        """Earliest time the group may start another job."""
+        due = max(self.last_job_start + self.current_delay(), self.cooldown_until)
+        if len(self.retrying) >= len(self.jobs):
+            # Every job is waiting on a retry, so wait for the first one
+            due = max(due, self.retries[0][0])
+        return due
 
-    def is_available(self) -> bool:
-        return time.time() >= self.last_job_start + self.delay
+    def add_retry(self, job: RepeatableJob, not_before: float, seq: int):
+        if id(job) in self.retrying:
+            return
+        heapq.heappush(self.retries, (not_before, seq, job))
+        self.retrying.add(id(job))
 
-    def next_job(self) -> RepeatableJob:
+    def set_jobs(self, jobs: list):
+        """Replaces the group's jobs. Pending retries of jobs which stay are kept."""
+        keep = {id(job) for job in jobs}
+        self.retries = [entry for entry in self.retries if id(entry[2]) in keep]
+        heapq.heapify(self.retries)
+        self.retrying &= keep
+        self.jobs = jobs
+        self.job_offset %= len(jobs)
+
+    def next_job(self, now: float, job_filter=None) -> Optional[RepeatableJob]:
+        """
+        Returns the next job of the group, or None if job_filter rejects every job
+        which is ready to run.
+        """
         if len(self.jobs) == 0:
             raise ValueError("Job list cannt be empty")
 
-        self.last_job = time.time()
         logger.debug(
             f"Scheduling next job... (job_offset={self.job_offset}, job_count={len(self.jobs)})"
         )
 
-        num_jobs = len(self.jobs)
-        job = self.jobs[(self.job_offset) % num_jobs]
-        self.job_offset += 1
-        self.last_job_start = time.time()
-        return job
+        self.last_job_start = now
+
+        # Retries which are due run before the regular rotation. Those job_filter
+        # rejects (e.g. their shard moved to another replica) are dropped
+        while len(self.retries) > 0 and self.retries[0][0] <= now:
+            _, _, job = heapq.heappop(self.retries)
+            self.retrying.discard(id(job))
+            if job_filter is None or job_filter(job):
+                return job
+            logger.debug(f"Dropping retry of {job.name}, job_filter rejects it")
+
+        def ready(job: RepeatableJob) -> bool:
+            return id(job) not in self.retrying and (job_filter is None or job_filter(job))
+
+        if self.policy is not None:
+            job = self.policy.select(self.jobs, ready, now)
+            if job is not None:
+                return job
+        else:
+            # Round-robin over the jobs, skipping those waiting on a retry or rejected by the filter
+            num_jobs = len(self.jobs)
+            for _ in range(num_jobs):
+                job = self.jobs[(self.job_offset) % num_jobs]
+                self.job_offset += 1
+                if ready(job):
+                    return job
+
+        if job_filter is None:
+            raise ValueError("No job in the group is ready to run")
+        return None
+
+
+def _condition_wait(cond: threading.Condition, timeout: Optional[float]):
+    cond.wait(timeout)
 
 
 class GroupedDelayScheduler(Scheduler):
@@ -49,50 +127,306 @@ class GroupedDelayScheduler(Scheduler):
     This is useful for organizing the timing of jobs which make
     requests to external resources in order to prevent overloading.
 
-    First, the scheduler will search linearly for a group which is
-    not on cooldown, then it will search linearly within that group
-    for a job which is not on cooldown.
+    Groups are kept in a min-heap ordered by the time they are next
+    eligible to run (last job start + group delay). next_job blocks
+    until the earliest group is due and never polls, so selecting a
+    group is O(log n) in the number of groups. When several groups
+    are due at once, the one which has been waiting longest runs
+    first, and groups with equal due times run in the order they
+    were queued, giving round-robin fairness between groups.
+
+    A group delay is either a number of seconds or an object with a delay
+    attribute which is read whenever the group is scheduled, so rate
+    controllers (utils.rate.AdaptiveRateLimiter) can change it while
+    running.
+
+    Within a group, jobs are selected round-robin using the group's
+    job offset, which increments whenever a job is selected, unless the
+    group was added with a SelectionPolicy (scheduling.policies), which
+    then picks the job.
+
+    Jobs can be rescheduled through retry, which keeps them out of the
+    group's rotation until their not-before time. A retry may also put
+    the whole group on cooldown, e.g. when a host rate limits us.
+
+    If max_in_flight_per_group is set, a group leaves the heap while
+    that many of its jobs are running. Executors report finished jobs
+    through job_done, which puts the group back.
+
+    A group's jobs can be replaced while running through set_group_jobs,
+    e.g. when a source discovers it needs more or fewer pages. Its delay
+    and policy can be replaced through set_group_delay and
+    set_group_policy, and the whole group removed through
+    remove_job_group, e.g. when the config is reloaded.
+
+    checkpoint returns the groups' cursors, cooldowns, pending retries and
+    rate limiter state, with times relative to the scheduler's clock, so
+    restore can resume them after a restart (see utils.checkpoint).
+
+    If a job_filter is given, jobs for which it returns False are skipped
+    in the rotation (e.g. jobs owned by another replica). A group with no
+    accepted jobs is checked again after its delay.
 
-    Searches for groups and jobs start at an offset. This means that
-    when performing linear search for a group, the search will start
-    from the offset value. In turn, each of these group also has an
-    offset it uses to select jobs. The group selection offset
-    increments whenever a group is selected, and the job selection
-    offset increments whenever a job is selected from a group.
+    clock and wait may be replaced (e.g. with a fake clock in tests).
+    wait is called with the scheduler's condition and a timeout.
     """
 
+    _heap: list
     _groups: list[_JobGroup]
-    _group_offset: int
+    _job_groups: dict[int, _JobGroup]
+    _max_in_flight: Optional[int]
 
-    def __init__(self):
+    def __init__(
+        self,
+        max_in_flight_per_group: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic,
+        wait: Callable[[threading.Condition, Optional[float]], None] = _condition_wait,
+        job_filter: Optional[Callable[[RepeatableJob], bool]] = None,
+    ):
+        self._heap = []
         self._groups = []
-        self._group_offset = 0
+        self._job_groups = {}
+        self._max_in_flight = max_in_flight_per_group
+        self._clock = clock
+        self._wait = wait
+        self._job_filter = job_filter
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
 
-    def add_job_group(self, jobs: list[RepeatableJob], group_delay=2):
-        self._groups.append(_JobGroup(jobs, 0, 0, group_delay))
+    def add_job_group(self, jobs: list[RepeatableJob], group_delay=2, name=None, policy=None):
+        """
+        name labels the group in logs and metrics, it defaults to the group's position.
+        policy selects the group's next job, round-robin if None.
+        """
+        if len(jobs) == 0:
+            raise ValueError("Job list cannt be empty")
+
+        with self._cond:
+            # A new group is due straight away
+            name = name if name is not None else f"group{len(self._groups)}"
+            group = _JobGroup(jobs, 0, float("-inf"), group_delay, name=name, policy=policy)
+            self._groups.append(group)
+            for job in jobs:
+                self._job_groups[id(job)] = group
+            self._push(group)
+            self._cond.notify_all()
+
+    def set_group_jobs(self, name: str, jobs: list[RepeatableJob]):
+        """
+        Replaces the jobs of the named group. Jobs which are dropped but still
+        running finish normally, they are not retried.
+        """
+        if len(jobs) == 0:
+            raise ValueError("Job list cannt be empty")
+
+        with self._cond:
+            group = self._group(name)
+            group.set_jobs(list(jobs))
+            # Dropped jobs stay mapped to the group, so job_done still finds them
+            for job in jobs:
+                self._job_groups[id(job)] = group
+            if group.queued:
+                # New jobs may make the group due earlier than its queued entry
+                self._push(group)
+            logger.info(f"Group {name} now has {len(jobs)} jobs")
+            self._cond.notify_all()
+
+    def remove_job_group(self, name: str):
+        """
+        Removes the named group. Its jobs which are still running finish normally,
+        they are not retried.
+        """
+        with self._cond:
+            group = self._group(name)
+            self._groups.remove(group)
+            group.removed = True
+            group.queued = False
+            group.entry = -1  # Its heap entry is now stale
+            logger.info(f"Removed group {name}")
+            self._cond.notify_all()
+
+    def group_delay(self, name: str):
+        """The delay of the named group, as given to add_job_group or set_group_delay."""
+        with self._cond:
+            return self._group(name).delay
+
+    def set_group_delay(self, name: str, group_delay):
+        """Replaces the delay of the named group, the time its last job started is kept."""
+        with self._cond:
+            group = self._group(name)
+            group.delay = group_delay
+            if group.queued:
+                # The group may now be due earlier or later than its queued entry
+                self._push(group)
+            self._cond.notify_all()
+
+    def set_group_policy(self, name: str, policy):
+        """Replaces the SelectionPolicy of the named group, None goes round-robin."""
+        with self._cond:
+            self._group(name).policy = policy
+
+    def checkpoint(self) -> dict[str, dict]:
+        """
+        The state of every group, by name, as JSON serializable dicts. Times are
+        seconds relative to now. Jobs are identified by name, unnamed jobs are left out.
+        """
+        with self._cond:
+            now = self._clock()
+            states = {}
+            for group in self._groups:
+                next_job = group.jobs[group.job_offset % len(group.jobs)]
+                state = {
+                    "job_offset": group.job_offset % len(group.jobs),
+                    "next_job": next_job.name,
+                    "last_start_ago": (
+                        now - group.last_job_start if group.last_job_start != float("-inf") else None
+                    ),
+                    "cooldown_for": max(group.cooldown_until - now, 0),
+                    "retries": [
+                        [job.name, max(not_before - now, 0)]
+                        for not_before, _, job in sorted(group.retries, key=lambda r: r[:2])
+                        if job.name is not None
+                    ],
+                }
+                if hasattr(group.delay, "checkpoint"):
+                    state["delay"] = group.delay.checkpoint()
+                states[group.name] = state
+            return states
 
-    def _next_group(self) -> _JobGroup:
-        num_groups = len(self._groups)
+    def restore(self, states: dict[str, dict], elapsed: float = 0):
+        """
+        Resumes the groups from states returned by checkpoint, taken elapsed seconds
+        ago. Groups and jobs which no longer exist are skipped. A group resumes at its
+        saved next job, stays on cooldown for what is left of its cooldown, and runs its
+        next job no earlier than its delay after the last job started.
+        """
+        with self._cond:
+            now = self._clock()
+            for group in self._groups:
+                state = states.get(group.name)
+                if state is None:
+                    continue
+                by_name = {job.name: job for job in group.jobs if job.name is not None}
 
-        if num_groups == 0:
-            raise ValueError("No job groups added to scheduler.")
+                next_job = by_name.get(state.get("next_job"))
+                if group.policy is None and next_job is not None:
+                    group.job_offset = next(i for i, job in enumerate(group.jobs) if job is next_job)
+                elif group.policy is None:
+                    group.job_offset = state.get("job_offset", 0) % len(group.jobs)
 
-        for i in range(num_groups):
-            group_idx = (i + self._group_offset) % num_groups
-            group = self._groups[(i + self._group_offset) % num_groups]
+                if state.get("last_start_ago") is not None:
+                    group.last_job_start = now - state["last_start_ago"] - elapsed
+                cooldown_for = state.get("cooldown_for", 0) - elapsed
+                if cooldown_for > 0:
+                    group.cooldown_until = max(group.cooldown_until, now + cooldown_for)
+                for name, wait_for in state.get("retries", []):
+                    if name in by_name:
+                        group.add_retry(by_name[name], now + max(wait_for - elapsed, 0), next(self._seq))
+                if "delay" in state and hasattr(group.delay, "restore"):
+                    group.delay.restore(state["delay"])
 
-            if not group.is_available():
-                continue
+                if group.queued:
+                    self._push(group)
+                logger.info(
+                    f"Restored group {group.name} (next job {group.jobs[group.job_offset % len(group.jobs)].name}, "
+                    + f"cooldown {max(cooldown_for, 0):.0f}s, {len(group.retries)} retries)"
+                )
+            self._cond.notify_all()
 
-            logger.debug(f"Selected group idx: {group_idx}")
-            return group
-        time.sleep(0.1)
-        return self._next_group()
+    def _group(self, name: str) -> _JobGroup:
+        group = next((g for g in self._groups if g.name == name), None)
+        if group is None:
+            raise ValueError(f"No job group named {name} in this scheduler.")
+        return group
 
-    def next_job(self) -> RepeatableJob:
+    def _push(self, group: _JobGroup):
+        group.entry = next(self._seq)
+        heapq.heappush(self._heap, (group.due_time(), group.entry, group))
+        group.queued = True
+
+    def _can_run(self, group: _JobGroup) -> bool:
+        return self._max_in_flight is None or group.in_flight < self._max_in_flight
+
+    def next_job(self, timeout: Optional[float] = None) -> Optional[RepeatableJob]:
+        """
+        Blocks until a job is due and returns it. If timeout (seconds) is
+        given and no group becomes due in time, returns None.
+        """
+        with self._cond:
+            if len(self._groups) == 0:
+                raise ValueError("No job groups added to scheduler.")
+
+            deadline = None if timeout is None else self._clock() + timeout
+
+            while True:
+                now = self._clock()
+
+                if len(self._heap) > 0 and self._heap[0][0] <= now:
+                    due, seq, group = heapq.heappop(self._heap)
+                    if seq != group.entry:
+                        # Superseded by a newer entry of the group
+                        continue
+                    if group.due_time() > due:
+                        # The group was put on cooldown after it was queued
+                        self._push(group)
+                        continue
+                    group.queued = False
+                    if due != float("-inf"):
+                        GROUP_LAG_SECONDS.observe(now - due, group=group.name)
+                    job = self._take_job(group, now)
+                    if job is not None:
+                        return job
+                    continue
+
+                # Sleep until the next group is due, the deadline passes, or job_done wakes us
+                wait_for = None if len(self._heap) == 0 else self._heap[0][0] - now
+                if deadline is not None:
+                    if now >= deadline:
+                        return None
+                    remaining = deadline - now
+                    wait_for = remaining if wait_for is None else min(wait_for, remaining)
+                self._wait(self._cond, wait_for)
+                SCHEDULER_IDLE_SECONDS.inc(self._clock() - now)
+
+    def _take_job(self, group: _JobGroup, now: float) -> Optional[RepeatableJob]:
         logger.debug(
-            f"Scheduling next group... (group_offset={self._group_offset}, group_count={len(self._groups)})"
+            f"Selected group {group.name} (group_count={len(self._groups)}, in_flight={group.in_flight})"
         )
+        job = group.next_job(now, self._job_filter)
+        if job is None:
+            self._push(group)
+            return None
+        if self._max_in_flight is not None:
+            group.in_flight += 1
+        if self._can_run(group):
+            self._push(group)
+        return job
+
+    def job_done(self, job: RepeatableJob):
+        if self._max_in_flight is None:
+            return
+        with self._cond:
+            group = self._job_groups.get(id(job))
+            if group is None or group.in_flight == 0:
+                return
+            group.in_flight -= 1
+            if not group.queued and not group.removed and self._can_run(group):
+                self._push(group)
+                self._cond.notify_all()
+
+    def retry(self, job: RepeatableJob, wait_for: float, group_cooldown: bool = False):
+        with self._cond:
+            group = self._job_groups.get(id(job))
+            if group is None:
+                raise ValueError("Job does not belong to any group in this scheduler.")
+            if group.removed or not any(j is job for j in group.jobs):
+                logger.debug("Not retrying job which was dropped from its group")
+                return
 
-        group = self._next_group()
-        return group.next_job()
+            not_before = self._clock() + wait_for
+            group.add_retry(job, not_before, next(self._seq))
+            if group_cooldown:
+                group.cooldown_until = max(group.cooldown_until, not_before)
+                logger.info(f"Group on cooldown for {wait_for:.1f}s")
+            # Heap entries which are now too early are re-queued lazily in next_job
+            self._cond.notify_all()
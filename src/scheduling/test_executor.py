@@ -0,0 +1,80 @@
+import time
+import threading
+from scheduling.job import RepeatableJob, RetryJob
+from scheduling.schedulers import GroupedDelayScheduler
+from scheduling.executor import JobExecutor
+from functools import partial
+
+
+def _run_executor(executor):
+    t = threading.Thread(target=executor.run)
+    t.start()
+    return t
+
+
+def test_JobExecutor_slow_group_does_not_block_others():
+    fast_runs = []
+    release = threading.Event()
+
+    s = GroupedDelayScheduler(max_in_flight_per_group=1)
+    s.add_job_group([RepeatableJob(partial(release.wait, 5))], group_delay=0)
+    s.add_job_group([RepeatableJob(partial(fast_runs.append, 1))], group_delay=0)
+
+    e = JobExecutor(s, max_workers=2, poll_interval=0.1)
+    t = _run_executor(e)
+
+    time.sleep(0.5)
+    e.stop()
+    release.set()
+    t.join(5)
+
+    assert not t.is_alive()
+    assert len(fast_runs) > 1
+
+
+def test_JobExecutor_one_job_in_flight_per_group():
+    state = {"running": 0, "max_running": 0}
+    lock = threading.Lock()
+
+    def job():
+        with lock:
+            state["running"] += 1
+            state["max_running"] = max(state["max_running"], state["running"])
+        time.sleep(0.05)
+        with lock:
+            state["running"] -= 1
+
+    s = GroupedDelayScheduler(max_in_flight_per_group=1)
+    s.add_job_group([RepeatableJob(job), RepeatableJob(job)], group_delay=0)
+
+    e = JobExecutor(s, max_workers=4, poll_interval=0.1)
+    t = _run_executor(e)
+
+    time.sleep(0.5)
+    e.stop()
+    t.join(5)
+
+    assert state["max_running"] == 1
+
+
+def test_JobExecutor_hands_retries_to_scheduler():
+    runs = []
+
+    def job():
+        runs.append(time.monotonic())
+        if len(runs) == 1:
+            raise RetryJob(0.3)
+
+    s = GroupedDelayScheduler(max_in_flight_per_group=1)
+    s.add_job_group([RepeatableJob(job), RepeatableJob(partial(print, "other"))], group_delay=0.05)
+
+    e = JobExecutor(s, max_workers=2, poll_interval=0.1)
+    t = _run_executor(e)
+
+    time.sleep(0.6)
+    e.stop()
+    t.join(5)
+
+    # The job was not run again until its retry was due
+    assert len(runs) >= 2
+    assert runs[1] - runs[0] >= 0.3
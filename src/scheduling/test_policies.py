@@ -0,0 +1,76 @@
+import random
+from functools import partial
+import pytest
+from scheduling.job import RepeatableJob
+from scheduling.policies import ChangeRatePolicy, optimal_frequencies
+from scheduling.schedulers import GroupedDelayScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def wait(self, cond, timeout):
+        self.now += timeout
+
+
+def test_optimal_frequencies_uses_budget():
+    frequencies = optimal_frequencies([1 / 60, 1 / 600, 1 / 6000], total=0.01)
+
+    assert sum(frequencies) == pytest.approx(0.01, rel=1e-3)
+    assert frequencies[0] > frequencies[2]
+
+
+def test_optimal_frequencies_gives_up_on_pages_changing_too_fast():
+    # A page changing every second cannot be kept fresh with a visit every 100s
+    frequencies = optimal_frequencies([1, 1 / 1000, 1 / 1000], total=0.01)
+
+    assert frequencies[0] == 0
+    assert frequencies[1] == pytest.approx(0.005, rel=1e-3)
+
+
+def test_ChangeRatePolicy_estimates_rate():
+    clock = FakeClock()
+    policy = ChangeRatePolicy(decay=1, clock=clock)
+    job = RepeatableJob(partial(print, "page"))
+    rng = random.Random(0)
+
+    # Changes every 100s on average, visited every 10s
+    for _ in range(2000):
+        policy.observe(job, rng.random() < 1 - 2.718281828 ** -0.1)
+        clock.now += 10
+
+    assert policy.rate(job) == pytest.approx(1 / 100, rel=0.1)
+
+
+def test_ChangeRatePolicy_favours_changing_pages():
+    clock = FakeClock()
+    policy = ChangeRatePolicy(clock=clock)
+    s = GroupedDelayScheduler(clock=clock, wait=clock.wait)
+    jobs = [RepeatableJob(partial(print, i)) for i in range(4)]
+    s.add_job_group(jobs, group_delay=10, policy=policy)
+
+    # jobs[0] changes every time it is pulled, the others never do
+    runs = []
+    for _ in range(400):
+        job = s.next_job()
+        runs.append(job)
+        policy.observe(job, job is jobs[0])
+
+    # Every job first runs once, in order
+    assert runs[:4] == jobs
+    assert runs.count(jobs[0]) > 2 * runs.count(jobs[1])
+    # Quiet jobs keep their minimum share
+    assert all(runs[-200:].count(job) > 0 for job in jobs[1:])
+
+
+def test_ChangeRatePolicy_respects_ready():
+    clock = FakeClock()
+    policy = ChangeRatePolicy(clock=clock)
+    jobs = [RepeatableJob(partial(print, i)) for i in range(3)]
+
+    assert policy.select(jobs, lambda job: job is jobs[2], 0) is jobs[2]
+    assert policy.select(jobs, lambda job: False, 1) is None
@@ -76,3 +76,253 @@ def test_GroupScheduler_respects_group_delay():
     s.next_job().execute()
 
     assert time.time() >= start + 5 - error
+
+
+class FakeClock:
+    """Clock which only moves forward when the scheduler waits on it."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.waits = []
+
+    def __call__(self):
+        return self.now
+
+    def wait(self, cond, timeout):
+        assert timeout is not None, "scheduler would block forever"
+        self.waits.append(timeout)
+        self.now += timeout
+
+
+def test_GroupedDelayScheduler_waits_exactly_until_due():
+    clock = FakeClock()
+    s = GroupedDelayScheduler(clock=clock, wait=clock.wait)
+    s.add_job_group([RepeatableJob(partial(print, "hello"))], group_delay=7)
+
+    s.next_job()
+    assert clock.now == 0
+
+    s.next_job()
+    assert clock.now == 7
+    # A single wait for the whole delay, no polling
+    assert clock.waits == [7]
+
+
+def test_GroupedDelayScheduler_round_robin_with_fake_clock():
+    clock = FakeClock()
+    s = GroupedDelayScheduler(clock=clock, wait=clock.wait)
+
+    a = [RepeatableJob(partial(print, "a0")), RepeatableJob(partial(print, "a1"))]
+    b = [RepeatableJob(partial(print, "b0"))]
+    s.add_job_group(a, group_delay=5)
+    s.add_job_group(b, group_delay=5)
+
+    order = [s.next_job() for _ in range(6)]
+
+    assert order == [a[0], b[0], a[1], b[0], a[0], b[0]]
+    assert clock.now == 10
+
+
+def test_GroupedDelayScheduler_no_recursion_on_long_cooldown():
+    clock = FakeClock()
+    s = GroupedDelayScheduler(clock=clock, wait=clock.wait)
+    s.add_job_group([RepeatableJob(partial(print, "hello"))], group_delay=10**6)
+
+    s.next_job()
+    s.next_job()
+    assert clock.now == 10**6
+
+
+def test_GroupedDelayScheduler_next_job_timeout():
+    clock = FakeClock()
+    s = GroupedDelayScheduler(clock=clock, wait=clock.wait)
+    s.add_job_group([RepeatableJob(partial(print, "hello"))], group_delay=10)
+
+    s.next_job()
+    assert s.next_job(timeout=3) is None
+    assert clock.now == 3
+
+
+def test_GroupedDelayScheduler_many_groups():
+    clock = FakeClock()
+    s = GroupedDelayScheduler(clock=clock, wait=clock.wait)
+    jobs = [RepeatableJob(partial(print, i)) for i in range(5000)]
+    for j in jobs:
+        s.add_job_group([j], group_delay=1)
+
+    # Every group is due at once and served in the order it was added
+    assert [s.next_job() for _ in range(5000)] == jobs
+    assert clock.now == 0
+    assert s.next_job() is jobs[0]
+    assert clock.now == 1
+
+
+def test_GroupedDelayScheduler_in_flight_group_waits_for_job_done():
+    clock = FakeClock()
+    s = GroupedDelayScheduler(max_in_flight_per_group=1, clock=clock, wait=clock.wait)
+    j = RepeatableJob(partial(print, "hello"))
+    s.add_job_group([j], group_delay=1)
+
+    assert s.next_job() is j
+    assert s.next_job(timeout=5) is None
+
+    s.job_done(j)
+    assert s.next_job(timeout=5) is j
+
+
+def test_GroupedDelayScheduler_retry_waits_for_not_before():
+    clock = FakeClock()
+    s = GroupedDelayScheduler(clock=clock, wait=clock.wait)
+    j = RepeatableJob(partial(print, "hello"))
+    s.add_job_group([j], group_delay=1)
+
+    s.next_job()
+    s.retry(j, 30)
+
+    assert s.next_job() is j
+    assert clock.now == 30
+
+
+def test_GroupedDelayScheduler_retry_skips_job_in_rotation():
+    clock = FakeClock()
+    s = GroupedDelayScheduler(clock=clock, wait=clock.wait)
+    jobs = [RepeatableJob(partial(print, i)) for i in range(3)]
+    s.add_job_group(jobs, group_delay=1)
+
+    assert s.next_job() is jobs[0]
+    s.retry(jobs[0], 2.5)
+
+    # jobs[0] is left out until its retry is due, then runs before the rotation
+    assert [s.next_job() for _ in range(3)] == [jobs[1], jobs[2], jobs[0]]
+    assert clock.now == 3
+
+
+def test_GroupedDelayScheduler_drops_retries_job_filter_rejects():
+    clock = FakeClock()
+    owned = {"a", "b"}
+    s = GroupedDelayScheduler(clock=clock, wait=clock.wait, job_filter=lambda job: job.name in owned)
+    a, b = RepeatableJob(partial(print, "a"), name="a"), RepeatableJob(partial(print, "b"), name="b")
+    s.add_job_group([a, b], group_delay=1)
+
+    assert s.next_job() is a
+    s.retry(a, 1.5)
+    owned.discard("a")  # a's shard moved to another replica
+
+    assert [s.next_job() for _ in range(3)] == [b, b, b]
+
+
+def test_GroupedDelayScheduler_group_cooldown_keeps_other_groups_running():
+    clock = FakeClock()
+    s = GroupedDelayScheduler(clock=clock, wait=clock.wait)
+    steam = [RepeatableJob(partial(print, i)) for i in range(3)]
+    yahoo = [RepeatableJob(partial(print, "yahoo"))]
+    s.add_job_group(steam, group_delay=1)
+    s.add_job_group(yahoo, group_delay=10)
+
+    assert s.next_job() is steam[0]
+    s.retry(steam[0], 100, group_cooldown=True)
+
+    assert s.next_job() is yahoo[0]
+    assert [s.next_job() for _ in range(9)] == [yahoo[0]] * 9
+    assert clock.now == 90
+
+    # Once the cooldown ends, the rate limited job is retried first
+    assert s.next_job() is steam[0]
+    assert clock.now == 100
+
+
+def test_GroupedDelayScheduler_reads_changing_group_delay():
+    class Delay:
+        delay = 1
+
+    clock = FakeClock()
+    s = GroupedDelayScheduler(clock=clock, wait=clock.wait)
+    rate = Delay()
+    s.add_job_group([RepeatableJob(partial(print, "hello"))], group_delay=rate)
+
+    s.next_job()
+    s.next_job()
+    assert clock.now == 1
+
+    rate.delay = 5
+    s.next_job()
+    assert clock.now == 6
+
+
+def test_GroupedDelayScheduler_set_group_jobs():
+    clock = FakeClock()
+    s = GroupedDelayScheduler(max_in_flight_per_group=1, clock=clock, wait=clock.wait)
+    jobs = [RepeatableJob(partial(print, i)) for i in range(3)]
+    s.add_job_group(jobs, group_delay=1, name="pages")
+
+    assert s.next_job() is jobs[0]
+    s.retry(jobs[0], 5)
+    s.job_done(jobs[0])
+
+    # Shrink while jobs[1] is running, then grow
+    assert s.next_job() is jobs[1]
+    s.set_group_jobs("pages", jobs[:1])
+    s.retry(jobs[1], 1)  # Dropped, so not retried
+    s.job_done(jobs[1])
+
+    more = jobs[:1] + [RepeatableJob(partial(print, i)) for i in range(3, 5)]
+    s.set_group_jobs("pages", more)
+    ran = []
+    for _ in range(4):
+        ran.append(s.next_job())
+        s.job_done(ran[-1])
+    # The retry of jobs[0] survived both resizes
+    assert ran == [more[1], more[2], more[1], more[0]]
+    assert clock.now == 5
+
+
+def test_GroupedDelayScheduler_remove_and_retune_groups():
+    clock = FakeClock()
+    s = GroupedDelayScheduler(max_in_flight_per_group=1, clock=clock, wait=clock.wait)
+    a = RepeatableJob(partial(print, "a"))
+    b = RepeatableJob(partial(print, "b"))
+    s.add_job_group([a], group_delay=10, name="a")
+    s.add_job_group([b], group_delay=10, name="b")
+
+    assert s.next_job() is a
+    assert s.next_job() is b
+    s.job_done(b)
+
+    # a is removed while running, it is not queued again when it finishes
+    s.remove_job_group("a")
+    s.job_done(a)
+    s.retry(a, 1)
+
+    s.set_group_delay("b", 3)
+    assert s.group_delay("b") == 3
+    assert s.next_job() is b
+    assert clock.now == 3
+
+
+def test_GroupedDelayScheduler_checkpoint_and_restore():
+    from utils.rate import AdaptiveRateLimiter
+
+    clock = FakeClock()
+    s = GroupedDelayScheduler(clock=clock, wait=clock.wait)
+    jobs = [RepeatableJob(partial(print, i), name=f"page-{i}") for i in range(4)]
+    limiter = AdaptiveRateLimiter(initial_delay=2, min_delay=1, max_delay=60)
+    s.add_job_group(jobs, group_delay=limiter, name="pages")
+
+    assert s.next_job() is jobs[0]
+    assert s.next_job() is jobs[1]
+    s.retry(jobs[1], 30, group_cooldown=True)
+    limiter.on_rate_limited()
+    states = s.checkpoint()
+
+    # A new scheduler, as after a restart 10s later
+    clock2 = FakeClock()
+    s2 = GroupedDelayScheduler(clock=clock2, wait=clock2.wait)
+    limiter2 = AdaptiveRateLimiter(initial_delay=2, min_delay=1, max_delay=60)
+    s2.add_job_group(jobs, group_delay=limiter2, name="pages")
+    s2.restore(states, elapsed=10)
+
+    assert limiter2.rate == limiter.rate
+    # The cycle continues after the rate limit window, with the retried job first
+    assert s2.next_job() is jobs[1]
+    assert clock2.now == 20
+    assert s2.next_job() is jobs[2]
@@ -0,0 +1,341 @@
+"""
+Archival of old record rows to columnar files.
+
+Rows older than the configured age are streamed out of their table in created_at
+order through a server-side cursor, so the table is never loaded at once, and
+written as compressed Parquet (or Arrow IPC) files partitioned by day or month:
+
+    <directory>/<table>/day=2026-01-05/part-<first id>-<last id>.parquet
+
+String columns such as hash_name are dictionary encoded. Once every file of the run
+has been written, the archived rows are deleted in bounded batches.
+
+The latest row of each item (by hash_name, or name for tables without one) stays in
+the table however old it is: in delta mode an unchanged item is not stored again, so
+its latest row is still its current price. It is archived once a newer row replaces it. A run which is
+interrupted before the delete writes the same files again the next time; one
+interrupted during the delete may archive the remaining rows twice, which the id
+column identifies.
+
+pyarrow is only needed when archiving is enabled.
+"""
+import logging
+import os
+from datetime import date, datetime, time, timedelta
+from functools import partial
+from sqlalchemy import Table, and_, delete, exists, func, or_, select
+from scheduling.job import RepeatableJob
+
+logger = logging.getLogger(__name__)
+
+PARTITIONS = ("day", "month")
+FORMATS = ("parquet", "arrow")
+
+# String columns stored dictionary encoded, they repeat in every pull
+DICTIONARY_COLUMNS = ("name", "hash_name")
+
+# Columns identifying the item of a row, the first one a table has is used
+ITEM_COLUMNS = ("hash_name", "name")
+
+
+def require_pyarrow():
+    """Imports pyarrow, raising an ImportError explaining it is needed for archiving."""
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Archiving requires pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+
+def _partition_start(created_at: datetime, partition: str) -> date:
+    day = created_at.date()
+    return day if partition == "day" else day.replace(day=1)
+
+
+def _next_partition(start: date, partition: str) -> date:
+    if partition == "day":
+        return start + timedelta(days=1)
+    return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _partition_dir(start: date, partition: str) -> str:
+    return f"day={start.isoformat()}" if partition == "day" else f"month={start:%Y-%m}"
+
+
+def archive_cutoff(max_age_days: int, partition: str, now: datetime = None) -> datetime:
+    """
+    Rows created before the cutoff are archived. It is the start of the partition
+    max_age_days ago, so only whole partitions are archived.
+    """
+    now = now or datetime.now()
+    return datetime.combine(_partition_start(now - timedelta(days=max_age_days), partition), time())
+
+
+def _db_now(engine) -> datetime:
+    # The expression created_at defaults to, as the (naive) value it would store
+    with engine.connect() as conn:
+        now = conn.execute(select(func.now())).scalar()
+    return now.replace(tzinfo=None)
+
+
+def _max_id(engine, table: Table) -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.max(table.c.id))).scalar() or 0
+
+
+def _replaced(table: Table, latest_as_of: int) -> list:
+    """
+    Conditions for the rows of table which are not the latest of their item among the
+    rows with ids up to latest_as_of, none if latest_as_of is None or table has no
+    item column.
+    """
+    key = next((table.c[name] for name in ITEM_COLUMNS if name in table.c), None)
+    if latest_as_of is None or key is None:
+        return []
+    newer = table.alias("newer")
+    return [
+        exists().where(
+            newer.c[key.name] == key,
+            newer.c.id <= latest_as_of,
+            or_(
+                newer.c.created_at > table.c.created_at,
+                and_(newer.c.created_at == table.c.created_at, newer.c.id > table.c.id),
+            ),
+        )
+    ]
+
+
+def stream_rows(engine, table: Table, cutoff: datetime, batch_rows: int, latest_as_of: int = None):
+    """
+    Yields the rows of table created before cutoff, in created_at order, batch_rows at
+    a time. If latest_as_of is given, the latest row of each item among the rows with
+    ids up to it is skipped.
+    """
+    query = (
+        select(table)
+        .where(table.c.created_at < cutoff, *_replaced(table, latest_as_of))
+        .order_by(table.c.created_at, table.c.id)
+    )
+    with engine.connect() as conn:
+        # A server-side cursor (where the driver supports one) buffering batch_rows rows
+        result = conn.execution_options(yield_per=batch_rows).execute(query)
+        for rows in result.partitions():
+            yield rows
+
+
+def delete_rows(
+    engine,
+    table: Table,
+    start: datetime,
+    end: datetime,
+    max_id: int,
+    batch_rows: int,
+    latest_as_of: int = None,
+) -> int:
+    """
+    Deletes the rows of table created in [start, end) with ids up to max_id, at most
+    batch_rows per transaction, keeping the rows stream_rows skipped for the same
+    latest_as_of. Returns the number of rows deleted.
+    """
+    ids = (
+        select(table.c.id)
+        .where(
+            table.c.created_at >= start,
+            table.c.created_at < end,
+            table.c.id <= max_id,
+            *_replaced(table, latest_as_of),
+        )
+        .limit(batch_rows)
+        .scalar_subquery()
+    )
+    deleted = 0
+    while True:
+        with engine.begin() as conn:
+            count = conn.execute(delete(table).where(table.c.id.in_(ids))).rowcount
+        deleted += count
+        if count < batch_rows:
+            return deleted
+
+
+def _arrow_schema(pa, table: Table):
+    types = {int: pa.int64(), float: pa.float64(), bool: pa.bool_(), datetime: pa.timestamp("us")}
+    fields = []
+    for column in table.columns:
+        python_type = column.type.python_type
+        if python_type is str:
+            arrow_type = (
+                pa.dictionary(pa.int32(), pa.string())
+                if column.name in DICTIONARY_COLUMNS
+                else pa.string()
+            )
+        else:
+            arrow_type = types[python_type]
+        fields.append(pa.field(column.name, arrow_type, nullable=column.nullable))
+    return pa.schema(fields)
+
+
+class _PartitionFile:
+    """One partition's archive file, written under a temporary name and renamed once closed."""
+
+    def __init__(self, pa, directory: str, schema, fmt: str, compression: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.fmt = fmt
+        self.first_id = None
+        self.last_id = None
+        self.rows = 0
+        self._pa = pa
+        self._schema = schema
+        self._codes = {}  # Dictionary column -> {value: index}, growing across batches
+        self._tmp = os.path.join(directory, f".part-{os.getpid()}.{fmt}.tmp")
+        compression = None if compression == "none" else compression
+        if fmt == "parquet":
+            self._sink = None
+            self._writer = pa.parquet.ParquetWriter(self._tmp, schema, compression=compression)
+        else:
+            self._sink = pa.OSFile(self._tmp, "wb")
+            self._writer = pa.ipc.new_file(
+                self._sink,
+                schema,
+                # Arrow files can only extend a field's dictionary, not replace it
+                options=pa.ipc.IpcWriteOptions(compression=compression, emit_dictionary_deltas=True),
+            )
+
+    def _array(self, field, values: list):
+        pa = self._pa
+        if not pa.types.is_dictionary(field.type):
+            return pa.array(values, type=field.type)
+        # Every batch's dictionary extends the previous one
+        codes = self._codes.setdefault(field.name, {})
+        indices = [codes.setdefault(value, len(codes)) for value in values]
+        return pa.DictionaryArray.from_arrays(
+            pa.array(indices, type=field.type.index_type), pa.array(list(codes), type=pa.string())
+        )
+
+    def write(self, rows: list):
+        columns = {name: [row[i] for row in rows] for i, name in enumerate(self._schema.names)}
+        arrays = [self._array(field, columns[field.name]) for field in self._schema]
+        self._writer.write_batch(self._pa.RecordBatch.from_arrays(arrays, schema=self._schema))
+        ids = columns["id"]
+        self.first_id = min(ids) if self.first_id is None else min(self.first_id, *ids)
+        self.last_id = max(ids) if self.last_id is None else max(self.last_id, *ids)
+        self.rows += len(rows)
+
+    def close(self) -> str:
+        self._writer.close()
+        if self._sink is not None:
+            self._sink.close()
+        # Named after its rows, so archiving the same rows again replaces the file
+        path = os.path.join(self.directory, f"part-{self.first_id}-{self.last_id}.{self.fmt}")
+        os.replace(self._tmp, path)
+        return path
+
+
+def archive_table(
+    engine,
+    table: Table,
+    directory: str,
+    max_age_days: int = 90,
+    partition: str = "day",
+    fmt: str = "parquet",
+    compression: str = "zstd",
+    batch_rows: int = 50_000,
+    now: datetime = None,
+) -> int:
+    """
+    Archives the rows of table older than max_age_days to files under directory,
+    then deletes them from the table, except for the latest row of each item.
+    Returns the number of rows archived.
+
+    The age is measured from now, by default the database's clock.
+    """
+    if partition not in PARTITIONS:
+        raise ValueError(f"partition must be one of {PARTITIONS}")
+    if fmt not in FORMATS:
+        raise ValueError(f"fmt must be one of {FORMATS}")
+
+    pa = require_pyarrow()
+    schema = _arrow_schema(pa, table)
+    cutoff = archive_cutoff(max_age_days, partition, now or _db_now(engine))
+    # Which row of each item is its latest is decided once, rows stored during the run
+    # must not make a row which was not archived look replaced when it is deleted
+    latest_as_of = _max_id(engine, table)
+
+    archived = []  # (partition start, last id) of each written file
+    rows_written = 0
+    current, start = None, None
+    for rows in stream_rows(engine, table, cutoff, batch_rows, latest_as_of):
+        # Rows come in created_at order, so each partition is a run of rows
+        i = 0
+        while i < len(rows):
+            row_start = _partition_start(rows[i].created_at, partition)
+            j = i
+            while j < len(rows) and _partition_start(rows[j].created_at, partition) == row_start:
+                j += 1
+            if row_start != start:
+                if current is not None:
+                    current.close()
+                    archived.append((start, current.last_id))
+                start = row_start
+                current = _PartitionFile(
+                    pa,
+                    os.path.join(directory, table.name, _partition_dir(start, partition)),
+                    schema,
+                    fmt,
+                    compression,
+                )
+            current.write(rows[i:j])
+            rows_written += j - i
+            i = j
+    if current is not None:
+        current.close()
+        archived.append((start, current.last_id))
+
+    # Only delete once every file has been written
+    rows_deleted = 0
+    for start, max_id in archived:
+        end = _next_partition(start, partition)
+        rows_deleted += delete_rows(
+            engine,
+            table,
+            datetime.combine(start, time()),
+            datetime.combine(end, time()),
+            max_id,
+            batch_rows,
+            latest_as_of,
+        )
+    if len(archived) > 0:
+        logger.info(
+            f"Archived {rows_written} rows of {table.name} older than {cutoff} to {len(archived)} files, "
+            + f"deleted {rows_deleted} rows"
+        )
+    return rows_written
+
+
+def archive_tables(engine, tables: list[Table], settings: dict):
+    """Archives each of tables with the settings of the Archive config section."""
+    for table in list(tables):
+        try:
+            archive_table(
+                engine,
+                table,
+                settings["directory"],
+                max_age_days=settings["maxage"],
+                partition=settings["partition"],
+                fmt=settings["format"],
+                compression=settings["compression"],
+                batch_rows=settings["batchrows"],
+            )
+        except Exception:
+            logger.error(f"Failed to archive {table.name}", exc_info=True)
+
+
+def create_archive_jobs(engine, tables: list[Table], settings: dict) -> list[RepeatableJob]:
+    """
+    Job archiving tables (which may still grow, e.g. as sources are started), run in
+    a group with the archive interval as its delay.
+    """
+    require_pyarrow()
+    return [RepeatableJob(partial(archive_tables, engine, tables, settings), name="archive")]
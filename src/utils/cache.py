@@ -0,0 +1,100 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+import requests
+
+
+@dataclass
+class _CachedResponse:
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body_hash: bytes
+
+
+def body_hash(body: bytes) -> bytes:
+    return hashlib.blake2b(body, digest_size=16).digest()
+
+
+class ResponseCache:
+    """
+    Remembers the last stored response per URL, to skip pulls whose response has not
+    changed since.
+
+    Only the validators (ETag, Last-Modified) and a hash of the body are kept, for
+    the max_entries most recently used URLs plus the URLs reserved by sources which
+    cycle through many pages (reserve). request_headers turns them into
+    If-None-Match / If-Modified-Since headers for servers which support them;
+    not_modified recognises both a 304 response and a body with the same hash.
+
+    Responses must only be stored once their data has been handled, so a response
+    which failed to parse is not skipped the next time.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._reserved = {}  # name -> number of entries
+        self._lock = threading.Lock()
+
+    def reserve(self, name: str, entries: int):
+        """
+        Keeps room for entries more URLs, e.g. one per page of a source. Pages are
+        pulled in turn, so with fewer entries than pages every page's entry would be
+        evicted before it is needed again. Reserving under the same name again
+        replaces the previous reservation.
+        """
+        with self._lock:
+            self._reserved[name] = entries
+
+    @property
+    def capacity(self) -> int:
+        return self.max_entries + sum(self._reserved.values())
+
+    def _get(self, url: str) -> Optional[_CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+            return entry
+
+    def request_headers(self, url: str) -> dict:
+        """Conditional request headers for url, empty if nothing is cached."""
+        entry = self._get(url)
+        headers = {}
+        if entry is not None and entry.etag is not None:
+            headers["If-None-Match"] = entry.etag
+        if entry is not None and entry.last_modified is not None:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def not_modified(self, url: str, resp: requests.Response, body: bytes = None) -> bool:
+        """
+        Whether resp is unchanged from the response stored for url. body is what
+        is compared, the whole response body by default.
+        """
+        entry = self._get(url)
+        if entry is None:
+            return False
+        if resp.status_code == 304:
+            return True
+        return resp.status_code == 200 and entry.body_hash == body_hash(
+            resp.content if body is None else body
+        )
+
+    def store(self, url: str, resp: requests.Response, body: bytes = None):
+        """Remembers resp as the last stored response for url."""
+        entry = _CachedResponse(
+            etag=resp.headers.get("ETag"),
+            last_modified=resp.headers.get("Last-Modified"),
+            body_hash=body_hash(resp.content if body is None else body),
+        )
+        with self._lock:
+            self._entries[url] = entry
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,124 @@
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from functools import partial
+from typing import Callable
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+from models import SchedulerCheckpoint
+from scheduling.job import RepeatableJob
+from scheduling.schedulers import GroupedDelayScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseCheckpointStore:
+    """
+    Keeps checkpoints in the scheduler_checkpoints table, one row per job group. Each
+    save replaces the rows of groups it does not include (e.g. of a disabled feature).
+    """
+
+    def __init__(self, db_engine):
+        self.db_engine = db_engine
+
+    def save(self, states: dict[str, dict], saved_at: float):
+        # Stored without a timezone, in UTC, like the leases
+        saved = datetime.fromtimestamp(saved_at, timezone.utc).replace(tzinfo=None)
+        with Session(self.db_engine) as session:
+            session.execute(
+                delete(SchedulerCheckpoint).where(SchedulerCheckpoint.group_name.not_in(list(states)))
+            )
+            for name, state in states.items():
+                session.merge(
+                    SchedulerCheckpoint(group_name=name, state=json.dumps(state), saved_at=saved)
+                )
+            session.commit()
+
+    def load(self) -> dict[str, tuple[dict, float]]:
+        with Session(self.db_engine) as session:
+            rows = session.scalars(select(SchedulerCheckpoint)).all()
+        return {
+            row.group_name: (
+                json.loads(row.state),
+                row.saved_at.replace(tzinfo=timezone.utc).timestamp(),
+            )
+            for row in rows
+        }
+
+
+class FileCheckpointStore:
+    """Keeps checkpoints in a local JSON file, replaced atomically on every save."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def save(self, states: dict[str, dict], saved_at: float):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"saved_at": saved_at, "groups": states}, f)
+        os.replace(tmp, self.path)
+
+    def load(self) -> dict[str, tuple[dict, float]]:
+        if not os.path.isfile(self.path):
+            return {}
+        with open(self.path) as f:
+            data = json.load(f)
+        return {name: (state, data["saved_at"]) for name, state in data["groups"].items()}
+
+
+class SchedulerCheckpointer:
+    """
+    Periodically saves the scheduler's state (GroupedDelayScheduler.checkpoint) to a
+    store, and restores it on startup, so a restarted replica continues each group's
+    cycle where it stopped and waits out the cooldowns and retries still pending.
+
+    Times are saved relative to the wall clock, so a restore ages each group's state
+    by the time since that group was saved. Replicas sharing a database share the
+    checkpoint of each group, the last one to save wins.
+    """
+
+    def __init__(self, scheduler: GroupedDelayScheduler, store, clock: Callable[[], float] = time.time):
+        """
+        scheduler:  scheduler whose groups are saved and restored
+        store:      DatabaseCheckpointStore or FileCheckpointStore
+        clock:      wall clock, in seconds
+        """
+        self.scheduler = scheduler
+        self.store = store
+        self._clock = clock
+
+    def save(self):
+        states = self.scheduler.checkpoint()
+        self.store.save(states, self._clock())
+        logger.debug(f"Saved checkpoint of {len(states)} job groups")
+
+    def restore(self):
+        """Restores the saved state of the scheduler's groups, if any was saved."""
+        try:
+            saved = self.store.load()
+        except Exception:
+            logger.warning("Failed to load the scheduler checkpoint, starting fresh", exc_info=True)
+            return
+
+        # Groups may have been saved at different times (e.g. by different replicas)
+        by_saved_at = {}
+        for name, (state, saved_at) in saved.items():
+            by_saved_at.setdefault(saved_at, {})[name] = state
+        for saved_at, states in by_saved_at.items():
+            elapsed = max(self._clock() - saved_at, 0)
+            logger.info(f"Restoring scheduler checkpoint of {sorted(states)} from {elapsed:.0f}s ago")
+            self.scheduler.restore(states, elapsed)
+
+
+def _save_checkpoint(checkpointer: SchedulerCheckpointer):
+    try:
+        checkpointer.save()
+    except Exception:
+        logger.warning("Failed to save the scheduler checkpoint", exc_info=True)
+
+
+def create_checkpoint_jobs(checkpointer: SchedulerCheckpointer) -> list[RepeatableJob]:
+    """Job saving the checkpoint, run in a group with the checkpoint interval as its delay."""
+    return [RepeatableJob(partial(_save_checkpoint, checkpointer), name="checkpoint")]
@@ -1,20 +1,89 @@
 import logging
+import random
 import time
-from sqlalchemy.orm import Session
-from external_data.errors import RateLimitException
+from dataclasses import dataclass
+from typing import Optional
+from data_sources.errors import NotModified, RateLimitException
 from functools import partial
-from models import DataUpdateRecord
+from models import UpdateRow
+from utils.db import model_to_row
+from utils.writer import PendingUpdate, write_now
+from utils.timing import record_phases
+from scheduling.job import RetryJob
+from utils.metrics import (
+    PULL_SECONDS,
+    RETRIES,
+    FAILURES,
+    NOT_MODIFIED,
+    RATE_LIMIT_WAIT_SECONDS,
+)
 
 logger = logging.getLogger(__name__)
 
+# Backoff for failed pulls: base * 2^attempt seconds (with jitter), never more than the cap
+BACKOFF_BASE = 5
+BACKOFF_CAP = 300
+
 
 class TooManyFailuresError(Exception):
     pass
 
 
-def create_update_partial(db_engine, service_name, title, data_partial, max_fails):
+class PulledItems(list):
+    """
+    The items of a pull, with a callback to run once they are committed, e.g. to
+    remember the response they were parsed from. Data partials may return one in
+    place of a plain list; the callback is dropped if the items are never written.
+    """
+
+    def __init__(self, items=(), on_written=None):
+        super().__init__(items)
+        self.on_written = on_written
+
+
+@dataclass
+class _AttemptState:
+    """Tracks the attempts of one update across the scheduler retries of its job."""
+
+    attempts: int = 0
+    started: Optional[float] = None  # perf_counter() at the first attempt
+    failed_at: Optional[float] = None  # perf_counter() when the last attempt failed
+
+    def reset(self):
+        self.attempts = 0
+        self.started = None
+        self.failed_at = None
+
+
+def backoff_delay(attempt: int, base=BACKOFF_BASE, cap=BACKOFF_CAP) -> float:
+    """
+    Jittered exponential backoff for the given (0 based) attempt. The result is
+    between half and all of min(cap, base * 2^attempt), so retries of jobs which
+    failed together spread out.
+    """
+    delay = min(cap, base * (2**attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def create_update_partial(
+    db_engine,
+    service_name,
+    title,
+    data_partial,
+    max_fails,
+    writer=None,
+    item_filter=None,
+    on_written=None,
+):
     """
     Wrap a data_partial in a data_update call, and return the partial.
+
+    If a writer (utils.writer.BatchWriter) is given, results are written through it,
+    otherwise they are committed to db_engine before the job returns.
+
+    If an item_filter is given, only the items it returns are stored (e.g. only items
+    which changed since they were last seen). on_written is called with the stored
+    items once they are committed.
     """
     return partial(
         data_update,
@@ -23,68 +92,191 @@ def create_update_partial(db_engine, service_name, title, data_partial, max_fail
         title=title,
         data_partial=data_partial,
         max_fails=max_fails,
+        attempt_state=_AttemptState(),
+        writer=writer,
+        item_filter=item_filter,
+        on_written=on_written,
     )
 
 
-# Returns a tuple of (number of attempts, list of items)
-def _pull_external_data(data_partial, log_pref, max_fails) -> (int, list):
-    for i in range(max_fails):
-        logger.info(f"{log_pref} Pulling data... ({i + 1}/{max_fails})")
-        try:
-            return (i + 1, data_partial())
-        except RateLimitException as e:
-            # Rate limit exceptions should contain a wait_for field, which is the number of seconds to wait before trying again
-            logger.info(
-                f"{log_pref} Rate limit exceeded... Waiting {e.wait_for} seconds before trying again."
-            )
-            time.sleep(e.wait_for)
-        except Exception as e:
-            # 5 seconds, 15 seconds, 25 seconds, ....
-            sleep_time = (10 * i) + 5
-            logger.info(
-                f"{log_pref} Exception raised while trying to retreive date (sleeping for {sleep_time}): {str(e)}"
-            )
-            time.sleep(sleep_time)
-            continue
-    raise TooManyFailuresError()
+def _rows_by_model(items) -> dict:
+    """
+    Groups items into plain rows per model, for bulk inserts. Items are either ORM
+    records or NamedTuple rows with a model class attribute (e.g. ItemRow), which are
+    kept as they are until they are inserted.
+    """
+    rows = {}
+    for item in items:
+        model = getattr(item, "model", None)
+        if model is not None and hasattr(item, "_asdict"):
+            rows.setdefault(model, []).append(item)
+        else:
+            rows.setdefault(type(item), []).append(model_to_row(item))
+    return rows
+
+
+def _call_all(callbacks):
+    for callback in callbacks:
+        callback()
 
 
-def data_update(db_engine, service_name, title, data_partial, max_fails):
-    """Calls data_partial, and then updates the database with the results. Retries up to max_fails times."""
+def _pull_external_data(
+    data_partial, log_pref, max_fails, attempt_state, service_name=""
+) -> list:
+    """
+    Makes a single attempt at calling data_partial. If it fails, RetryJob is raised so the
+    scheduler runs the job again later, or TooManyFailuresError once max_fails is reached.
+    """
+    attempt_state.attempts += 1
+    attempt = attempt_state.attempts
+
+    logger.info(f"{log_pref} Pulling data... ({attempt}/{max_fails})")
+    try:
+        with PULL_SECONDS.time(service=service_name):
+            return data_partial()
+    except NotModified:
+        raise
+    except RateLimitException as e:
+        RATE_LIMIT_WAIT_SECONDS.inc(e.wait_for, service=service_name)
+        if attempt >= max_fails:
+            FAILURES.inc(service=service_name)
+            raise TooManyFailuresError() from e
+        RETRIES.inc(service=service_name, reason="rate_limit")
+        # Rate limits apply to the whole host, so the whole group waits for wait_for seconds
+        logger.info(
+            f"{log_pref} Rate limit exceeded... Retrying in {e.wait_for} seconds."
+        )
+        raise RetryJob(e.wait_for, group_cooldown=True, message=e.message) from e
+    except Exception as e:
+        if attempt >= max_fails:
+            FAILURES.inc(service=service_name)
+            raise TooManyFailuresError() from e
+        RETRIES.inc(service=service_name, reason="error")
+        wait_for = backoff_delay(attempt - 1)
+        logger.info(
+            f"{log_pref} Exception raised while trying to retreive date (retrying in {wait_for:.1f}s): {str(e)}"
+        )
+        raise RetryJob(wait_for, message=str(e)) from e
+
+
+def data_update(
+    db_engine,
+    service_name,
+    title,
+    data_partial,
+    max_fails,
+    attempt_state=None,
+    writer=None,
+    item_filter=None,
+    on_written=None,
+):
+    """
+    Calls data_partial, and then updates the database with the results. Failed attempts
+    raise RetryJob so the scheduler can retry the job, up to max_fails attempts in total.
+
+    Every attempt, failed or not, is stored as a data update record with the time spent
+    fetching, parsing, waiting since the previous failed attempt and writing.
+
+    If data_partial raises NotModified, the update succeeds without storing any
+    items, and its record is flagged not_modified. If it returns PulledItems, their
+    on_written callback runs once the items are committed.
+
+    max_fails may be a callable returning the limit, read on every attempt so a
+    reloaded config applies to running jobs.
+    """
 
     log_prefix = f"{service_name} -> [{title}]"  # Prefix for logging
+    if callable(max_fails):
+        max_fails = max_fails()
+
+    if attempt_state is None:
+        attempt_state = _AttemptState()
 
-    # Start timer for logging total time taken
-    start = time.perf_counter()
+    # Start timer for logging total time taken, this spans all attempts of the update
+    now = time.perf_counter()
+    if attempt_state.started is None:
+        attempt_state.started = now
+    start = attempt_state.started
+    backoff_time = 0.0 if attempt_state.failed_at is None else now - attempt_state.failed_at
 
     # Create a record of the data update, we will update this record with a message when the update is complete, or if it fails
-    data_update_record = DataUpdateRecord(service_name=service_name, title=title)
+    data_update_record = UpdateRow(
+        service_name=service_name, title=title, backoff_time=backoff_time
+    )
 
     # Create a list to store the items returned by data_partial
     items = []
 
-    try:
-        n_attempts, items = _pull_external_data(data_partial, log_prefix, max_fails)
-
-        # Update the data_update_record
-        data_update_record.success = True
-        data_update_record.attempts = n_attempts
-        data_update_record.run_time = time.perf_counter() - start
-    except TooManyFailuresError:
-        logger.info(f"{log_prefix} Failed too many times... ({max_fails})")
-
-        # Update the data_update_record
-        data_update_record.success = False
-        data_update_record.attempts = max_fails
-        data_update_record.run_time = time.perf_counter() - start
-        return
+    def store(records, after_write=None):
+        # Update the database with the results, in one transaction with the update record
+        callbacks = [after_write] if after_write is not None else []
+        if on_written is not None:
+            callbacks.append(partial(on_written, records))
+        update = PendingUpdate(
+            data_update_record,
+            _rows_by_model(records),
+            on_written=partial(_call_all, callbacks) if callbacks else None,
+        )
+        if writer is None:
+            write_now(db_engine, update)
+        else:
+            writer.submit(update)
+
+    not_modified = False
+    with record_phases() as phases:
+        try:
+            items = _pull_external_data(
+                data_partial, log_prefix, max_fails, attempt_state, service_name
+            )
+        except NotModified as e:
+            NOT_MODIFIED.inc(service=service_name)
+            not_modified = True
+            data_update_record.message = str(e)[:1000]
+        except (RetryJob, TooManyFailuresError) as e:
+            # Update the data_update_record
+            data_update_record.success = False
+            data_update_record.attempts = attempt_state.attempts
+            data_update_record.run_time = time.perf_counter() - start
+            data_update_record.fetch_time = phases.fetch
+            data_update_record.parse_time = phases.parse
+            data_update_record.bytes_downloaded = phases.bytes_downloaded
+            data_update_record.row_count = 0
+            data_update_record.message = str(e.__cause__)[:1000]
 
-    # Update the database with the results
-    with Session(db_engine) as session:
-        session.add(data_update_record)
-        session.add_all(items)
-        session.commit()
+            if isinstance(e, TooManyFailuresError):
+                logger.info(f"{log_prefix} Failed too many times... ({max_fails})")
+                data_update_record.message = f"Gave up: {data_update_record.message}"
+                attempt_state.reset()
+            else:
+                attempt_state.failed_at = time.perf_counter()
 
+            store([])
+            if isinstance(e, RetryJob):
+                raise
+            return
+
+    n_pulled = len(items)
+    after_write = getattr(items, "on_written", None)
+    if item_filter is not None and not not_modified:
+        items = item_filter(items)
+        data_update_record.message = f"{len(items)}/{n_pulled} items changed"
+
+    # Update the data_update_record
+    data_update_record.success = True
+    data_update_record.attempts = attempt_state.attempts
+    data_update_record.run_time = time.perf_counter() - start
+    data_update_record.fetch_time = phases.fetch
+    data_update_record.parse_time = phases.parse
+    data_update_record.bytes_downloaded = phases.bytes_downloaded
+    data_update_record.row_count = len(items)
+    data_update_record.not_modified = not_modified
+    attempt_state.reset()
+
+    store(items, after_write)
+
+    if not_modified:
+        logger.info(f"{log_prefix} Not modified, nothing to store.")
+        return
     logger.info(
-        f"{log_prefix} Data update took {time.perf_counter() - start}s, retrieved {len(items)} items."
+        f"{log_prefix} Data update took {time.perf_counter() - start}s, retrieved {n_pulled} items, stored {len(items)}."
     )
@@ -1,5 +1,8 @@
-from sqlalchemy import create_engine
+import io
 import os
+from sqlalchemy import create_engine, insert, inspect, select, text
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.orm import Session
 
 
 def init_engine(database_url: str = None):
@@ -7,3 +10,122 @@ def init_engine(database_url: str = None):
     if database_url is None:
         raise ValueError("No database provided.")
     return create_engine(database_url)
+
+
+def add_missing_columns(engine, table):
+    """
+    Adds nullable columns of table which are missing from the existing database table,
+    so new optional fields can be added to a model without a migration.
+    """
+    existing = {c["name"] for c in inspect(engine).get_columns(table.name)}
+    with engine.begin() as conn:
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            ddl = CreateColumn(column).compile(dialect=engine.dialect)
+            conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN {ddl}'))
+
+
+def load_metadata(engine, metadata):
+    """
+    Creates the tables of metadata if they do not exist, and any of their indexes and
+    nullable columns which do not exist (create_all skips tables which already exist).
+    Table schemas are not validated otherwise.
+    """
+    metadata.create_all(engine)
+    for table in metadata.sorted_tables:
+        add_missing_columns(engine, table)
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+
+def model_to_row(record) -> dict:
+    """
+    Returns the column values of an ORM record, or of a row object with a model class
+    attribute (e.g. UpdateRow), as a plain dict for bulk inserts.
+
+    Rows of the same table get the same keys, as one executemany INSERT needs: every
+    column, None values included, except an unset primary key or column with a
+    default (e.g. created_at), which the database fills in.
+    """
+    row = {}
+    for column in getattr(record, "model", record).__table__.columns:
+        value = getattr(record, column.key, None)
+        if value is None and (
+            column.primary_key or column.default is not None or column.server_default is not None
+        ):
+            continue
+        row[column.key] = value
+    return row
+
+
+def _copy_text_value(value) -> str:
+    """Formats a value for COPY ... FROM STDIN in PostgreSQL's text format."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _as_dict(row) -> dict:
+    return row._asdict() if hasattr(row, "_asdict") else row
+
+
+def _fields(row):
+    return row._fields if hasattr(row, "_asdict") else row
+
+
+def _copy_rows(session: Session, table, rows: list):
+    """Writes rows with COPY FROM STDIN over the session's connection (psycopg2 only)."""
+    # Columns with python side defaults (created_at) are filled in here, COPY skips them
+    columns = [c for c in table.columns if not (c.primary_key and c.autoincrement)]
+    defaults = {}
+    for column in columns:
+        if column.default is not None and any(column.key not in _fields(r) for r in rows):
+            if column.default.is_clause_element:
+                defaults[column.key] = session.execute(select(column.default.arg)).scalar()
+            elif column.default.is_scalar:
+                defaults[column.key] = column.default.arg
+
+    buf = io.StringIO()
+    for row in rows:
+        if hasattr(row, "_asdict"):
+            # Read the tuple's fields directly, without building a dict
+            values = (getattr(row, c.key, defaults.get(c.key)) for c in columns)
+        else:
+            values = (row.get(c.key, defaults.get(c.key)) for c in columns)
+        buf.write("\t".join(_copy_text_value(value) for value in values))
+        buf.write("\n")
+    buf.seek(0)
+
+    column_list = ", ".join(f'"{c.name}"' for c in columns)
+    dbapi_conn = session.connection().connection.dbapi_connection
+    with dbapi_conn.cursor() as cursor:
+        cursor.copy_expert(f'COPY "{table.name}" ({column_list}) FROM STDIN', buf)
+
+
+def bulk_insert(session: Session, model, rows: list):
+    """
+    Inserts plain rows (dicts, or NamedTuples such as ItemRow) into the model's table
+    within the session's transaction. NamedTuple rows stay tuples until this point.
+
+    On PostgreSQL (psycopg2) this uses COPY FROM STDIN, otherwise a single executemany
+    INSERT, which SQLAlchemy batches into multi-row INSERT ... VALUES where supported.
+    No ORM instances are created.
+    """
+    if len(rows) == 0:
+        return
+
+    table = model.__table__
+    bind = session.get_bind()
+    if bind.dialect.name == "postgresql" and bind.dialect.driver == "psycopg2":
+        _copy_rows(session, table, rows)
+    else:
+        session.execute(insert(table), [_as_dict(row) for row in rows])
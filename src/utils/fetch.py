@@ -0,0 +1,147 @@
+import logging
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from utils.cache import ResponseCache
+from utils.metrics import FETCH_SECONDS
+from utils.timing import add_fetch
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 30
+DEFAULT_PER_HOST_LIMIT = 4
+
+
+class Fetcher:
+    """
+    Shared HTTP client for the data sources.
+
+    Requests go through a single pooled requests.Session, so connections are kept
+    alive and reused between pulls instead of paying a TCP + TLS handshake on every
+    request. Each host gets at most per_host_limit pooled connections and at most
+    per_host_limit requests in flight. Every request has explicit connect and read
+    timeouts, and compressed responses are requested by default.
+
+    A rate limiter (utils.rate.AdaptiveRateLimiter) can be registered for a host, it
+    is told about every successful and rate limited (429) response from that host.
+
+    Requests made with conditional=True send the validators of the response last
+    stored in the fetcher's ResponseCache, see utils.cache.
+    """
+
+    def __init__(
+        self,
+        per_host_limit: int = DEFAULT_PER_HOST_LIMIT,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        max_hosts: int = 10,
+        cache_size: int = 256,
+    ):
+        """
+        per_host_limit:     maximum connections to, and concurrent requests against, a single host
+        connect_timeout:    seconds to wait for a connection to be established
+        read_timeout:       seconds to wait between bytes of the response
+        max_hosts:          number of hosts to keep connection pools for
+        cache_size:         number of URLs to remember responses of for conditional requests
+        """
+        if per_host_limit < 1:
+            raise ValueError("per_host_limit must be at least 1")
+
+        self.per_host_limit = per_host_limit
+        self.timeout = (connect_timeout, read_timeout)
+        self.cache = ResponseCache(cache_size)
+
+        self._session = requests.Session()
+        self._session.headers.update(
+            {"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"}
+        )
+        adapter = HTTPAdapter(
+            pool_connections=max_hosts,
+            pool_maxsize=per_host_limit,
+            pool_block=True,
+        )
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+        self._host_slots = {}
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def register_limiter(self, url: str, limiter):
+        """Reports responses from url's host to limiter, None stops reporting them."""
+        with self._lock:
+            if limiter is None:
+                self._limiters.pop(urlsplit(url).netloc, None)
+            else:
+                self._limiters[urlsplit(url).netloc] = limiter
+
+    def _slots_for(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._host_slots[host]
+
+    def get(
+        self, url: str, headers: Optional[dict] = None, conditional: bool = False, **req_kwargs
+    ) -> requests.Response:
+        """
+        GET url, blocking while the host already has per_host_limit requests in flight.
+        If conditional, the request carries the validators cached for url, so the
+        response may be a 304.
+        """
+        req_kwargs.setdefault("timeout", self.timeout)
+        if conditional:
+            headers = {**(headers or {}), **self.cache.request_headers(url)}
+        host = urlsplit(url).netloc
+        with self._slots_for(host):
+            start = time.perf_counter()
+            resp = self._session.get(url, headers=headers, **req_kwargs)
+            # Read the body while holding the slot, so the connection goes back to the pool
+            resp.content
+            elapsed = time.perf_counter() - start
+        FETCH_SECONDS.observe(elapsed, host=host)
+        add_fetch(elapsed, len(resp.content))
+
+        limiter = self._limiters.get(host)
+        if limiter is not None:
+            if resp.status_code == 429:
+                limiter.on_rate_limited(retry_after_seconds(resp))
+            elif resp.status_code < 400:
+                limiter.on_success()
+        return resp
+
+    def close(self):
+        self._session.close()
+
+
+def retry_after_seconds(resp: requests.Response) -> Optional[float]:
+    """Seconds to wait according to the response's Retry-After header, None if missing or invalid."""
+    value = resp.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+_default_fetcher: Optional[Fetcher] = None
+_default_lock = threading.Lock()
+
+
+def get_fetcher() -> Fetcher:
+    """Returns the process wide Fetcher, creating it on first use."""
+    global _default_fetcher
+    with _default_lock:
+        if _default_fetcher is None:
+            _default_fetcher = Fetcher()
+        return _default_fetcher
@@ -0,0 +1,255 @@
+"""
+Read path for the stored price history.
+
+PriceHistory loads the records of many Steam items (by hash_name) or currencies (by
+name) with one bulk query into a long pandas DataFrame, one row per record, sorted
+by created_at:
+
+    created_at | hash_name (categorical) | price (float) | sell_listings
+
+With a start, each item's latest record before start leads its rows, moved to start:
+in delta mode an item is only stored when it changes, so this is its price at start.
+
+Steam prices are converted from the stored integer cents, so clients no longer parse
+sell_price or sale_price_text. The functions below then work on all the items at
+once: ohlc resamples into open/high/low/close bars per interval, wide pivots into a
+time x item frame, on which forward_fill and pct_change apply.
+
+Loaded frames are kept in an LRU cache keyed by the items and time range. attach
+drops the cached ranges a BatchWriter's writes may have changed, judged by the
+database's clock, which sets created_at.
+
+numpy and pandas are only needed by this module.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Optional
+from sqlalchemy import func, select
+
+logger = logging.getLogger(__name__)
+
+# Names queried per statement, below SQLite's bound parameter limit
+_NAMES_PER_QUERY = 500
+
+# Cached ranges ending this close before a write (by the database's clock) are
+# dropped, rows get the time their transaction started
+_WRITE_MARGIN = timedelta(minutes=5)
+
+
+def require_pandas():
+    """Imports pandas, raising an ImportError explaining it is needed for history queries."""
+    try:
+        import numpy
+        import pandas
+    except ImportError as e:
+        raise ImportError(
+            "Price history queries require numpy and pandas (pip install pandas)"
+        ) from e
+    return pandas
+
+
+class PriceHistory:
+    """
+    Loads price history into DataFrames, caching the max_entries most recently used
+    (items, time range) results for up to max_age seconds (other replicas may write
+    to the same database without invalidating the cache).
+
+    Frames returned are copies, callers may modify them.
+    """
+
+    def __init__(
+        self,
+        db_engine,
+        max_entries: int = 64,
+        max_age: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        require_pandas()
+        self.db_engine = db_engine
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._entries = OrderedDict()  # (table, names, start, end) -> (loaded at, frame)
+        self._invalidations = 0
+        self._lock = threading.Lock()
+
+    def steam_items(
+        self, hash_names: Iterable[str], start: datetime = None, end: datetime = None
+    ):
+        """History of the Steam items in hash_names, created in [start, end) (see above)."""
+        from data_sources.steam.models import ItemRecord
+
+        return self._load(
+            ItemRecord.__table__,
+            "hash_name",
+            {"price": ItemRecord.sell_price, "sell_listings": ItemRecord.sell_listings},
+            hash_names,
+            start,
+            end,
+            price_scale=0.01,  # Stored in cents
+        )
+
+    def currencies(self, names: Iterable[str], start: datetime = None, end: datetime = None):
+        """History of the currencies in names, created in [start, end) (see above)."""
+        from data_sources.yahoofinance.models import CurrencyRecord
+
+        return self._load(
+            CurrencyRecord.__table__,
+            "name",
+            {"price": CurrencyRecord.last_price},
+            names,
+            start,
+            end,
+        )
+
+    def invalidate(self, tables: Optional[set] = None):
+        """
+        Drops the cached frames of tables (names, all tables if None) which new rows
+        may belong to, i.e. whose range is open or ends after (about) the database's now.
+        """
+        try:
+            recent = self._db_now() - _WRITE_MARGIN
+        except Exception:
+            logger.warning("Failed to read the database time, dropping all cached ranges", exc_info=True)
+            recent = datetime.min
+        with self._lock:
+            self._invalidations += 1
+            for key in list(self._entries):
+                table, _, _, end = key
+                if (tables is None or table in tables) and (end is None or end >= recent):
+                    del self._entries[key]
+
+    def _db_now(self) -> datetime:
+        # The expression created_at defaults to, as the (naive) value it would store
+        with self.db_engine.connect() as conn:
+            now = conn.execute(select(func.now())).scalar()
+        return now.replace(tzinfo=None)
+
+    def attach(self, writer):
+        """Invalidates the cache whenever writer has written rows."""
+        writer.add_listener(self.invalidate)
+
+    def _load(self, table, key: str, values: dict, names, start, end, price_scale=None):
+        pd = require_pandas()
+        import numpy as np
+
+        names = tuple(sorted(set(names)))
+        cache_key = (table.name, names, start, end)
+
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and self._clock() - entry[0] <= self.max_age:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return entry[1].copy()
+            self.misses += 1
+            invalidations = self._invalidations
+
+        loaded_at = self._clock()
+        selected = (table.c.created_at, table.c[key], *values.values())
+        rows = []
+        with self.db_engine.connect() as conn:
+            if start is not None:
+                # Each item's latest record before start, as its price at start
+                for i in range(0, len(names), _NAMES_PER_QUERY):
+                    latest_ids = (
+                        select(func.max(table.c.id))
+                        .where(
+                            table.c[key].in_(names[i : i + _NAMES_PER_QUERY]),
+                            table.c.created_at < start,
+                        )
+                        .group_by(table.c[key])
+                    )
+                    result = conn.execute(select(*selected).where(table.c.id.in_(latest_ids)))
+                    rows.extend(result.cursor.fetchall())
+                    result.close()
+            n_previous = len(rows)
+
+            for i in range(0, len(names), _NAMES_PER_QUERY):
+                query = select(*selected).where(
+                    table.c[key].in_(names[i : i + _NAMES_PER_QUERY])
+                )
+                if start is not None:
+                    query = query.where(table.c.created_at >= start)
+                if end is not None:
+                    query = query.where(table.c.created_at < end)
+                # Fetch plain tuples from the driver, the columns are converted at once below
+                result = conn.execute(query)
+                rows.extend(result.cursor.fetchall())
+                result.close()
+
+        columns = list(zip(*rows)) if len(rows) > 0 else [[] for _ in range(2 + len(values))]
+        created_at = pd.Series(columns[0], dtype="object")
+        # SQLite returns ISO strings, other drivers datetimes
+        is_text = len(rows) > 0 and isinstance(columns[0][0], str)
+        frame = pd.DataFrame(
+            {
+                "created_at": pd.to_datetime(created_at, format="ISO8601" if is_text else None),
+                key: pd.Categorical(columns[1], categories=names),
+                **{
+                    name: np.asarray(column, dtype="float64" if name == "price" else None)
+                    for name, column in zip(values, columns[2:])
+                },
+            }
+        )
+        if n_previous > 0:
+            frame.loc[frame.index[:n_previous], "created_at"] = pd.Timestamp(start)
+        if price_scale is not None:
+            frame["price"] *= price_scale
+        frame = frame.sort_values(["created_at", key], kind="stable", ignore_index=True)
+        frame.attrs["key"] = key
+
+        with self._lock:
+            if self._invalidations != invalidations:
+                # Rows may have been written while loading
+                return frame.copy()
+            self._entries[cache_key] = (loaded_at, frame)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return frame.copy()
+
+
+def ohlc(frame, interval: str, value: str = "price"):
+    """
+    Open, high, low and close of value per item and interval (a pandas offset such as
+    "1h" or "1D"), indexed by (item, interval start). Intervals without records are left
+    out, wide and forward_fill give a regular grid.
+    """
+    key = frame.attrs["key"]
+    # One grouped aggregation over all items, rather than resampling item by item
+    buckets = frame["created_at"].dt.floor(interval)
+    bars = frame.groupby([frame[key], buckets], observed=True, sort=True)[value].agg(
+        ["first", "max", "min", "last"]
+    )
+    bars.columns = ["open", "high", "low", "close"]
+    return bars
+
+
+def wide(frame, interval: str = None, value: str = "price"):
+    """
+    value as a time x item frame. With interval, each item's last value per interval,
+    otherwise one row per distinct created_at.
+    """
+    key = frame.attrs["key"]
+    table = frame.pivot_table(
+        index="created_at", columns=key, values=value, aggfunc="last", observed=True
+    )
+    if interval is not None:
+        table = table.resample(interval).last()
+    return table
+
+
+def forward_fill(table, limit: int = None):
+    """Fills each item's gaps in a wide frame with its last known value, for at most limit rows."""
+    return table.ffill(limit=limit)
+
+
+def pct_change(table, periods: int = 1):
+    """Relative change of each item over periods rows of a wide frame, NaN across gaps."""
+    return table.pct_change(periods=periods, fill_method=None)
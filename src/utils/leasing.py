@@ -0,0 +1,314 @@
+import logging
+import math
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models import ShardLease, ReplicaHeartbeat
+from scheduling.job import RepeatableJob
+
+logger = logging.getLogger(__name__)
+
+# Leases are stored without a timezone, always in UTC
+_EXPIRED = datetime(1970, 1, 1)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def default_owner() -> str:
+    """Identifies this replica, unique even if several run on the same host."""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+class ShardLeases:
+    """
+    Splits job groups into shards which replicas lease through the database, so
+    several replicas sharing a database scrape disjoint sets of jobs.
+
+    Every replica keeps a heartbeat row alive and leases up to its fair share of the
+    shards (shard count / live replicas, rounded up). Leases are renewed by renew(),
+    which should run well within lease_ttl. Shards of a replica which stops renewing
+    expire and are claimed by the others; replicas holding more than their fair share
+    (e.g. after a new replica joins) release the extra shards, and while a live replica
+    holds fewer than the share rounded down, so do those holding more than that. The
+    shards a replica holds are spread over the job groups, so each group's jobs are
+    split between the replicas as evenly as the shard counts allow.
+
+    Only plain UPDATE/INSERT statements guarded by the lease expiry are used, so this
+    works on any database, including SQLite shared between processes. Replica clocks
+    are assumed to be roughly in sync (well within lease_ttl).
+    """
+
+    def __init__(self, db_engine, owner: str = None, lease_ttl: float = 60, clock=_utcnow):
+        """
+        db_engine:  database holding the lease tables
+        owner:      name of this replica, must be unique between replicas
+        lease_ttl:  seconds a lease or heartbeat stays valid without being renewed
+        """
+        self.db_engine = db_engine
+        self.owner = owner or default_owner()
+        self.lease_ttl = timedelta(seconds=lease_ttl)
+        self._clock = clock
+        self._shards = []
+        self._job_shards = {}
+        self._owned = frozenset()
+        self._renewed_at = None
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    @property
+    def owned(self) -> frozenset:
+        return self._owned
+
+    def add_jobs(self, name: str, jobs: list[RepeatableJob], num_shards: int):
+        """
+        Splits jobs into (at most) num_shards shards, named after name. Adding jobs
+        under the same name again (e.g. after a group was resized) reassigns them.
+        """
+        num_shards = max(1, min(num_shards, len(jobs)))
+        with self._lock:
+            for i in range(num_shards):
+                if f"{name}:{i}" not in self._shards:
+                    self._shards.append(f"{name}:{i}")
+            for i, job in enumerate(jobs):
+                self._job_shards[id(job)] = f"{name}:{i % num_shards}"
+
+    def remove_jobs(self, name: str):
+        """Stops leasing the shards added under name, releasing those this replica holds."""
+        with self._lock:
+            removed = {shard for shard in self._shards if _group(shard) == name}
+            self._shards = [shard for shard in self._shards if shard not in removed]
+            self._job_shards = {
+                job: shard for job, shard in self._job_shards.items() if shard not in removed
+            }
+            released = self._owned & removed
+            self._owned -= removed
+        if len(released) > 0:
+            with Session(self.db_engine) as session:
+                session.execute(
+                    update(ShardLease)
+                    .where(ShardLease.shard.in_(released), ShardLease.owner == self.owner)
+                    .values(owner=None, expires_at=_EXPIRED)
+                )
+                session.commit()
+
+    def add_listener(self, listener):
+        """
+        Calls listener(acquired shards) whenever renew takes over shards, before
+        their jobs are run.
+        """
+        self._listeners.append(listener)
+
+    def owns(self, job: RepeatableJob) -> bool:
+        """Whether this replica should run the job. Jobs without a shard always run."""
+        shard = self._job_shards.get(id(job))
+        return shard is None or shard in self._owned
+
+    def _ensure_rows(self, session: Session):
+        existing = set(session.scalars(select(ShardLease.shard)))
+        for shard in self._shards:
+            if shard in existing:
+                continue
+            try:
+                with session.begin_nested():
+                    session.add(ShardLease(shard=shard, owner=None, expires_at=_EXPIRED))
+            except IntegrityError:
+                pass  # Another replica added it first
+
+    def _heartbeat(self, session: Session, now: datetime):
+        expires = now + self.lease_ttl
+        result = session.execute(
+            update(ReplicaHeartbeat)
+            .where(ReplicaHeartbeat.owner == self.owner)
+            .values(expires_at=expires)
+        )
+        if result.rowcount == 0:
+            session.add(ReplicaHeartbeat(owner=self.owner, expires_at=expires))
+            session.flush()
+
+    def _holdings(self, session: Session, now: datetime) -> tuple[dict, int]:
+        """
+        The number of live leases of our shards each live replica holds per group, and
+        the number of our shards nobody holds.
+        """
+        live = session.scalars(select(ReplicaHeartbeat.owner).where(ReplicaHeartbeat.expires_at > now))
+        holdings = {owner: {} for owner in live}
+        free = len(self._shards)
+        leases = session.execute(
+            select(ShardLease.owner, ShardLease.shard).where(
+                ShardLease.shard.in_(self._shards), ShardLease.expires_at > now
+            )
+        )
+        for owner, shard in leases:
+            free -= 1
+            if owner in holdings:
+                groups = holdings[owner]
+                groups[_group(shard)] = groups.get(_group(shard), 0) + 1
+        return holdings, free
+
+    def renew(self) -> frozenset:
+        """Renews this replica's heartbeat and leases, then balances shards. Returns the owned shards."""
+        now = self._clock()
+        expires = now + self.lease_ttl
+
+        with Session(self.db_engine) as session:
+            self._ensure_rows(session)
+            self._heartbeat(session, now)
+            # Replicas which stopped without releasing are dead, forget them
+            session.execute(delete(ReplicaHeartbeat).where(ReplicaHeartbeat.expires_at <= now))
+
+            holdings, free = self._holdings(session, now)
+            counts = {owner: sum(groups.values()) for owner, groups in holdings.items()}
+            live = len(holdings)
+            fair_share = math.ceil(len(self._shards) / max(live, 1))
+
+            # Renew the leases we still hold
+            session.execute(
+                update(ShardLease)
+                .where(ShardLease.owner == self.owner, ShardLease.expires_at > now)
+                .values(expires_at=expires)
+            )
+            mine = _spread(
+                session.scalars(
+                    select(ShardLease.shard).where(
+                        ShardLease.owner == self.owner, ShardLease.expires_at > now
+                    )
+                )
+            )
+
+            # A replica below the share rounded down (e.g. one which joined while the
+            # others each hold the rounded up share) gets shards from those above it,
+            # unless there are enough free shards for it already
+            floor_share = len(self._shards) // max(live, 1)
+            missing = sum(
+                max(0, floor_share - count) for owner, count in counts.items() if owner != self.owner
+            )
+            if missing > free + max(0, len(mine) - fair_share):
+                fair_share = floor_share
+
+            # Give back shards above our fair share so new replicas can take them, keeping
+            # those spread over the most groups
+            for shard in mine[fair_share:]:
+                session.execute(
+                    update(ShardLease)
+                    .where(ShardLease.shard == shard, ShardLease.owner == self.owner)
+                    .values(owner=None, expires_at=_EXPIRED)
+                )
+            mine = mine[:fair_share]
+
+            # Claim expired shards up to our fair share, first of the groups we hold least
+            # of. A group's shards are split between the replicas (at most its share of
+            # them each), unless no other replica with room left could take one.
+            if len(mine) < fair_share:
+                group_share = {}
+                for shard in self._shards:
+                    group_share[_group(shard)] = group_share.get(_group(shard), 0) + 1
+                for group, size in group_share.items():
+                    group_share[group] = math.ceil(size / max(live, 1))
+                held = {}
+                for shard in mine:
+                    held[_group(shard)] = held.get(_group(shard), 0) + 1
+
+                def others_can_take(group):
+                    return any(
+                        counts[owner] < fair_share and groups.get(group, 0) < group_share[group]
+                        for owner, groups in holdings.items()
+                        if owner != self.owner
+                    )
+
+                expired = session.scalars(
+                    select(ShardLease.shard).where(
+                        ShardLease.shard.in_(self._shards), ShardLease.expires_at <= now
+                    )
+                ).all()
+                for shard in sorted(expired, key=lambda shard: (held.get(_group(shard), 0), shard)):
+                    group = _group(shard)
+                    if len(mine) >= fair_share:
+                        break
+                    if held.get(group, 0) >= group_share[group] and others_can_take(group):
+                        continue
+                    result = session.execute(
+                        update(ShardLease)
+                        .where(ShardLease.shard == shard, ShardLease.expires_at <= now)
+                        .values(owner=self.owner, expires_at=expires)
+                    )
+                    if result.rowcount == 1:
+                        mine.append(shard)
+                        held[group] = held.get(group, 0) + 1
+
+            session.commit()
+
+        owned = frozenset(mine)
+        if owned != self._owned:
+            logger.info(
+                f"Replica {self.owner} now owns {len(owned)}/{len(self._shards)} shards "
+                + f"({live} live replicas): {sorted(owned)}"
+            )
+        acquired = owned - self._owned
+        if len(acquired) > 0:
+            for listener in self._listeners:
+                try:
+                    listener(acquired)
+                except Exception:
+                    logger.warning("Shard lease listener failed", exc_info=True)
+        self._owned = owned
+        self._renewed_at = now
+        return owned
+
+    def drop_stale(self):
+        """Stops running owned shards if the leases could not be renewed before they expired."""
+        if self._renewed_at is not None and self._clock() >= self._renewed_at + self.lease_ttl:
+            if len(self._owned) > 0:
+                logger.warning(f"Shard leases of {self.owner} expired, no longer running them")
+            self._owned = frozenset()
+
+    def release(self):
+        """Gives up all leases and the heartbeat, e.g. on shutdown."""
+        with Session(self.db_engine) as session:
+            session.execute(
+                update(ShardLease)
+                .where(ShardLease.owner == self.owner)
+                .values(owner=None, expires_at=_EXPIRED)
+            )
+            session.execute(delete(ReplicaHeartbeat).where(ReplicaHeartbeat.owner == self.owner))
+            session.commit()
+        self._owned = frozenset()
+
+
+def _group(shard: str) -> str:
+    return shard.rsplit(":", 1)[0]
+
+
+def _spread(shards) -> list:
+    """
+    Orders shards so that the first n of them are spread over their groups: every
+    group's first shard, then every group's second shard, and so on.
+    """
+    shards = sorted(shards)
+    rank = {}
+    ranks = {}
+    for shard in shards:
+        ranks[shard] = rank.get(_group(shard), 0)
+        rank[_group(shard)] = ranks[shard] + 1
+    return sorted(shards, key=lambda shard: (ranks[shard], shard))
+
+
+def _renew_leases(leases: ShardLeases):
+    try:
+        leases.renew()
+    except Exception:
+        # Keep the current shards until their leases would have expired
+        logger.warning("Failed to renew shard leases", exc_info=True)
+        leases.drop_stale()
+
+
+def create_lease_jobs(leases: ShardLeases) -> list[RepeatableJob]:
+    """Job renewing the leases, run in a group with a delay well below the lease ttl."""
+    return [RepeatableJob(partial(_renew_leases, leases))]
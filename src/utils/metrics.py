@@ -0,0 +1,241 @@
+"""
+Minimal Prometheus style metrics for the scrape pipeline.
+
+Metrics are always collected in memory. start_metrics_server publishes them in the
+Prometheus text format on /metrics.
+"""
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _format_labels(labelnames, labelvalues, extra=()) -> str:
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if len(pairs) == 0:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _format_value(value) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(labels[n] for n in self.labelnames)
+
+    def _samples(self):
+        with self._lock:
+            return [(self.name, k, (), v) for k, v in self._values.items()]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for name, key, extra, value in self._samples():
+            lines.append(
+                f"{name}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}"
+            )
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def total(self) -> float:
+        """Sum of the counter over all label values."""
+        with self._lock:
+            return sum(self._values.values())
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._functions = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function, **labels):
+        """Reads the gauge's value from function whenever the metrics are rendered."""
+        key = self._key(labels)
+        with self._lock:
+            self._functions[key] = function
+
+    def _samples(self):
+        samples = super()._samples()
+        with self._lock:
+            functions = list(self._functions.items())
+        for key, function in functions:
+            try:
+                samples.append((self.name, key, (), function()))
+            except Exception:
+                logger.debug(f"Failed to read gauge {self.name}", exc_info=True)
+        return samples
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts, _, _ = entry = self._values[key]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the time spent in the with block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return 0 if entry is None else entry[2]
+
+    def _samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    samples.append(
+                        (f"{self.name}_bucket", key, (("le", _format_value(bound)),), cumulative)
+                    )
+                samples.append((f"{self.name}_sum", key, (), total))
+                samples.append((f"{self.name}_count", key, (), count))
+        return samples
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    with _registry_lock:
+        metrics = list(_registry)
+    return "\n".join(m.render() for m in metrics) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serves /metrics from a daemon thread. Returns the server (shutdown() stops it)."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+# Metrics of the scrape pipeline
+
+FETCH_SECONDS = Histogram(
+    "scraper_fetch_seconds", "Time to fetch a response, by host", ["host"]
+)
+PULL_SECONDS = Histogram(
+    "scraper_pull_seconds", "Time of one pull attempt (fetch and parse), by service", ["service"]
+)
+PARSE_SECONDS = Histogram(
+    "scraper_parse_seconds", "Time to parse a response into rows, by service", ["service"]
+)
+DB_WRITE_SECONDS = Histogram(
+    "scraper_db_write_seconds", "Time to write one transaction of updates"
+)
+ROWS_WRITTEN = Counter("scraper_rows_written_total", "Rows written to the database")
+RETRIES = Counter(
+    "scraper_retries_total", "Pull attempts rescheduled, by service and reason", ["service", "reason"]
+)
+FAILURES = Counter(
+    "scraper_update_failures_total", "Updates given up after max failures, by service", ["service"]
+)
+NOT_MODIFIED = Counter(
+    "scraper_not_modified_total", "Pulls skipped because the response had not changed, by service", ["service"]
+)
+RATE_LIMIT_WAIT_SECONDS = Counter(
+    "scraper_rate_limit_wait_seconds_total", "Cooldown requested by rate limits, by service", ["service"]
+)
+JOB_SECONDS = Histogram("scraper_job_seconds", "Time to run a job")
+JOB_ERRORS = Counter("scraper_job_errors_total", "Jobs which raised an unhandled exception")
+SCHEDULER_IDLE_SECONDS = Counter(
+    "scraper_scheduler_idle_seconds_total", "Time the scheduler waited for a group to become due"
+)
+GROUP_LAG_SECONDS = Histogram(
+    "scraper_group_lag_seconds",
+    "How long after its due time a group's job was started, by group",
+    ["group"],
+    buckets=(0.001, 0.01, 0.1, 0.5, 1, 5, 10, 30, 60, 300),
+)
+SOURCE_RATE = Gauge(
+    "scraper_source_rate", "Current adaptive request rate (requests/s), by source", ["source"]
+)
+SOURCE_PENALTIES = Gauge(
+    "scraper_source_penalties", "Rate limited responses seen by the adaptive limiter, by source", ["source"]
+)
+WRITER_QUEUE = Gauge("scraper_writer_queue", "Updates waiting to be written")
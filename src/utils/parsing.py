@@ -0,0 +1,91 @@
+"""
+Parse stage of the pipeline.
+
+Jobs fetch responses on the executor's threads and persist rows through the writer
+thread. In between, run_parser turns a raw response body into rows. By default it
+parses on the job's thread; once start_parse_pool has been called, parsing runs in a
+pool of processes instead, so CPU heavy parsing no longer holds the GIL the fetching
+and writing threads need. Parsers must be module level functions taking the raw body
+(bytes) and returning plain row tuples, which pickle cheaply.
+"""
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+from utils.metrics import PARSE_SECONDS
+from utils.timing import add_parse
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_size = 0
+_pool_lock = threading.Lock()
+
+
+def _ignore_interrupts():
+    # Ctrl+C reaches the whole process group, the main process stops the pool itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _new_pool(processes: int) -> ProcessPoolExecutor:
+    # Forking a process with running threads can deadlock the child, so spawn
+    return ProcessPoolExecutor(
+        processes,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_ignore_interrupts,
+    )
+
+
+def start_parse_pool(processes: int):
+    """Parses in processes worker processes from now on. 0 keeps parsing on the job threads."""
+    global _pool, _pool_size
+    with _pool_lock:
+        if _pool is not None:
+            raise RuntimeError("Parse pool already started")
+        if processes > 0:
+            _pool = _new_pool(processes)
+            _pool_size = processes
+            logger.info(f"Parsing in {processes} processes")
+
+
+def stop_parse_pool():
+    """Waits for running parses and stops the pool, parsing continues on the job threads."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+def _replace_broken_pool(broken: ProcessPoolExecutor):
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            logger.warning("A parse process died, starting a new parse pool")
+            _pool = _new_pool(_pool_size)
+
+
+def run_parser(service: str, parser: Callable, content: bytes, *args, **kwargs):
+    """
+    Returns parser(content, *args, **kwargs), run in the parse pool if one was
+    started. Exceptions raised by the parser are raised here. The time spent,
+    including the transfer to and from the pool, is recorded as the pull's parse time.
+    """
+    start = time.perf_counter()
+    pool = _pool
+    try:
+        if pool is None:
+            return parser(content, *args, **kwargs)
+        try:
+            return pool.submit(parser, content, *args, **kwargs).result()
+        except BrokenProcessPool:
+            _replace_broken_pool(pool)
+            return parser(content, *args, **kwargs)
+    finally:
+        elapsed = time.perf_counter() - start
+        PARSE_SECONDS.observe(elapsed, service=service)
+        add_parse(elapsed)
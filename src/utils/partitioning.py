@@ -0,0 +1,99 @@
+import logging
+from datetime import date
+from sqlalchemy import Column, Table, MetaData, inspect, text
+from scheduling.job import RepeatableJob
+from functools import partial
+
+logger = logging.getLogger(__name__)
+
+PARTITION_COLUMN = "created_at"
+
+# How often the partition maintenance job runs (seconds)
+MAINTENANCE_DELAY = 6 * 60 * 60
+
+
+def _month_start(d: date, offset: int = 0) -> date:
+    month = d.month - 1 + offset
+    return date(d.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_name(table_name: str, month: date) -> str:
+    return f"{table_name}_y{month.year}m{month.month:02d}"
+
+
+def partitioned_table(table: Table) -> Table:
+    """
+    A copy of table partitioned by month on created_at. PostgreSQL requires the
+    partition column in the primary key, so the key becomes (id, created_at).
+    """
+    columns = []
+    for column in table.columns:
+        copy: Column = column._copy()
+        if column.name == PARTITION_COLUMN:
+            copy.primary_key = True
+            copy.nullable = False
+        elif column.primary_key:
+            copy.autoincrement = True
+        columns.append(copy)
+
+    return Table(
+        table.name,
+        MetaData(),
+        *columns,
+        postgresql_partition_by=f"RANGE ({PARTITION_COLUMN})",
+    )
+
+
+def create_partitioned_table(engine, table: Table):
+    """
+    Creates table on PostgreSQL as a table partitioned by month on created_at, if it does
+    not exist yet. Existing tables are left alone (they are not converted).
+
+    Indexes are not created here, create_all creates them on the partitioned table.
+    """
+    if engine.dialect.name != "postgresql":
+        raise ValueError("Partitioned tables are only supported on PostgreSQL.")
+    if inspect(engine).has_table(table.name):
+        return
+
+    partitioned_table(table).create(engine)
+    logger.info(f"Created table {table.name} partitioned by month on {PARTITION_COLUMN}")
+
+    ensure_partitions(engine, [table])
+
+
+def partition_statements(table_name: str, months_ahead: int, today: date) -> list[str]:
+    """
+    DDL creating the default partition of table_name and its monthly partitions from
+    today's month until months_ahead months from now, skipping those which exist.
+    """
+    statements = [
+        f'CREATE TABLE IF NOT EXISTS "{table_name}_default" PARTITION OF "{table_name}" DEFAULT'
+    ]
+    for i in range(months_ahead + 1):
+        start = _month_start(today, i)
+        end = _month_start(today, i + 1)
+        statements.append(
+            f'CREATE TABLE IF NOT EXISTS "{partition_name(table_name, start)}" '
+            + f'PARTITION OF "{table_name}" '
+            + f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+    return statements
+
+
+def ensure_partitions(engine, tables: list[Table], months_ahead=2, today=None):
+    """
+    Creates the monthly partitions of each table from the current month until months_ahead
+    months from now, and a default partition catching rows outside of them.
+    """
+    today = today or date.today()
+    with engine.begin() as conn:
+        for table in tables:
+            for statement in partition_statements(table.name, months_ahead, today):
+                conn.execute(text(statement))
+    logger.debug(f"Ensured partitions for {[t.name for t in tables]}")
+
+
+def create_partition_jobs(db_engine, tables: list[Table]) -> list[RepeatableJob]:
+    """Job creating upcoming monthly partitions, run in a group with MAINTENANCE_DELAY."""
+    return [RepeatableJob(partial(ensure_partitions, db_engine, tables))]
@@ -0,0 +1,66 @@
+import cProfile
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SlowJobProfiler:
+    """
+    Profiles jobs with cProfile and dumps the profile of any job which took longer than
+    threshold seconds to directory, as <job name>-<timestamp>.prof (readable with pstats
+    or snakeviz).
+
+    Each job gets its own profile of the thread it runs on, so jobs running at the same
+    time on different workers are all profiled. Where the interpreter only allows one
+    active profiler (Python 3.12+), jobs starting while another one is profiled run
+    without profiling; slow ones are logged and counted in skipped.
+    """
+
+    def __init__(self, threshold: float, directory: str):
+        self.threshold = threshold
+        self.directory = directory
+        self.skipped = 0  # Slow jobs which could not be profiled
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def run(self, job):
+        """Runs job.execute(), profiling it on the current thread."""
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is active and the interpreter allows only one
+            profile = None
+        try:
+            return job.execute()
+        finally:
+            if profile is not None:
+                profile.disable()
+            elapsed = time.perf_counter() - start
+            if elapsed > self.threshold:
+                if profile is not None:
+                    self._dump(profile, job, elapsed)
+                else:
+                    self._skip(job, elapsed)
+
+    def _skip(self, job, elapsed: float):
+        with self._lock:
+            self.skipped += 1
+        logger.info(
+            f"Job {getattr(job, 'name', None) or 'job'} took {elapsed:.2f}s but was not profiled, "
+            + "another job was being profiled"
+        )
+
+    def _dump(self, profile: cProfile.Profile, job, elapsed: float):
+        name = re.sub(r"[^A-Za-z0-9_.-]+", "_", getattr(job, "name", None) or "job")
+        path = os.path.join(self.directory, f"{name}-{time.strftime('%Y%m%dT%H%M%S')}.prof")
+        try:
+            profile.dump_stats(path)
+            logger.info(f"Job {name} took {elapsed:.2f}s, profile written to {path}")
+        except OSError:
+            logger.warning(f"Failed to write profile to {path}", exc_info=True)
@@ -0,0 +1,118 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveRateLimiter:
+    """
+    AIMD (additive increase, multiplicative decrease) controller for the request rate
+    against one host.
+
+    Every successful response raises the rate by `increase` requests per second, every
+    rate limited (429) response multiplies it by `decrease`. The rate stays between
+    1 / max_delay and 1 / min_delay. Its delay can be used as a group delay in
+    GroupedDelayScheduler in place of a fixed number of seconds.
+    """
+
+    def __init__(
+        self,
+        initial_delay: float,
+        min_delay: float,
+        max_delay: float,
+        increase: float = 0.01,
+        decrease: float = 0.5,
+        name: str = "",
+    ):
+        """
+        initial_delay:  seconds between requests to start with
+        min_delay:      smallest delay (highest rate) the limiter goes to
+        max_delay:      largest delay (lowest rate) the limiter goes to
+        increase:       requests/second added to the rate after each success
+        decrease:       factor the rate is multiplied with after a rate limited response
+        """
+        if not 0 < min_delay <= max_delay:
+            raise ValueError("Delays must satisfy 0 < min_delay <= max_delay")
+        if not 0 < decrease < 1:
+            raise ValueError("decrease must be between 0 and 1")
+
+        self.name = name
+        self.min_rate = 1 / max_delay
+        self.max_rate = 1 / min_delay
+        self.increase = increase
+        self.decrease = decrease
+        self._rate = min(max(1 / initial_delay, self.min_rate), self.max_rate)
+        self._successes = 0
+        self._penalties = 0
+        self._last_retry_after = None
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        """Current rate, in requests per second."""
+        return self._rate
+
+    @property
+    def delay(self) -> float:
+        """Current delay between requests, in seconds."""
+        return 1 / self._rate
+
+    def set_bounds(self, min_delay: float, max_delay: float):
+        """Replaces the delay bounds, e.g. after a config reload, keeping the current rate within them."""
+        if not 0 < min_delay <= max_delay:
+            raise ValueError("Delays must satisfy 0 < min_delay <= max_delay")
+        with self._lock:
+            self.min_rate = 1 / max_delay
+            self.max_rate = 1 / min_delay
+            self._rate = min(max(self._rate, self.min_rate), self.max_rate)
+
+    def checkpoint(self) -> dict:
+        """The limiter's state, for restore after a restart."""
+        with self._lock:
+            return {"rate": self._rate}
+
+    def restore(self, state: dict):
+        """Resumes the rate of a checkpoint, within the current bounds."""
+        with self._lock:
+            self._rate = min(max(state["rate"], self.min_rate), self.max_rate)
+
+    def on_success(self):
+        with self._lock:
+            self._successes += 1
+            self._rate = min(self._rate + self.increase, self.max_rate)
+
+    def on_rate_limited(self, retry_after: float = None):
+        with self._lock:
+            self._penalties += 1
+            self._last_retry_after = retry_after
+            self._rate = max(self._rate * self.decrease, self.min_rate)
+            logger.info(
+                f"Rate limited by {self.name}, slowing down to {self._rate:.3f} requests/s "
+                + f"(penalties={self._penalties}, retry_after={retry_after})"
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "name": self.name,
+                "rate": self._rate,
+                "delay": 1 / self._rate,
+                "successes": self._successes,
+                "penalties": self._penalties,
+                "last_retry_after": self._last_retry_after,
+            }
+
+
+def group_delay_from_config(section: dict, name: str):
+    """
+    Returns the group delay for a source section: an AdaptiveRateLimiter if the section
+    enables adaptive, otherwise its fixed groupdelay.
+    """
+    if not section.get("adaptive", False):
+        return section["groupdelay"]
+    return AdaptiveRateLimiter(
+        initial_delay=section["groupdelay"],
+        min_delay=section["mindelay"],
+        max_delay=section["maxdelay"],
+        name=name,
+    )
@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine, func, insert, select
+from data_sources.steam.models import ItemRecord, load_tables
+from utils.archive import archive_cutoff, archive_table, delete_rows, stream_rows
+
+NOW = datetime(2026, 5, 10, 12, 0)
+TABLE = ItemRecord.__table__
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'scraper.db'}")
+    load_tables(engine)
+    # 4 rows per day over the 10 days before NOW
+    rows = [
+        {
+            "name": f"Item {i % 2}",
+            "hash_name": f"item-{i % 2}",
+            "sell_listings": i,
+            "sell_price": 100 + i,
+            "sale_price_text": "$1.00",
+            "created_at": NOW - timedelta(hours=6 * i + 1),
+        }
+        for i in range(40)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(TABLE), rows)
+    return engine
+
+
+def _count(engine):
+    with engine.connect() as conn:
+        return conn.scalar(select(func.count()).select_from(TABLE))
+
+
+def test_archive_cutoff():
+    assert archive_cutoff(3, "day", NOW) == datetime(2026, 5, 7)
+    assert archive_cutoff(30, "month", NOW) == datetime(2026, 4, 1)
+
+
+def test_stream_and_delete_rows(engine):
+    cutoff = archive_cutoff(5, "day", NOW)
+    batches = list(stream_rows(engine, TABLE, cutoff, batch_rows=7))
+
+    rows = [row for batch in batches for row in batch]
+    assert max(len(batch) for batch in batches) == 7
+    assert [row.created_at for row in rows] == sorted(row.created_at for row in rows)
+    assert all(row.created_at < cutoff for row in rows)
+
+    deleted = delete_rows(
+        engine, TABLE, datetime(2000, 1, 1), cutoff, max(row.id for row in rows), batch_rows=3
+    )
+    assert deleted == len(rows)
+    assert _count(engine) == 40 - len(rows)
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_archive_table(engine, tmp_path, fmt):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.dataset
+
+    archived = archive_table(
+        engine, TABLE, str(tmp_path / "archive"), max_age_days=5, fmt=fmt, batch_rows=3, now=NOW
+    )
+
+    # Rows from 2026-04-30 17:00 until the cutoff, 2026-05-05
+    assert archived == 18
+    assert _count(engine) == 40 - archived
+    days = sorted(p.name for p in (tmp_path / "archive" / TABLE.name).iterdir())
+    assert days == ["day=2026-04-30"] + [f"day=2026-05-0{d}" for d in range(1, 5)]
+
+    dataset = pyarrow.dataset.dataset(
+        str(tmp_path / "archive" / TABLE.name),
+        format="parquet" if fmt == "parquet" else "ipc",
+        partitioning="hive",
+    )
+    data = dataset.to_table()
+    assert data.num_rows == archived
+    assert pa.types.is_dictionary(data.schema.field("hash_name").type)
+
+
+def _insert(engine, hash_name, created_at):
+    row = {
+        "name": hash_name,
+        "hash_name": hash_name,
+        "sell_listings": 1,
+        "sell_price": 100,
+        "sale_price_text": "$1.00",
+        "created_at": created_at,
+    }
+    with engine.begin() as conn:
+        conn.execute(insert(TABLE), [row])
+
+
+def _hash_names(engine):
+    with engine.connect() as conn:
+        return conn.scalars(select(TABLE.c.hash_name).order_by(TABLE.c.id)).all()
+
+
+def test_archive_table_keeps_latest_row_per_item(engine, tmp_path):
+    pytest.importorskip("pyarrow")
+    # An item unchanged for weeks, whose latest row is still its price in delta mode
+    _insert(engine, "unchanged", NOW - timedelta(days=20, hours=1))
+    _insert(engine, "unchanged", NOW - timedelta(days=20))
+
+    archived = archive_table(engine, TABLE, str(tmp_path / "archive"), max_age_days=5, now=NOW)
+
+    assert archived == 18 + 1
+    assert _hash_names(engine).count("unchanged") == 1
+
+    # Once a newer row replaces it, the next run archives it
+    _insert(engine, "unchanged", NOW)
+    assert archive_table(engine, TABLE, str(tmp_path / "archive"), max_age_days=5, now=NOW) == 1
+    assert _hash_names(engine).count("unchanged") == 1
+
+
+def test_archive_table_uses_database_clock(engine, tmp_path):
+    pytest.importorskip("pyarrow")
+
+    # Every row is months older than the database's clock, all but each item's latest is archived
+    archived = archive_table(engine, TABLE, str(tmp_path / "archive"), max_age_days=5)
+
+    assert archived == 38
+    assert sorted(_hash_names(engine)) == ["item-0", "item-1"]
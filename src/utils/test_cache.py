@@ -0,0 +1,68 @@
+import requests
+from utils.cache import ResponseCache
+
+
+def _response(body: bytes, status=200, headers=None) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = status
+    resp._content = body
+    resp.headers.update(headers or {})
+    return resp
+
+
+def test_ResponseCache_matches_body_hash():
+    cache = ResponseCache()
+    url = "http://example.com/page"
+
+    assert not cache.not_modified(url, _response(b"one"))
+    cache.store(url, _response(b"one"))
+
+    assert cache.not_modified(url, _response(b"one"))
+    assert not cache.not_modified(url, _response(b"two"))
+    # Only the compared part of the body matters
+    assert cache.not_modified(url, _response(b"two"), body=b"one")
+
+
+def test_ResponseCache_validators():
+    cache = ResponseCache()
+    url = "http://example.com/page"
+    assert cache.request_headers(url) == {}
+
+    cache.store(url, _response(b"one", headers={"ETag": '"v1"', "Last-Modified": "Mon, 05 Jan 2026 10:00:00 GMT"}))
+
+    assert cache.request_headers(url) == {
+        "If-None-Match": '"v1"',
+        "If-Modified-Since": "Mon, 05 Jan 2026 10:00:00 GMT",
+    }
+    assert cache.not_modified(url, _response(b"", status=304))
+
+
+def test_ResponseCache_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2)
+    for url in ("a", "b"):
+        cache.store(url, _response(url.encode()))
+    cache.request_headers("a")
+    cache.store("c", _response(b"c"))
+
+    assert len(cache) == 2
+    assert cache.not_modified("a", _response(b"a"))
+    assert not cache.not_modified("b", _response(b"b"))
+
+
+def test_ResponseCache_reserve_keeps_every_page_of_a_cycle():
+    cache = ResponseCache(max_entries=4)
+    urls = [f"http://example.com/page?start={i * 100}" for i in range(10)]
+    cache.reserve("pages", len(urls))
+
+    for _ in range(2):
+        hits = 0
+        for url in urls:
+            hits += cache.not_modified(url, _response(b"same"))
+            cache.store(url, _response(b"same"))
+
+    # Without the reservation, each page's entry would be evicted before its next pull
+    assert hits == len(urls)
+
+    cache.reserve("pages", 0)
+    cache.store(urls[0], _response(b"same"))
+    assert len(cache) == 4
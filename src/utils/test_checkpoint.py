@@ -0,0 +1,73 @@
+from datetime import datetime
+from functools import partial
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from models import SchedulerCheckpoint, load_tables
+from scheduling.job import RepeatableJob
+from scheduling.schedulers import GroupedDelayScheduler
+from utils.checkpoint import DatabaseCheckpointStore, FileCheckpointStore, SchedulerCheckpointer
+
+
+@pytest.fixture(params=["database", "file"])
+def store(request, tmp_path):
+    if request.param == "file":
+        return FileCheckpointStore(str(tmp_path / "checkpoint.json"))
+    engine = create_engine(f"sqlite:///{tmp_path / 'scraper.db'}")
+    load_tables(engine)
+    return DatabaseCheckpointStore(engine)
+
+
+def _scheduler(jobs):
+    s = GroupedDelayScheduler()
+    s.add_job_group(jobs, group_delay=0, name="pages")
+    return s
+
+
+def test_checkpoint_store_round_trip(store):
+    assert store.load() == {}
+
+    state = {"job_offset": 2, "retries": [["page-1", 5.0]]}
+    store.save({"pages": state, "Archive": {}}, 1_700_000_000.0)
+    store.save({"pages": state}, 1_700_000_010.0)
+
+    # Groups left out of the latest save are gone
+    assert store.load() == {"pages": (state, 1_700_000_010.0)}
+
+
+def test_SchedulerCheckpointer_resumes_cycle(store):
+    jobs = [RepeatableJob(partial(print, i), name=f"page-{i}") for i in range(5)]
+    wall = [1_700_000_000.0]
+    s = _scheduler(jobs)
+    for _ in range(3):
+        s.next_job()
+    SchedulerCheckpointer(s, store, clock=lambda: wall[0]).save()
+
+    wall[0] += 60
+    s2 = _scheduler(jobs)
+    SchedulerCheckpointer(s2, store, clock=lambda: wall[0]).restore()
+
+    assert s2.next_job() is jobs[3]
+
+
+def test_SchedulerCheckpointer_ages_each_group_by_its_own_save(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'scraper.db'}")
+    load_tables(engine)
+    store = DatabaseCheckpointStore(engine)
+    jobs = [RepeatableJob(partial(print, i), name=f"page-{i}") for i in range(2)]
+    wall = [1_700_000_000.0]
+    s = _scheduler(jobs)
+    s.retry(jobs[0], 120, group_cooldown=True)
+    SchedulerCheckpointer(s, store, clock=lambda: wall[0]).save()
+
+    # A stale row of a group which no longer exists, saved long before
+    with Session(engine) as session:
+        session.add(SchedulerCheckpoint(group_name="Archive", state="{}", saved_at=datetime(2020, 1, 1)))
+        session.commit()
+
+    wall[0] += 60
+    s2 = _scheduler(jobs)
+    SchedulerCheckpointer(s2, store, clock=lambda: wall[0]).restore()
+
+    # The pages group still waits out the rest of its cooldown
+    assert s2.next_job(timeout=0) is None
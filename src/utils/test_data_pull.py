@@ -0,0 +1,106 @@
+import pytest
+import requests
+from functools import partial
+from sqlalchemy import create_engine, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from models import DataUpdateRecord, load_tables as load_main_tables
+from data_sources.errors import NotModified
+from data_sources.steam.models import ItemRecord, ItemRow, load_tables as load_steam_tables
+from scheduling.job import RetryJob
+from utils.cache import ResponseCache
+from utils.data_pull import PulledItems, create_update_partial
+
+
+def _engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    load_main_tables(engine)
+    load_steam_tables(engine)
+    return engine
+
+
+def _records(engine, model):
+    with Session(engine) as session:
+        return session.scalars(select(model).order_by(model.id)).all()
+
+
+def _rows():
+    return [ItemRow(f"Item {i}", f"item-{i}", i, i * 10, "$0.10") for i in range(3)]
+
+
+def test_data_update_stores_rows(tmp_path):
+    engine = _engine(tmp_path)
+    update = create_update_partial(engine, "Test", "Page", _rows, max_fails=3)
+
+    update()
+
+    assert len(_records(engine, ItemRecord)) == 3
+    [record] = _records(engine, DataUpdateRecord)
+    assert record.success
+    assert record.row_count == 3
+    assert not record.not_modified
+
+
+def test_data_update_not_modified(tmp_path):
+    engine = _engine(tmp_path)
+
+    def unchanged():
+        raise NotModified("Page has not changed")
+
+    create_update_partial(engine, "Test", "Page", unchanged, max_fails=3)()
+
+    assert _records(engine, ItemRecord) == []
+    [record] = _records(engine, DataUpdateRecord)
+    assert record.success
+    assert record.not_modified
+    assert record.row_count == 0
+    assert record.message == "Page has not changed"
+
+
+def test_data_update_retries_then_gives_up(tmp_path):
+    engine = _engine(tmp_path)
+
+    def broken():
+        raise ValueError("bad page")
+
+    update = create_update_partial(engine, "Test", "Page", broken, max_fails=2)
+    with pytest.raises(RetryJob):
+        update()
+    update()  # Second failure gives up
+
+    records = _records(engine, DataUpdateRecord)
+    assert [r.success for r in records] == [False, False]
+    assert records[1].message == "Gave up: bad page"
+
+
+def test_data_update_caches_response_only_once_written(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    load_main_tables(engine)  # No item table yet, so writing the items fails
+    cache = ResponseCache()
+    url = "http://example.com/page"
+    resp = requests.Response()
+    resp.status_code = 200
+    resp._content = b"page"
+    parsed = []
+
+    def page():
+        if cache.not_modified(url, resp):
+            raise NotModified("Page has not changed")
+        parsed.append(resp.content)
+        return PulledItems(_rows(), on_written=partial(cache.store, url, resp))
+
+    update = create_update_partial(engine, "Test", "Page", page, max_fails=3)
+    with pytest.raises(OperationalError):
+        update()
+    assert len(cache) == 0
+
+    # The same response is parsed again, and only cached once its rows are stored
+    load_steam_tables(engine)
+    update()
+    assert len(parsed) == 2
+    assert len(_records(engine, ItemRecord)) == 3
+    assert cache.not_modified(url, resp)
+
+    update()
+    assert len(parsed) == 2
+    assert _records(engine, DataUpdateRecord)[-1].not_modified
@@ -0,0 +1,193 @@
+from datetime import datetime
+from types import SimpleNamespace
+from sqlalchemy import create_engine, inspect, select, text
+from sqlalchemy.orm import Session
+from data_sources.steam.models import ItemRecord, ItemRow, load_tables
+from models import UpdateRow, load_tables as load_main_tables
+from utils.db import bulk_insert, model_to_row, _copy_text_value
+
+
+def _rows(n):
+    return [
+        dict(
+            name=f"Item {i}",
+            hash_name=f"item-{i}",
+            sell_listings=i,
+            sell_price=i * 10,
+            sale_price_text=f"${i}.00",
+        )
+        for i in range(n)
+    ]
+
+
+def test_bulk_insert_writes_rows_with_defaults():
+    engine = create_engine("sqlite:///:memory:")
+    load_tables(engine)
+
+    with Session(engine) as session:
+        bulk_insert(session, ItemRecord, _rows(250))
+        session.commit()
+
+    with Session(engine) as session:
+        records = session.scalars(select(ItemRecord).order_by(ItemRecord.id)).all()
+
+    assert len(records) == 250
+    assert records[249].hash_name == "item-249"
+    assert all(r.created_at is not None for r in records)
+
+
+def test_bulk_insert_writes_namedtuple_rows():
+    engine = create_engine("sqlite:///:memory:")
+    load_tables(engine)
+
+    with Session(engine) as session:
+        bulk_insert(session, ItemRecord, [ItemRow(**row) for row in _rows(3)])
+        session.commit()
+
+    with Session(engine) as session:
+        records = session.scalars(select(ItemRecord).order_by(ItemRecord.id)).all()
+
+    assert [r.hash_name for r in records] == ["item-0", "item-1", "item-2"]
+    assert records[2].sell_price == 20
+
+
+def test_model_to_row_skips_unset_defaulted_columns():
+    record = ItemRecord(**_rows(1)[0])
+    row = model_to_row(record)
+
+    assert row == _rows(1)[0]
+
+
+def test_model_to_row_reads_row_objects_with_a_model():
+    row = model_to_row(UpdateRow(service_name="Steam", title="page 1", success=True))
+
+    # Unset columns are kept as None, so every record has the same keys
+    assert row == dict(
+        service_name="Steam",
+        title="page 1",
+        success=True,
+        message=None,
+        attempts=None,
+        run_time=None,
+        fetch_time=None,
+        parse_time=None,
+        backoff_time=None,
+        write_time=None,
+        bytes_downloaded=None,
+        row_count=None,
+        not_modified=None,
+    )
+
+
+class _FakeCopyCursor:
+    def __init__(self, copies):
+        self.copies = copies
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def copy_expert(self, sql, file):
+        self.copies.append((sql, file.read()))
+
+
+class _FakePsycopg2Session:
+    """Just what bulk_insert uses of a Session bound to PostgreSQL through psycopg2."""
+
+    NOW = datetime(2026, 3, 1, 12, 30)
+
+    def __init__(self):
+        self.copies = []
+        self.executed = []
+        dbapi_connection = SimpleNamespace(cursor=lambda: _FakeCopyCursor(self.copies))
+        self._connection = SimpleNamespace(connection=SimpleNamespace(dbapi_connection=dbapi_connection))
+
+    def get_bind(self):
+        return SimpleNamespace(dialect=SimpleNamespace(name="postgresql", driver="psycopg2"))
+
+    def execute(self, statement):
+        # Only the created_at default, now(), is evaluated through the session
+        self.executed.append(str(statement))
+        return SimpleNamespace(scalar=lambda: self.NOW)
+
+    def connection(self):
+        return self._connection
+
+
+def test_bulk_insert_copies_rows_on_psycopg2():
+    session = _FakePsycopg2Session()
+    rows = [
+        ItemRow(name="Tab\tName", hash_name="line\nbreak", sell_listings=1, sell_price=5, sale_price_text="$0.05"),
+        ItemRow(name="Back\\slash", hash_name="b", sell_listings=2, sell_price=10, sale_price_text="$0.10"),
+    ]
+    bulk_insert(session, ItemRecord, rows)
+
+    [(sql, payload)] = session.copies
+    assert sql == (
+        'COPY "steam_item_records" ("name", "hash_name", "sell_listings", "sell_price", '
+        + '"sale_price_text", "created_at") FROM STDIN'
+    )
+    # created_at is filled in once from the database's now(), tabs and newlines are escaped
+    assert len(session.executed) == 1
+    assert payload == (
+        "Tab\\tName\tline\\nbreak\t1\t5\t$0.05\t2026-03-01 12:30:00\n"
+        + "Back\\\\slash\tb\t2\t10\t$0.10\t2026-03-01 12:30:00\n"
+    )
+
+
+def test_bulk_insert_copies_model_to_row_dicts_with_nulls():
+    session = _FakePsycopg2Session()
+    rows = [
+        model_to_row(UpdateRow(service_name="Steam", title="page 1", success=True, attempts=1, run_time=0.5)),
+        model_to_row(UpdateRow(service_name="Steam", title="page 2", success=False, message="a\tb")),
+    ]
+    bulk_insert(session, UpdateRow.model, rows)
+
+    [(sql, payload)] = session.copies
+    assert sql.startswith('COPY "data_update_records" ("service_name", "title", "success", "message", ')
+    assert sql.endswith('"not_modified", "created_at") FROM STDIN')
+    lines = payload.splitlines()
+    assert lines[0].split("\t") == (
+        ["Steam", "page 1", "t", "\\N", "1", "0.5"] + ["\\N"] * 7 + ["2026-03-01 12:30:00"]
+    )
+    assert lines[1].split("\t")[:5] == ["Steam", "page 2", "f", "a\\tb", "\\N"]
+
+
+def test_copy_text_value_escapes():
+    assert _copy_text_value(None) == "\\N"
+    assert _copy_text_value(True) == "t"
+    assert _copy_text_value("a\tb\nc\\") == "a\\tb\\nc\\\\"
+
+
+def test_load_tables_adds_missing_indexes_to_existing_table():
+    engine = create_engine("sqlite:///:memory:")
+    # Table created before the indexes were declared
+    ItemRecord.__table__.create(engine)
+    for index in ItemRecord.__table__.indexes:
+        index.drop(engine)
+
+    load_tables(engine)
+
+    names = {i["name"] for i in inspect(engine).get_indexes("steam_item_records")}
+    assert "ix_steam_item_records_hash_name_created_at" in names
+    assert "ix_steam_item_records_name_created_at" in names
+
+
+def test_load_tables_adds_missing_nullable_columns():
+    engine = create_engine("sqlite:///:memory:")
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "CREATE TABLE data_update_records (id INTEGER PRIMARY KEY, service_name VARCHAR NOT NULL, "
+                + "title VARCHAR NOT NULL, success BOOLEAN NOT NULL, message VARCHAR, "
+                + "attempts INTEGER NOT NULL, run_time FLOAT NOT NULL, created_at DATETIME NOT NULL)"
+            )
+        )
+
+    load_main_tables(engine)
+
+    columns = {c["name"] for c in inspect(engine).get_columns("data_update_records")}
+    assert {"fetch_time", "parse_time", "backoff_time", "write_time"} <= columns
+    assert {"bytes_downloaded", "row_count"} <= columns
@@ -0,0 +1,144 @@
+import gzip
+import time
+import threading
+import pytest
+import requests
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils.fetch import Fetcher
+from utils.rate import AdaptiveRateLimiter
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Serves a fixed body, gzipped if the client accepts it. /slow sleeps before answering,
+    /limited returns 429, /etag returns 304 to requests with its ETag.
+    """
+
+    protocol_version = "HTTP/1.1"  # Keep-alive
+    body = b'{"results": [], "total_count": 0}' * 50
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.connections.add(self.client_address)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            if self.path.startswith("/slow"):
+                time.sleep(server.slow_for)
+            if self.path.startswith("/limited"):
+                self.send_response(429)
+                self.send_header("Retry-After", "42")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            if self.path.startswith("/etag") and self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+
+            body = self.body
+            self.send_response(200)
+            if self.path.startswith("/etag"):
+                self.send_header("ETag", '"v1"')
+            if "gzip" in self.headers.get("Accept-Encoding", ""):
+                body = gzip.compress(body)
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.lock = threading.Lock()
+    server.connections = set()
+    server.in_flight = 0
+    server.max_in_flight = 0
+    server.slow_for = 0.2
+    t = threading.Thread(target=server.serve_forever, daemon=True)
+    t.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _url(server, path="/"):
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+
+def test_Fetcher_reuses_connections(stub_server):
+    f = Fetcher()
+    for _ in range(10):
+        assert f.get(_url(stub_server)).status_code == 200
+
+    # All requests went over a single kept-alive connection
+    assert len(stub_server.connections) == 1
+
+
+def test_Fetcher_decompresses_gzip(stub_server):
+    f = Fetcher()
+    resp = f.get(_url(stub_server))
+
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert resp.content == StubHandler.body
+
+
+def test_Fetcher_caps_concurrency_per_host(stub_server):
+    f = Fetcher(per_host_limit=2)
+    threads = [
+        threading.Thread(target=f.get, args=(_url(stub_server, "/slow"),))
+        for _ in range(6)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert stub_server.max_in_flight == 2
+    assert len(stub_server.connections) <= 2
+
+
+def test_Fetcher_read_timeout(stub_server):
+    stub_server.slow_for = 1
+    f = Fetcher(read_timeout=0.1)
+
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        f.get(_url(stub_server, "/slow"))
+
+
+def test_Fetcher_reports_responses_to_limiter(stub_server):
+    f = Fetcher()
+    limiter = AdaptiveRateLimiter(initial_delay=1, min_delay=0.1, max_delay=10)
+    f.register_limiter(_url(stub_server), limiter)
+
+    f.get(_url(stub_server))
+    assert f.get(_url(stub_server, "/limited")).status_code == 429
+
+    stats = limiter.stats()
+    assert stats["successes"] == 1
+    assert stats["penalties"] == 1
+    assert stats["last_retry_after"] == 42
+
+
+def test_Fetcher_conditional_requests(stub_server):
+    f = Fetcher()
+    url = _url(stub_server, "/etag")
+
+    resp = f.get(url, conditional=True)
+    assert resp.status_code == 200
+    f.cache.store(url, resp)
+
+    resp = f.get(url, conditional=True)
+    assert resp.status_code == 304
+    assert f.cache.not_modified(url, resp)
+    # Without conditional, the full response comes back
+    assert f.get(url).status_code == 200
@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine, insert
+from data_sources.steam.models import ItemRecord, load_tables as load_steam_tables
+from data_sources.yahoofinance.models import CurrencyRecord, load_tables as load_yahoo_tables
+
+pd = pytest.importorskip("pandas")
+
+from utils.history import PriceHistory, forward_fill, ohlc, pct_change, wide  # noqa: E402
+
+START = datetime(2026, 3, 1)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'scraper.db'}")
+    load_steam_tables(engine)
+    load_yahoo_tables(engine)
+    # item-a every 30 minutes for 3 hours, item-b only in the first and last hour
+    rows = [
+        dict(
+            name="A",
+            hash_name="item-a",
+            sell_listings=10,
+            sell_price=100 + i,
+            sale_price_text="",
+            created_at=START + timedelta(minutes=30 * i),
+        )
+        for i in range(6)
+    ] + [
+        dict(
+            name="B",
+            hash_name="item-b",
+            sell_listings=1,
+            sell_price=price,
+            sale_price_text="",
+            created_at=START + timedelta(minutes=minutes),
+        )
+        for minutes, price in [(10, 200), (20, 250), (130, 300)]
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(ItemRecord.__table__), rows)
+        conn.execute(
+            insert(CurrencyRecord.__table__),
+            [dict(name="EUR=X", last_price=0.9, created_at=START)],
+        )
+    return engine
+
+
+def test_PriceHistory_loads_items_in_one_frame(engine):
+    history = PriceHistory(engine)
+    frame = history.steam_items(["item-a", "item-b", "item-c"], end=START + timedelta(hours=2))
+
+    assert list(frame.columns) == ["created_at", "hash_name", "price", "sell_listings"]
+    assert len(frame) == 4 + 2
+    assert frame["created_at"].is_monotonic_increasing
+    assert frame.loc[frame["hash_name"] == "item-a", "price"].tolist() == [1.0, 1.01, 1.02, 1.03]
+
+    currencies = history.currencies(["EUR=X"])
+    assert currencies["price"].tolist() == [0.9]
+
+
+def test_PriceHistory_cache(engine):
+    clock = [0.0]
+    history = PriceHistory(engine, max_entries=2, max_age=60, clock=lambda: clock[0])
+    old = START + timedelta(hours=1)
+
+    history.steam_items(["item-a"], end=old)
+    frame = history.steam_items(["item-a"], end=old)
+    frame.loc[:, "price"] = 0.0  # A copy, the cache is unaffected
+    assert history.steam_items(["item-a"], end=old)["price"].iloc[0] == 1.0
+    assert (history.hits, history.misses) == (2, 1)
+
+    # Writes only drop open ranges
+    history.steam_items(["item-a"])
+    history.invalidate({ItemRecord.__tablename__})
+    history.steam_items(["item-a"], end=old)
+    history.steam_items(["item-a"])
+    assert (history.hits, history.misses) == (3, 3)
+
+    clock[0] += 61
+    history.steam_items(["item-a"], end=old)
+    assert history.misses == 4
+
+
+def test_ohlc_ffill_and_pct_change(engine):
+    frame = PriceHistory(engine).steam_items(["item-a", "item-b"])
+
+    bars = ohlc(frame, "1h")
+    assert bars.loc[("item-a", START)].tolist() == [1.0, 1.01, 1.0, 1.01]
+    assert bars.loc[("item-b", START)].tolist() == [2.0, 2.5, 2.0, 2.5]
+    assert ("item-b", START + timedelta(hours=1)) not in bars.index
+    assert bars.loc[("item-b", START + timedelta(hours=2))].tolist() == [3.0] * 4
+
+    hourly = forward_fill(wide(frame, "1h"))
+    assert hourly["item-b"].tolist() == [2.5, 2.5, 3.0]
+    assert pct_change(hourly)["item-b"].tolist()[1:] == [0.0, pytest.approx(0.2)]
+
+
+def test_PriceHistory_starts_items_at_their_previous_price(engine):
+    start = START + timedelta(minutes=90)
+    frame = PriceHistory(engine).steam_items(["item-a", "item-b", "item-c"], start=start)
+
+    # The latest record before start of each item, moved to start, then the rows in range
+    assert frame.loc[frame["created_at"] == start, ["hash_name", "price"]].values.tolist() == [
+        ["item-a", 1.02],
+        ["item-a", 1.03],
+        ["item-b", 2.5],
+    ]
+    assert frame.loc[frame["hash_name"] == "item-b", "price"].tolist() == [2.5, 3.0]
+
+    hourly = forward_fill(wide(frame, "1h"))
+    assert hourly["item-b"].tolist() == [2.5, 3.0]
+
+
+def test_PriceHistory_invalidates_by_database_time(engine):
+    history = PriceHistory(engine)
+    db_now = history._db_now()
+    recent, old = db_now - timedelta(minutes=1), db_now - timedelta(days=1)
+    history.steam_items(["item-a"], end=recent)
+    history.steam_items(["item-a"], end=old)
+
+    history.invalidate({ItemRecord.__tablename__})
+    history.steam_items(["item-a"], end=recent)
+    history.steam_items(["item-a"], end=old)
+
+    assert (history.hits, history.misses) == (1, 3)
@@ -0,0 +1,164 @@
+from datetime import datetime, timedelta
+from functools import partial
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+from models import ReplicaHeartbeat, load_tables
+from scheduling.job import RepeatableJob
+from utils.leasing import ShardLeases
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = datetime(2026, 1, 1)
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += timedelta(seconds=seconds)
+
+
+def _setup(tmp_path, n_replicas, n_jobs=9, n_shards=3):
+    # A file database, as separate processes would share
+    engine = create_engine(f"sqlite:///{tmp_path / 'leases.db'}")
+    load_tables(engine)
+    clock = FakeClock()
+    jobs = [RepeatableJob(partial(print, i)) for i in range(n_jobs)]
+    replicas = []
+    for i in range(n_replicas):
+        r = ShardLeases(engine, owner=f"replica-{i}", lease_ttl=60, clock=clock)
+        r.add_jobs("Steam.ItemListings", jobs, n_shards)
+        replicas.append(r)
+    return clock, jobs, replicas
+
+
+def _renew_all(replicas, rounds=2):
+    for _ in range(rounds):
+        for r in replicas:
+            r.renew()
+
+
+def test_ShardLeases_replicas_own_disjoint_shards(tmp_path):
+    clock, jobs, replicas = _setup(tmp_path, 3)
+    _renew_all(replicas)
+
+    owned = [r.owned for r in replicas]
+    assert all(len(o) == 1 for o in owned)
+    assert len(owned[0] | owned[1] | owned[2]) == 3
+
+    # Every job is run by exactly one replica
+    for job in jobs:
+        assert sum(r.owns(job) for r in replicas) == 1
+
+
+def test_ShardLeases_new_replica_gets_a_share(tmp_path):
+    clock, jobs, replicas = _setup(tmp_path, 2)
+
+    replicas[0].renew()
+    assert len(replicas[0].owned) == 3
+
+    _renew_all(replicas)
+    assert len(replicas[0].owned) == 2
+    assert len(replicas[1].owned) == 1
+
+
+def test_ShardLeases_take_over_dead_replica(tmp_path):
+    clock, jobs, replicas = _setup(tmp_path, 3)
+    _renew_all(replicas)
+
+    # replica-2 stops renewing
+    alive = replicas[:2]
+    clock.advance(30)
+    _renew_all(alive)
+    clock.advance(31)
+    _renew_all(alive)
+
+    assert len(alive[0].owned | alive[1].owned) == 3
+    assert alive[0].owned.isdisjoint(alive[1].owned)
+
+
+def test_ShardLeases_drop_stale_leases(tmp_path):
+    clock, jobs, replicas = _setup(tmp_path, 1)
+    replicas[0].renew()
+
+    clock.advance(61)
+    replicas[0].drop_stale()
+
+    assert replicas[0].owned == frozenset()
+
+
+def test_ShardLeases_resized_jobs_keep_shards(tmp_path):
+    clock, jobs, replicas = _setup(tmp_path, 2)
+    more = jobs + [RepeatableJob(partial(print, i)) for i in range(9, 12)]
+    for r in replicas:
+        r.add_jobs("Steam.ItemListings", more, 3)
+    _renew_all(replicas)
+
+    assert len(replicas[0].owned | replicas[1].owned) == 3
+    for job in more:
+        assert sum(r.owns(job) for r in replicas) == 1
+
+
+def test_ShardLeases_remove_jobs(tmp_path):
+    clock, jobs, replicas = _setup(tmp_path, 1)
+    yahoo = [RepeatableJob(partial(print, "yahoo"))]
+    replicas[0].add_jobs("YahooFinance.Currency", yahoo, 1)
+    replicas[0].renew()
+    assert len(replicas[0].owned) == 4
+
+    replicas[0].remove_jobs("Steam.ItemListings")
+    assert replicas[0].owned == frozenset({"YahooFinance.Currency:0"})
+    # The removed shards were released, not kept alive by renewing
+    assert replicas[0].renew() == frozenset({"YahooFinance.Currency:0"})
+
+
+def test_ShardLeases_listeners_get_acquired_shards(tmp_path):
+    clock, jobs, replicas = _setup(tmp_path, 2)
+    acquired = []
+    replicas[0].add_listener(acquired.append)
+    _renew_all(replicas)
+    assert set().union(*acquired) >= replicas[0].owned
+    before = replicas[0].owned
+
+    # replica-1 stops renewing, replica-0 takes over its shards
+    acquired.clear()
+    clock.advance(61)
+    replicas[0].renew()
+    assert acquired == [replicas[0].owned - before]
+    assert len(replicas[0].owned) == 3
+
+
+def test_ShardLeases_every_replica_gets_work_with_several_groups(tmp_path):
+    clock, jobs, replicas = _setup(tmp_path, 3)
+    yahoo = [RepeatableJob(partial(print, "yahoo"))]
+    for r in replicas:
+        r.add_jobs("YahooFinance.Currency", yahoo, 1)
+    _renew_all(replicas, rounds=3)
+
+    owned = [r.owned for r in replicas]
+    assert all(len(o) > 0 for o in owned)
+    assert sum(len(o) for o in owned) == 4
+    # The Steam shards are split between the replicas, not held twice by one
+    steam = [{s for s in o if s.startswith("Steam.ItemListings:")} for o in owned]
+    assert all(len(s) == 1 for s in steam)
+    for job in jobs + yahoo:
+        assert sum(r.owns(job) for r in replicas) == 1
+
+
+def _heartbeats(replicas):
+    with Session(replicas[0].db_engine) as session:
+        return session.scalar(select(func.count()).select_from(ReplicaHeartbeat))
+
+
+def test_ShardLeases_heartbeats_are_removed(tmp_path):
+    clock, jobs, replicas = _setup(tmp_path, 3)
+    _renew_all(replicas)
+    assert _heartbeats(replicas) == 3
+
+    # replica-2 shuts down, replica-1 stops renewing and is pruned once it expired
+    replicas[2].release()
+    assert _heartbeats(replicas) == 2
+    clock.advance(61)
+    replicas[0].renew()
+    assert _heartbeats(replicas) == 1
+    assert len(replicas[0].owned) == 3
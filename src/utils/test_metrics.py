@@ -0,0 +1,43 @@
+import urllib.request
+from utils.metrics import Counter, Gauge, Histogram, render, start_metrics_server
+
+
+def test_Histogram_renders_cumulative_buckets():
+    h = Histogram("test_latency_seconds", "Test latency", ["host"], buckets=(0.1, 1))
+    h.observe(0.05, host="a")
+    h.observe(0.5, host="a")
+    h.observe(5, host="a")
+
+    text = h.render()
+    assert 'test_latency_seconds_bucket{host="a",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{host="a",le="1.0"} 2' in text
+    assert 'test_latency_seconds_bucket{host="a",le="+Inf"} 3' in text
+    assert 'test_latency_seconds_count{host="a"} 3' in text
+    assert "# TYPE test_latency_seconds histogram" in text
+
+
+def test_Counter_and_Gauge():
+    c = Counter("test_retries_total", "Test retries", ["reason"])
+    c.inc(reason="error")
+    c.inc(2, reason="error")
+    assert c.value(reason="error") == 3
+    c.inc(reason="timeout")
+    assert c.total() == 4
+
+    g = Gauge("test_queue", "Test queue")
+    g.set_function(lambda: 7)
+    assert "test_queue 7.0" in g.render()
+
+
+def test_metrics_endpoint():
+    Counter("test_endpoint_total", "Test endpoint").inc()
+    server = start_metrics_server(0, "127.0.0.1")
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        body = urllib.request.urlopen(url).read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert "test_endpoint_total 1.0" in body
+    assert body == render()
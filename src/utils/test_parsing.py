@@ -0,0 +1,39 @@
+import pytest
+from benchmarks.fixtures import steam_search_json
+from data_sources.errors import MalformedContent
+from data_sources.steam.models import ItemRow
+from data_sources.steam.parse import parse_listings
+from utils import parsing
+from utils.metrics import PARSE_SECONDS
+from utils.timing import record_phases
+
+
+@pytest.fixture
+def parse_pool():
+    parsing.start_parse_pool(1)
+    yield
+    parsing.stop_parse_pool()
+
+
+def test_run_parser_inline():
+    with record_phases() as phases:
+        total_count, rows = parsing.run_parser("Test", parse_listings, steam_search_json(count=10))
+
+    assert total_count == 3800
+    assert len(rows) == 10
+    assert phases.parse > 0
+    assert PARSE_SECONDS.count(service="Test") >= 1
+
+
+def test_run_parser_in_pool(parse_pool):
+    total_count, rows = parsing.run_parser("Test", parse_listings, steam_search_json(count=10))
+
+    assert total_count == 3800
+    assert rows == parse_listings(steam_search_json(count=10))[1]
+    assert isinstance(rows[0], ItemRow)
+
+    # Parser errors come back from the pool
+    with pytest.raises(MalformedContent):
+        parsing.run_parser("Test", parse_listings, b"not json")
+    body = b'{"results": [], "total_count": 5}'
+    assert parsing.run_parser("Test", parse_listings, body, allow_empty=True) == (5, [])
@@ -0,0 +1,66 @@
+from contextlib import contextmanager
+from datetime import date
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
+from data_sources.steam.models import ItemRecord
+from data_sources.yahoofinance.models import CurrencyRecord
+from utils.partitioning import (
+    _month_start,
+    ensure_partitions,
+    partition_name,
+    partition_statements,
+    partitioned_table,
+)
+
+
+def test_month_start_wraps_years():
+    assert _month_start(date(2026, 11, 18), 0) == date(2026, 11, 1)
+    assert _month_start(date(2026, 11, 18), 2) == date(2027, 1, 1)
+    assert _month_start(date(2026, 12, 31), 13) == date(2028, 1, 1)
+
+
+def test_partition_name():
+    assert partition_name("steam_item_records", date(2027, 1, 1)) == "steam_item_records_y2027m01"
+
+
+def test_partitioned_table_ddl():
+    ddl = str(CreateTable(partitioned_table(ItemRecord.__table__)).compile(dialect=postgresql.dialect()))
+
+    assert "PARTITION BY RANGE (created_at)" in ddl
+    assert "PRIMARY KEY (id, created_at)" in ddl
+    assert "id SERIAL NOT NULL" in ddl
+    assert "created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL" in ddl
+    # The model's own table is left as it is
+    assert [c.name for c in ItemRecord.__table__.primary_key] == ["id"]
+
+
+def test_partition_statements_cover_months_ahead():
+    assert partition_statements("records", 2, date(2026, 11, 18)) == [
+        'CREATE TABLE IF NOT EXISTS "records_default" PARTITION OF "records" DEFAULT',
+        'CREATE TABLE IF NOT EXISTS "records_y2026m11" PARTITION OF "records" '
+        + "FOR VALUES FROM ('2026-11-01') TO ('2026-12-01')",
+        'CREATE TABLE IF NOT EXISTS "records_y2026m12" PARTITION OF "records" '
+        + "FOR VALUES FROM ('2026-12-01') TO ('2027-01-01')",
+        'CREATE TABLE IF NOT EXISTS "records_y2027m01" PARTITION OF "records" '
+        + "FOR VALUES FROM ('2027-01-01') TO ('2027-02-01')",
+    ]
+
+
+def test_ensure_partitions_executes_statements_per_table():
+    executed = []
+
+    class Connection:
+        def execute(self, statement):
+            executed.append(str(statement))
+
+    class Engine:
+        @contextmanager
+        def begin(self):
+            yield Connection()
+
+    tables = [ItemRecord.__table__, CurrencyRecord.__table__]
+    ensure_partitions(Engine(), tables, months_ahead=1, today=date(2026, 12, 5))
+
+    assert executed == partition_statements(
+        ItemRecord.__tablename__, 1, date(2026, 12, 5)
+    ) + partition_statements(CurrencyRecord.__tablename__, 1, date(2026, 12, 5))
@@ -0,0 +1,32 @@
+import threading
+import time
+from functools import partial
+from scheduling.job import RepeatableJob
+from utils.profiling import SlowJobProfiler
+
+
+def test_SlowJobProfiler_dumps_only_slow_jobs(tmp_path):
+    p = SlowJobProfiler(threshold=0.05, directory=str(tmp_path))
+
+    p.run(RepeatableJob(partial(time.sleep, 0), name="fast"))
+    p.run(RepeatableJob(partial(time.sleep, 0.1), name="slow page/1"))
+
+    files = [f.name for f in tmp_path.iterdir()]
+    assert len(files) == 1
+    assert files[0].startswith("slow_page_1-")
+    assert files[0].endswith(".prof")
+
+
+def test_SlowJobProfiler_profiles_concurrent_jobs(tmp_path):
+    p = SlowJobProfiler(threshold=0.05, directory=str(tmp_path))
+    threads = [
+        threading.Thread(target=p.run, args=(RepeatableJob(partial(time.sleep, 0.2), name=f"page-{i}"),))
+        for i in range(3)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # Every slow job is either profiled or counted as skipped
+    assert len(list(tmp_path.iterdir())) + p.skipped == 3
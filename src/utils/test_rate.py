@@ -0,0 +1,49 @@
+import pytest
+from utils.rate import AdaptiveRateLimiter, group_delay_from_config
+
+
+def test_AdaptiveRateLimiter_increases_additively():
+    r = AdaptiveRateLimiter(initial_delay=2, min_delay=1, max_delay=10, increase=0.1)
+    r.on_success()
+    r.on_success()
+
+    assert r.rate == pytest.approx(0.7)
+    assert r.stats()["successes"] == 2
+
+
+def test_AdaptiveRateLimiter_decreases_multiplicatively():
+    r = AdaptiveRateLimiter(initial_delay=1, min_delay=0.5, max_delay=10, decrease=0.5)
+    r.on_rate_limited(retry_after=30)
+
+    assert r.delay == pytest.approx(2)
+    assert r.stats()["penalties"] == 1
+    assert r.stats()["last_retry_after"] == 30
+
+
+def test_AdaptiveRateLimiter_stays_within_bounds():
+    r = AdaptiveRateLimiter(initial_delay=5, min_delay=1, max_delay=10, increase=1)
+    for _ in range(10):
+        r.on_success()
+    assert r.delay == pytest.approx(1)
+
+    for _ in range(10):
+        r.on_rate_limited()
+    assert r.delay == pytest.approx(10)
+
+
+def test_group_delay_from_config():
+    assert group_delay_from_config({"groupdelay": 3, "adaptive": False}, "x") == 3
+
+    r = group_delay_from_config(
+        {"groupdelay": 3, "adaptive": True, "mindelay": 1, "maxdelay": 60}, "x"
+    )
+    assert r.delay == pytest.approx(3)
+
+
+def test_AdaptiveRateLimiter_set_bounds():
+    r = AdaptiveRateLimiter(initial_delay=2, min_delay=1, max_delay=10)
+
+    r.set_bounds(min_delay=4, max_delay=20)
+    assert r.delay == pytest.approx(4)
+    with pytest.raises(ValueError):
+        r.set_bounds(min_delay=5, max_delay=1)
@@ -0,0 +1,126 @@
+from sqlalchemy import create_engine, select, func
+from sqlalchemy.orm import Session
+from models import DataUpdateRecord, load_tables as load_main_tables
+from data_sources.steam.models import ItemRecord, load_tables as load_steam_tables
+from utils import writer
+from utils.writer import BatchWriter, PendingUpdate
+
+
+def _engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    load_main_tables(engine)
+    load_steam_tables(engine)
+    return engine
+
+
+def _update(title, n_rows):
+    record = DataUpdateRecord(
+        service_name="Test", title=title, success=True, attempts=1, run_time=0.1
+    )
+    rows = [
+        dict(
+            name=f"{title} {i}",
+            hash_name=f"{title}-{i}",
+            sell_listings=i,
+            sell_price=i,
+            sale_price_text="$0.01",
+        )
+        for i in range(n_rows)
+    ]
+    return PendingUpdate(record, {ItemRecord: rows})
+
+
+def _count(engine, model):
+    with Session(engine) as session:
+        return session.scalar(select(func.count()).select_from(model))
+
+
+def test_BatchWriter_flushes_on_close(tmp_path):
+    engine = _engine(tmp_path)
+    w = BatchWriter(engine, batch_rows=10**6, batch_interval=60)
+
+    for i in range(5):
+        w.submit(_update(f"page {i}", 100))
+    w.close()
+
+    assert _count(engine, DataUpdateRecord) == 5
+    assert _count(engine, ItemRecord) == 500
+
+    with Session(engine) as session:
+        records = session.scalars(select(DataUpdateRecord)).all()
+    assert all(r.write_time is not None and r.write_time >= 0 for r in records)
+
+
+def test_BatchWriter_writes_bad_batch_one_by_one(tmp_path):
+    engine = _engine(tmp_path)
+    w = BatchWriter(engine, batch_rows=10**6, batch_interval=60)
+
+    bad = _update("bad", 1)
+    bad.rows_by_model[ItemRecord][0]["name"] = None  # Violates NOT NULL
+
+    w.submit(_update("good", 3))
+    w.submit(bad)
+    w.close()
+
+    # The failing update is dropped together with its record, the other one is kept
+    assert _count(engine, DataUpdateRecord) == 1
+    assert _count(engine, ItemRecord) == 3
+
+
+def test_BatchWriter_writes_failed_and_successful_updates_in_one_batch(tmp_path, monkeypatch):
+    engine = _engine(tmp_path)
+    one_by_one = []
+    monkeypatch.setattr(writer, "write_now", lambda engine, update: one_by_one.append(update))
+    w = BatchWriter(engine, batch_rows=10**6, batch_interval=60)
+
+    failed = PendingUpdate(
+        DataUpdateRecord(
+            service_name="Test",
+            title="failed",
+            success=False,
+            message="Gave up",
+            attempts=8,
+            run_time=0.1,
+        ),
+        {},
+    )
+    succeeded = _update("page", 3)
+    succeeded.update_record.not_modified = False
+    w.submit(failed)
+    w.submit(succeeded)
+    w.close()
+
+    # Both records went into the batch insert, none were retried one by one
+    assert one_by_one == []
+    assert _count(engine, DataUpdateRecord) == 2
+    assert _count(engine, ItemRecord) == 3
+
+
+def test_BatchWriter_calls_on_written_after_commit_only(tmp_path):
+    engine = _engine(tmp_path)
+    w = BatchWriter(engine, batch_rows=10**6, batch_interval=60)
+    written = []
+
+    good = _update("good", 3)
+    good.on_written = lambda: written.append("good")
+    bad = _update("bad", 1)
+    bad.rows_by_model[ItemRecord][0]["name"] = None  # Violates NOT NULL
+    bad.on_written = lambda: written.append("bad")
+    w.submit(good)
+    w.submit(bad)
+    w.close()
+
+    assert written == ["good"]
+
+
+def test_BatchWriter_notifies_listeners(tmp_path):
+    engine = _engine(tmp_path)
+    w = BatchWriter(engine, batch_rows=10**6, batch_interval=60)
+    written = []
+    w.add_listener(written.append)
+
+    w.submit(_update("page", 3))
+    w.submit(_update("empty", 0))
+    w.close()
+
+    assert written == [{ItemRecord.__tablename__}]
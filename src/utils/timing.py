@@ -0,0 +1,44 @@
+"""
+Per-phase timing of a data update.
+
+data_update opens a PhaseTimes for each pull attempt with record_phases(). Code running
+within it (the fetch layer, the parsers) adds its time through add_fetch and add_parse.
+Outside of record_phases these calls do nothing.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class PhaseTimes:
+    fetch: float = 0.0  # Seconds spent fetching responses
+    parse: float = 0.0  # Seconds spent parsing responses into rows
+    bytes_downloaded: int = 0  # Size of the (decompressed) response bodies
+
+
+_current: ContextVar[Optional[PhaseTimes]] = ContextVar("phase_times", default=None)
+
+
+@contextmanager
+def record_phases():
+    times = PhaseTimes()
+    token = _current.set(times)
+    try:
+        yield times
+    finally:
+        _current.reset(token)
+
+
+def add_fetch(seconds: float, n_bytes: int):
+    times = _current.get()
+    if times is not None:
+        times.fetch += seconds
+        times.bytes_downloaded += n_bytes
+
+
+def add_parse(seconds: float):
+    times = _current.get()
+    if times is not None:
+        times.parse += seconds
@@ -0,0 +1,196 @@
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+from sqlalchemy.orm import Session
+from utils.db import bulk_insert, model_to_row
+from utils.metrics import DB_WRITE_SECONDS, ROWS_WRITTEN, WRITER_QUEUE
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PendingUpdate:
+    """
+    A data update record (UpdateRow or DataUpdateRecord) and the rows pulled by that
+    update, written in the same transaction.
+    """
+
+    update_record: object
+    rows_by_model: dict
+    submitted_at: float = field(default_factory=time.perf_counter)
+    on_written: Optional[Callable] = None  # Called once the update is committed, not if it is dropped
+
+
+def _call_on_written(updates: list[PendingUpdate]):
+    for update in updates:
+        if update.on_written is None:
+            continue
+        try:
+            update.on_written()
+        except Exception:
+            logger.warning("Update on_written callback failed", exc_info=True)
+
+
+def write_updates(session: Session, updates: list[PendingUpdate]) -> int:
+    """
+    Adds the updates to the session, merging rows of the same table into one bulk insert.
+    The data rows are inserted first, so each update record's write_time covers them.
+    Returns the number of rows written.
+    """
+    merged = {}
+    for update in updates:
+        for model, rows in update.rows_by_model.items():
+            merged.setdefault(model, []).extend(rows)
+
+    for model, rows in merged.items():
+        bulk_insert(session, model, rows)
+
+    records = {}
+    now = time.perf_counter()
+    for update in updates:
+        update.update_record.write_time = now - update.submitted_at
+        record = update.update_record
+        records.setdefault(getattr(record, "model", type(record)), []).append(
+            model_to_row(update.update_record)
+        )
+    for model, rows in records.items():
+        bulk_insert(session, model, rows)
+
+    return sum(len(rows) for rows in merged.values()) + len(updates)
+
+
+def write_now(db_engine, update: PendingUpdate):
+    """Writes a single update synchronously."""
+    with Session(db_engine) as session, DB_WRITE_SECONDS.time():
+        n_rows = write_updates(session, [update])
+        session.commit()
+    ROWS_WRITTEN.inc(n_rows)
+    _call_on_written([update])
+
+
+class BatchWriter:
+    """
+    Write-behind stage between the jobs and the database.
+
+    Jobs submit their updates onto a bounded queue and return straight away. A
+    dedicated thread drains the queue and commits updates from any job or source
+    together, once batch_rows rows are pending or batch_interval seconds have passed
+    since the first pending update. When the queue is full, submit blocks, slowing
+    the jobs down to the speed of the database.
+
+    Each update record is committed in the same transaction as its rows. If a batch
+    fails, its updates are retried one transaction each, so a bad update only loses
+    itself.
+
+    Listeners added through add_listener are called on the writer thread with the
+    names of the tables rows were written to, after each commit.
+    """
+
+    _STOP = object()
+
+    def __init__(self, db_engine, max_queue=1000, batch_rows=5000, batch_interval=1.0):
+        """
+        db_engine:      engine to write to
+        max_queue:      maximum number of updates waiting to be written
+        batch_rows:     write a batch once it holds this many rows
+        batch_interval: write a batch once its first update has waited this many seconds
+        """
+        self.db_engine = db_engine
+        self.batch_rows = batch_rows
+        self.batch_interval = batch_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._listeners = []
+        WRITER_QUEUE.set_function(self._queue.qsize)
+        self._thread = threading.Thread(target=self._run, name="writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, update: PendingUpdate):
+        """Queues an update for writing, blocking while the queue is full."""
+        self._queue.put(update)
+
+    def add_listener(self, listener):
+        """Calls listener(table names) after rows have been written."""
+        self._listeners.append(listener)
+
+    def _notify(self, updates: list[PendingUpdate]):
+        tables = {
+            model.__tablename__
+            for update in updates
+            for model, rows in update.rows_by_model.items()
+            if len(rows) > 0
+        }
+        if len(tables) == 0:
+            return
+        for listener in self._listeners:
+            try:
+                listener(tables)
+            except Exception:
+                logger.warning("Writer listener failed", exc_info=True)
+
+    def close(self):
+        """Writes everything that is queued, then stops the writer thread."""
+        self._queue.put(self._STOP)
+        self._thread.join()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            n_rows = 0
+
+            # Block for the first update, then collect more until the batch is full or old enough
+            item = self._queue.get()
+            deadline = time.monotonic() + self.batch_interval
+            while True:
+                if item is self._STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                n_rows += 1 + sum(len(rows) for rows in item.rows_by_model.values())
+                if n_rows >= self.batch_rows:
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if len(batch) > 0:
+                self._write(batch, n_rows)
+
+    def _write(self, batch: list[PendingUpdate], n_rows: int):
+        start = time.perf_counter()
+        try:
+            with Session(self.db_engine) as session, DB_WRITE_SECONDS.time():
+                n_rows = write_updates(session, batch)
+                session.commit()
+            ROWS_WRITTEN.inc(n_rows)
+            _call_on_written(batch)
+            self._notify(batch)
+        except Exception:
+            logger.warning(
+                f"Failed to write batch of {len(batch)} updates, writing them one by one",
+                exc_info=True,
+            )
+            for update in batch:
+                try:
+                    write_now(self.db_engine, update)
+                    self._notify([update])
+                except Exception:
+                    logger.error(
+                        f"Failed to write update {update.update_record.service_name} -> "
+                        + f"[{update.update_record.title}], dropping it",
+                        exc_info=True,
+                    )
+            return
+
+        logger.debug(
+            f"Wrote {len(batch)} updates ({n_rows} rows) in {time.perf_counter() - start}s, "
+            + f"{self._queue.qsize()} updates queued"
+        )